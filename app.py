@@ -1,14 +1,33 @@
 import os
 import numpy as np
-import pandas as pd
-import tensorflow as tf
 import joblib
-import pickle
-import io
-import csv
+import itertools
 from datetime import datetime
 import kg
-from flask import Flask, render_template, request, jsonify, send_file
+import inference
+import streaming
+import payloads
+import columnar
+import result_store
+import csv_export
+import jobs
+import microbatch
+import backends
+import preprocessing
+import artifact_cache
+import artifacts
+import loading
+import result_cache
+import registry
+import metrics
+import profiling
+import parallel
+import random
+import threading
+import time
+import hmac
+from functools import partial
+from flask import Flask, Response, g, has_app_context, render_template, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import logging
@@ -16,68 +35,191 @@ import logging
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
+startup_started = time.perf_counter()
 
 app = Flask(__name__)
 CORS(app)
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 16)) * 1024 * 1024  # 16MB default max file size
 app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['INFERENCE_BATCH_SIZE'] = int(os.environ.get('INFERENCE_BATCH_SIZE', inference.DEFAULT_BATCH_SIZE))
+app.config['BATCH_CHUNK_ROWS'] = int(os.environ.get('BATCH_CHUNK_ROWS', streaming.DEFAULT_CHUNK_ROWS))
+app.config['BATCH_JOBS_DIR'] = os.environ.get('BATCH_JOBS_DIR', jobs.DEFAULT_JOBS_DIR)
+app.config['BATCH_JOB_WORKERS'] = int(os.environ.get('BATCH_JOB_WORKERS', jobs.DEFAULT_JOB_WORKERS))
+app.config['BATCH_JOB_RETENTION_HOURS'] = float(os.environ.get('BATCH_JOB_RETENTION_HOURS', jobs.DEFAULT_RETENTION_HOURS))
+app.config['BATCH_JOB_MAX_JOBS'] = int(os.environ.get('BATCH_JOB_MAX_JOBS', jobs.DEFAULT_MAX_JOBS))
+app.config['INFERENCE_BACKEND'] = os.environ.get('INFERENCE_BACKEND', backends.DEFAULT_BACKEND)
+app.config['TFLITE_MODEL_PATH'] = os.environ.get('TFLITE_MODEL_PATH', backends.DEFAULT_TFLITE_MODEL_PATH)
+app.config['TFLITE_NUM_THREADS'] = int(os.environ['TFLITE_NUM_THREADS']) if os.environ.get('TFLITE_NUM_THREADS') else None
+app.config['TFLITE_SHARED_WEIGHTS'] = os.environ.get('TFLITE_SHARED_WEIGHTS', '0').lower() in ('1', 'true', 'yes')
+app.config['STUB_MODEL_DELAY_MS'] = float(os.environ.get('STUB_MODEL_DELAY_MS', 0))
+app.config['PRELOAD_APP'] = os.environ.get('PRELOAD_APP', '0').lower() in ('1', 'true', 'yes')
+app.config['ARTIFACT_CACHE'] = os.environ.get('ARTIFACT_CACHE', '1').lower() in ('1', 'true', 'yes')
+app.config['ARTIFACT_CACHE_DIR'] = os.environ.get('ARTIFACT_CACHE_DIR', artifact_cache.DEFAULT_CACHE_DIR)
+app.config['FAST_SCALER'] = os.environ.get('FAST_SCALER', '1').lower() in ('1', 'true', 'yes')
+app.config['PREDICT_MICRO_BATCHING'] = os.environ.get('PREDICT_MICRO_BATCHING', '0').lower() in ('1', 'true', 'yes')
+app.config['PREDICT_BATCH_WINDOW_MS'] = float(os.environ.get('PREDICT_BATCH_WINDOW_MS', microbatch.DEFAULT_WINDOW_MS))
+app.config['PREDICT_MAX_BATCH_SIZE'] = int(os.environ.get('PREDICT_MAX_BATCH_SIZE', microbatch.DEFAULT_MAX_BATCH_SIZE))
+app.config['PREDICT_BATCH_TIMEOUT_SECONDS'] = float(os.environ.get('PREDICT_BATCH_TIMEOUT_SECONDS', microbatch.DEFAULT_TIMEOUT_SECONDS))
+app.config['PREDICTION_CACHE'] = os.environ.get('PREDICTION_CACHE', '1').lower() in ('1', 'true', 'yes')
+app.config['PREDICTION_CACHE_SIZE'] = int(os.environ.get('PREDICTION_CACHE_SIZE', result_cache.DEFAULT_MAX_ENTRIES))
+app.config['PREDICTION_CACHE_TTL_SECONDS'] = float(os.environ.get('PREDICTION_CACHE_TTL_SECONDS', result_cache.DEFAULT_TTL_SECONDS))
+app.config['KG_PATH'] = os.environ.get('KG_PATH', kg.DEFAULT_KG_PATH)
+app.config['KG_RELOAD_SECONDS'] = float(os.environ.get('KG_RELOAD_SECONDS', 5))
+app.config['ARTIFACT_RELOAD_SECONDS'] = float(os.environ.get('ARTIFACT_RELOAD_SECONDS', 0))
+app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN', '')
+app.config['BACKGROUND_LOADING'] = os.environ.get('BACKGROUND_LOADING', '1').lower() in ('1', 'true', 'yes')
+app.config['RETRY_AFTER_SECONDS'] = int(os.environ.get('RETRY_AFTER_SECONDS', 5))
+app.config['MODEL_REGISTRY'] = os.environ.get('MODEL_REGISTRY', '')
+app.config['MODEL_HEADER'] = os.environ.get('MODEL_HEADER', 'X-Model')
+app.config['SHADOW_MAX_PENDING_ROWS'] = int(os.environ.get('SHADOW_MAX_PENDING_ROWS', registry.DEFAULT_SHADOW_MAX_PENDING_ROWS))
+app.config['RESULT_STORE'] = os.environ.get('RESULT_STORE', '1').lower() in ('1', 'true', 'yes')
+app.config['RESULT_STORE_PATH'] = os.environ.get('RESULT_STORE_PATH', result_store.DEFAULT_STORE_PATH)
+app.config['RESULT_RETENTION_HOURS'] = float(os.environ.get('RESULT_RETENTION_HOURS', result_store.DEFAULT_RETENTION_HOURS))
+app.config['RESULT_STORE_MAX_BATCHES'] = int(os.environ.get('RESULT_STORE_MAX_BATCHES', result_store.DEFAULT_MAX_BATCHES))
+app.config['SHADOW_SAMPLE_RATE'] = float(os.environ.get('SHADOW_SAMPLE_RATE', registry.DEFAULT_SHADOW_SAMPLE_RATE))
+app.config['PROFILER'] = os.environ.get('PROFILER', profiling.SAMPLING)
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+app.config['PROFILE_INTERVAL_MS'] = float(os.environ.get('PROFILE_INTERVAL_MS', profiling.DEFAULT_INTERVAL_MS))
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', profiling.DEFAULT_PROFILE_DIR)
+app.config['PROFILE_MAX_FILES'] = int(os.environ.get('PROFILE_MAX_FILES', profiling.DEFAULT_MAX_PROFILES))
+app.config['PROFILE_HEADER'] = os.environ.get('PROFILE_HEADER', 'X-Profile')
+app.config['ASGI_INFERENCE_THREADS'] = int(os.environ.get('ASGI_INFERENCE_THREADS', 2))
+app.config['ASGI_MAX_PENDING'] = int(os.environ.get('ASGI_MAX_PENDING', 64))
+app.config['PARALLEL_SCORING_WORKERS'] = int(os.environ.get('PARALLEL_SCORING_WORKERS', 0))
+app.config['PARALLEL_MIN_ROWS'] = int(os.environ.get('PARALLEL_MIN_ROWS', parallel.DEFAULT_MIN_ROWS))
+app.config['PARALLEL_THREADS_PER_WORKER'] = int(os.environ.get('PARALLEL_THREADS_PER_WORKER', parallel.DEFAULT_THREADS_PER_WORKER))
+app.config['PARALLEL_RESTART_SECONDS'] = float(os.environ.get('PARALLEL_RESTART_SECONDS', parallel.DEFAULT_RESTART_SECONDS))
 
-ALLOWED_EXTENSIONS = {'csv'}
+ALLOWED_EXTENSIONS = set(columnar.UPLOAD_EXTENSIONS)
 
-# Create upload folder
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Create upload folder (not in scoring workers, which re-import this module but serve no requests)
+if not parallel.in_worker():
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+ARTIFACT_SOURCES = ['scaler.pkl', 'label_encoder.pkl', app.config['KG_PATH'], kg.LEGACY_KG_PATH]
+
+LOAD_STAGES = ['artifact_cache', 'model', 'scaler', 'label_encoder', 'knowledge_graph']
 
 # Global variables for loaded components
-model = None
-scaler = None
-label_encoder = None
-knowledge_graph = None
+model_path = "military_screening_cnn.h5"
+# The model, scaler, label encoder and KG in use: an artifacts.ArtifactSet, swapped as a whole on reload
+current_artifacts = None
+knowledge_graph_file = kg.KnowledgeGraphFile(app.config['KG_PATH'])
 all_components_loaded = False
+job_manager = None
+startup_info = {'seconds': None, 'artifact_cache': 'disabled', 'cache_key': None}
+prediction_cache = result_cache.PredictionCache(
+    app.config['PREDICTION_CACHE_SIZE'], app.config['PREDICTION_CACHE_TTL_SECONDS']
+) if app.config['PREDICTION_CACHE'] else None
+load_progress = loading.LoadProgress(LOAD_STAGES)
+# /batch-predict results kept server-side for download by batch ID
+results_db = result_store.ResultStore(
+    app.config['RESULT_STORE_PATH'], app.config['RESULT_RETENTION_HOURS'], app.config['RESULT_STORE_MAX_BATCHES']
+) if app.config['RESULT_STORE'] and not parallel.in_worker() else None
+
+# Hot reload state (see reload_artifacts)
+reload_lock = threading.Lock()
+reload_progress = None
+reload_status = {'state': 'idle', 'trigger': None, 'model': None, 'started_at': None,
+                 'finished_at': None, 'seconds': None, 'previous_version': None, 'error': None}
+source_watcher = None
+
+# Extra model bundles for A/B routing and shadow scoring (see registry.py)
+model_registry = registry.ModelRegistry(
+    **registry.load_registry_config(app.config['MODEL_REGISTRY'])
+) if app.config['MODEL_REGISTRY'] else None
+shadow_scorer = None
+
+# How long a recovered batch job waits for background loading before failing
+JOB_READY_TIMEOUT_SECONDS = 600
+
+# Upper bound for /download-template?rows=
+TEMPLATE_MAX_ROWS = 100000
+
+# Per-request profiles (see profiling.py); PROFILE_SAMPLE_RATE applies to these routes
+profile_store = profiling.ProfileStore(
+    app.config['PROFILE_DIR'], app.config['PROFILE_MAX_FILES']
+) if not parallel.in_worker() else None
+PROFILED_ROUTES = {'/predict', '/batch-predict', '/download-results', '/download-template', '/batches/<batch_id>/download'}
+
+# Prometheus metrics served by /metrics (see metrics.py)
+metrics_registry = metrics.MetricsRegistry()
+REQUESTS = metrics_registry.counter(
+    'screening_http_requests', 'HTTP requests by route, method and status code', ('route', 'method', 'status'))
+REQUEST_SECONDS = metrics_registry.histogram(
+    'screening_http_request_duration_seconds', 'Time until the response is returned, by route', ('route', 'method'))
+STAGE_SECONDS = metrics_registry.histogram(
+    'screening_stage_duration_seconds', 'Time spent in each stage of single-candidate scoring', ('stage',))
+SCORING_STAGES = {stage: STAGE_SECONDS.labels(stage=stage) for stage in (
+    'validation', 'scaler', 'model', 'micro_batch', 'label_decode', 'biomarkers', 'kg', 'decision', 'serialization')}
+BATCHES = metrics_registry.counter('screening_batches', '/batch-predict calls by outcome', ('outcome',))
+BATCH_ROWS = metrics_registry.histogram(
+    'screening_batch_rows', 'Candidates per completed /batch-predict call', buckets=metrics.BATCH_SIZE_BUCKETS)
+BATCH_ROWS_PER_SECOND = metrics_registry.histogram(
+    'screening_batch_rows_per_second', 'Scoring throughput of completed /batch-predict calls',
+    buckets=metrics.ROWS_PER_SECOND_BUCKETS)
+PARALLEL_FALLBACK_ROWS = metrics_registry.counter(
+    'screening_parallel_fallback_rows', 'Rows scored in-process because the parallel scoring pool was retired')
+
+def prediction_cache_stat(key):
+    """One number from the prediction cache stats, or None (metric left out) when it is disabled"""
+    return prediction_cache.stats()[key] if prediction_cache is not None else None
+
+metrics_registry.gauge('screening_prediction_cache_hits_total', 'Prediction cache hits',
+                       partial(prediction_cache_stat, 'hits'), kind='counter')
+metrics_registry.gauge('screening_prediction_cache_misses_total', 'Prediction cache misses',
+                       partial(prediction_cache_stat, 'misses'), kind='counter')
+metrics_registry.gauge('screening_prediction_cache_hit_ratio', 'Prediction cache hits per lookup since start',
+                       partial(prediction_cache_stat, 'hit_rate'))
+metrics_registry.gauge('screening_prediction_cache_entries', 'Entries in the prediction cache',
+                       partial(prediction_cache_stat, 'entries'))
+metrics_registry.gauge('process_resident_memory_bytes', 'Resident memory size in bytes', metrics.process_rss_bytes)
+metrics_registry.gauge('screening_system_ready', '1 once every component is loaded', lambda: int(all_components_loaded))
 
 def allowed_file(filename):
     """Check if uploaded file has allowed extension"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def validate_upload(files=None):
+    """Return an error message if the request (or the `files` form mapping) does not carry
+    a usable CSV, Parquet or Feather upload"""
+    files = request.files if files is None else files
+    if 'file' not in files:
+        return 'No file uploaded'
+    if files['file'].filename == '':
+        return 'No file selected'
+    if not allowed_file(files['file'].filename):
+        return 'Only CSV, Parquet or Feather files are allowed'
+    return None
+
 def create_default_knowledge_graph():
     """Create a default knowledge graph if loading fails"""
     logger.info("🔄 Creating default knowledge graph...")
     
-    class DefaultKnowledgeGraph:
-        def __init__(self):
-            self.rules = {
-                'high_confidence': ['Infantry', 'Special Forces', 'Combat Engineer'],
-                'medium_confidence': ['Military Police', 'Logistics', 'Signals'],
-                'low_confidence': ['Medical Evaluation Required']
-            }
-        
-        def get_recommendations(self, confidence):
-            if confidence > 0.8:
-                return self.rules['high_confidence']
-            elif confidence > 0.6:
-                return self.rules['medium_confidence']
-            else:
-                return self.rules['low_confidence']
-        
-        def recommend_roles(self, biomarkers):
-            """Compatibility method for knowledge graph interface"""
-            confidence = biomarkers.get('movement_quality', 0.5)
-            return {
-                'recommended_roles': self.get_recommendations(confidence),
-                'detected_risks': [],
-                'contraindicated_roles': []
-            }
-    
-    return DefaultKnowledgeGraph()
+    # The built-in ruleset of the rule engine
+    return kg.MilitaryScreeningKG()
+
+def bundle_file(bundle, filename):
+    """Path of an artifact file of a registry bundle, or of the primary set (bundle None)"""
+    return filename if bundle is None else os.path.join(bundle.dir, os.path.basename(filename))
 
-def ensure_model_exists():
-    """Ensure model file exists and extract if needed"""
-    if not os.path.exists("military_screening_cnn.h5"):
+def bundle_backend(bundle):
+    """Inference backend of a registry bundle (default: INFERENCE_BACKEND)"""
+    return bundle.backend if bundle is not None and bundle.backend else app.config['INFERENCE_BACKEND']
+
+def ensure_model_exists(bundle=None):
+    """Ensure model file exists and extract if needed (again, when the .7z archive is newer)"""
+    h5_path = bundle_file(bundle, "military_screening_cnn.h5")
+    archive_path = bundle_file(bundle, "military_screening_cnn.7z")
+    if not os.path.exists(h5_path) or (
+            os.path.exists(archive_path)
+            and os.path.getmtime(archive_path) > os.path.getmtime(h5_path)):
         logger.info("🔄 Model file not found, extracting from 7z...")
         try:
             import py7zr
-            if os.path.exists("military_screening_cnn.7z"):
-                with py7zr.SevenZipFile('military_screening_cnn.7z', mode='r') as z:
-                    z.extractall()
+            if os.path.exists(archive_path):
+                with py7zr.SevenZipFile(archive_path, mode='r') as z:
+                    z.extractall(path=os.path.dirname(archive_path) or None)
                 logger.info("✅ Model extracted from 7z successfully!")
                 return True
             else:
@@ -88,60 +230,313 @@ def ensure_model_exists():
             return False
     return True
 
-def load_all_components():
-    """Load all AI components with proper error handling"""
-    global model, scaler, label_encoder, knowledge_graph, all_components_loaded
+def load_knowledge_graph(kg_file=None, legacy_path=kg.LEGACY_KG_PATH):
+    """Load the JSON knowledge graph, falling back to the legacy pickle and then the default KG"""
+    logger.info("🔄 Loading knowledge graph...")
+    kg_file = kg_file or knowledge_graph_file
+    if kg_file.exists():
+        try:
+            knowledge_graph = kg_file.load()
+            logger.info(f"✅ Knowledge graph loaded from {kg_file.path}")
+            return knowledge_graph
+        except Exception as e:
+            logger.warning(f"⚠️ Knowledge graph loading failed: {e}")
+    elif os.path.exists(legacy_path):
+        try:
+            knowledge_graph = kg.load_legacy_pickle(legacy_path)
+            logger.info(f"✅ Knowledge graph loaded from {legacy_path}; "
+                        f"run convert_kg.py to replace it with {kg_file.path}")
+            return knowledge_graph
+        except Exception as e:
+            logger.warning(f"⚠️ Legacy knowledge graph loading failed: {e}")
     
-    try:
-        logger.info("🚀 STARTING COMPONENT LOADING PROCESS...")
-        
-        # Step 1: Ensure model exists
-        if not ensure_model_exists():
-            logger.error("❌ Failed to ensure model exists")
-            return False
-        
-        # Step 2: Load TensorFlow model
-        logger.info("🔄 Loading TensorFlow model...")
-        model = tf.keras.models.load_model("military_screening_cnn.h5")
-        logger.info("✅ TensorFlow model loaded")
-        
-        # Step 3: Load scaler
-        logger.info("🔄 Loading scaler...")
-        scaler = joblib.load("scaler.pkl")
-        logger.info("✅ Scaler loaded")
-        
-        # Step 4: Load label encoder
-        logger.info("🔄 Loading label encoder...")
-        label_encoder = joblib.load("label_encoder.pkl")
-        logger.info("✅ Label encoder loaded")
+    knowledge_graph = create_default_knowledge_graph()
+    logger.info("✅ Default knowledge graph created")
+    return knowledge_graph
+
+def watch_knowledge_graph():
+    """Swap in the KG file whenever it changes; in-flight requests keep the old rules"""
+    while True:
+        time.sleep(app.config['KG_RELOAD_SECONDS'])
+        if not all_components_loaded:
+            continue
+        with reload_lock:
+            reloaded = knowledge_graph_file.reload_if_changed()
+            if reloaded is not None:
+                install_artifacts(current_artifacts.replace(source_version(), knowledge_graph=reloaded))
+
+def model_source(bundle=None):
+    """The file the Keras model comes from: the .7z archive, or the bare .h5 without one"""
+    archive_path = bundle_file(bundle, 'military_screening_cnn.7z')
+    return archive_path if os.path.exists(archive_path) else bundle_file(bundle, 'military_screening_cnn.h5')
+
+def artifact_sources(bundle=None):
+    """The files an artifact set is built from; a digest of them is its version"""
+    sources = [bundle_file(bundle, path) for path in ARTIFACT_SOURCES]
+    if bundle_backend(bundle) == backends.STUB_BACKEND:
+        return sources
+    if bundle_backend(bundle) == backends.TFLITE_BACKEND:
+        return [bundle_file(bundle, app.config['TFLITE_MODEL_PATH'])] + sources
+    return [model_source(bundle)] + sources
+
+def scoring_sources(bundle=None):
+    """The artifact sources that decide the predicted probabilities: all but the knowledge graph"""
+    kg_paths = {bundle_file(bundle, app.config['KG_PATH']), bundle_file(bundle, kg.LEGACY_KG_PATH)}
+    return [path for path in artifact_sources(bundle) if path not in kg_paths]
+
+def source_version():
+    return artifacts.artifact_version(
+        app.config['INFERENCE_BACKEND'],
+        artifact_cache.ArtifactCache(app.config['ARTIFACT_CACHE_DIR'], artifact_sources()).digest()
+    )
+
+def load_inference_backend(path, progress, backend_name=None):
+    """Load the CNN at `path` (a .h5 or, for the TFLite backend, a .tflite file) into an
+    inference backend and warm it up (per process).
+    
+    Returns `(model, backend)`; `model` is None for the TFLite and stub backends.
+    """
+    backend_name = backend_name or app.config['INFERENCE_BACKEND']
+    with progress.stage('model'):
+        if backend_name == backends.STUB_BACKEND:
+            # No model file: stands in for the CNN in benchmarks
+            logger.info("🧪 Using the stub inference backend")
+        elif backend_name == backends.TFLITE_BACKEND:
+            # Serve the exported TFLite model, TensorFlow is never imported
+            logger.info(f"🔄 Loading TFLite model from {path}...")
+        else:
+            logger.info("🔄 Loading TensorFlow model...")
+        model, inference_backend = backends.load_backend(
+            backend_name, path,
+            num_threads=app.config['TFLITE_NUM_THREADS'],
+            shared_weights=app.config['TFLITE_SHARED_WEIGHTS'],
+            stub_delay_ms=app.config['STUB_MODEL_DELAY_MS']
+        )
+        if model is not None:
+            logger.info("✅ TensorFlow model loaded")
         
-        # Step 5: Try to load knowledge graph
-        logger.info("🔄 Loading knowledge graph...")
+        # Warm up the inference backend before the first request
+        backends.warm_up(inference_backend, batch_sizes=(1, app.config['INFERENCE_BATCH_SIZE']))
+        progress.set_detail('model', inference_backend.name)
+    return model, inference_backend
+
+def build_artifact_set(load_backend=True, progress=None, bundle=None):
+    """Load a complete artifact set without touching the one in use; raises on failure.
+    
+    With `load_backend=False` (gunicorn master in preload mode) only the artifacts that
+    are safe to share with forked workers are loaded; each worker then calls
+    `init_worker()` to load its own inference backend.
+    
+    `bundle` is a registry.ModelSpec to load an extra registry model from its
+    directory instead of the primary set from the app root.
+    """
+    progress = progress or load_progress
+    backend_name = bundle_backend(bundle)
+    tflite = backend_name == backends.TFLITE_BACKEND
+    stub = backend_name == backends.STUB_BACKEND
+    
+    # Step 0: Look for pre-converted artifacts matching the current source files
+    cache = artifact_cache.ArtifactCache(app.config['ARTIFACT_CACHE_DIR'], artifact_sources(bundle))
+    cache_entry, cache_status = None, 'disabled'
+    if app.config['ARTIFACT_CACHE']:
+        with progress.stage('artifact_cache'):
+            cache_entry = cache.lookup()
+            cache_status = 'hit' if cache_entry else 'miss'
+            progress.set_detail('artifact_cache', cache_status)
+        logger.info(f"{'⚡' if cache_entry else '🔄'} Artifact cache {cache_status} ({cache.digest()[:12]})")
+    else:
+        progress.mark('artifact_cache', loading.SKIPPED, 'disabled')
+    
+    # Step 1: Ensure model exists
+    path = bundle_file(bundle, app.config['TFLITE_MODEL_PATH'] if tflite else model_path)
+    if cache_entry is not None and cache_entry.model_path:
+        path = cache_entry.model_path
+    elif not tflite and not stub and not ensure_model_exists(bundle):
+        progress.mark('model', loading.FAILED, 'Model file missing and could not be extracted')
+        raise RuntimeError('Failed to ensure model exists')
+    
+    # Step 2: Load the model into the inference backend
+    model, inference_backend = None, None
+    if load_backend:
+        model, inference_backend = load_inference_backend(path, progress, backend_name)
+    else:
+        logger.info("⏭️ Inference backend will be loaded in each worker after fork")
+    
+    # Step 3: Load scaler
+    with progress.stage('scaler'):
+        if cache_entry is not None and app.config['FAST_SCALER']:
+            scaler = preprocessor = cache_entry.load_scaler()
+            logger.info("✅ Scaler arrays loaded from cache")
+        else:
+            logger.info("🔄 Loading scaler...")
+            scaler = joblib.load(bundle_file(bundle, "scaler.pkl"))
+            logger.info("✅ Scaler loaded")
+            
+            # Step 3b: Precompute the scaler's affine transform, keeping sklearn as the fallback
+            fast_scaler = preprocessing.build_fast_scaler(scaler, inference.FEATURE_COUNT) if app.config['FAST_SCALER'] else None
+            preprocessor = fast_scaler or scaler
+    
+    # Step 4: Load label encoder
+    with progress.stage('label_encoder'):
+        if cache_entry is not None:
+            label_encoder = cache_entry.load_label_encoder()
+            logger.info("✅ Label encoder classes loaded from cache")
+        else:
+            logger.info("🔄 Loading label encoder...")
+            label_encoder = joblib.load(bundle_file(bundle, "label_encoder.pkl"))
+            logger.info("✅ Label encoder loaded")
+    
+    # Step 5: Try to load knowledge graph
+    with progress.stage('knowledge_graph'):
+        knowledge_graph = cache_entry.load_knowledge_graph() if cache_entry is not None else None
+        if knowledge_graph is not None:
+            if bundle is None:
+                knowledge_graph_file.mark_loaded()
+            logger.info("✅ Knowledge graph loaded from cache")
+        elif bundle is None:
+            knowledge_graph = load_knowledge_graph()
+        else:
+            knowledge_graph = load_knowledge_graph(kg.KnowledgeGraphFile(bundle_file(bundle, app.config['KG_PATH'])),
+                                                   bundle_file(bundle, kg.LEGACY_KG_PATH))
+        progress.set_detail('knowledge_graph', type(knowledge_graph).__name__)
+    
+    # Step 6: Store the loaded artifacts for the next cold start
+    if app.config['ARTIFACT_CACHE'] and cache_entry is None:
         try:
-            knowledge_graph = joblib.load("military_knowledge_graph.pkl")
-            logger.info("✅ Knowledge graph loaded from file")
+            cache.store(path if not (tflite or stub) and os.path.exists(path) else None, preprocessor, label_encoder, knowledge_graph)
         except Exception as e:
-            logger.warning(f"⚠️ Knowledge graph loading failed: {e}")
-            try:
-                class FixUnpickler(pickle.Unpickler):
-                    def find_class(self, module, name):
-                        if module == "__main__" and name == "MilitaryScreeningKG":
-                            return getattr(kg, "MilitaryScreeningKG")
-                        return super().find_class(module, name)
-
-                with open("military_knowledge_graph.pkl", "rb") as f:
-                    knowledge_graph = FixUnpickler(f).load()
-                logger.info("✅ Knowledge graph loaded via FixUnpickler")
-            except Exception as e2:
-                logger.warning(f"⚠️ FixUnpickler failed: {e2}")
-                knowledge_graph = create_default_knowledge_graph()
-                logger.info("✅ Default knowledge graph created")
+            logger.warning(f"⚠️ Could not write artifact cache: {e}")
+    
+    return artifacts.ArtifactSet(
+        artifacts.artifact_version(backend_name, cache.digest()),
+        scoring_version=artifacts.artifact_version(
+            backend_name, artifact_cache.ArtifactCache(app.config['ARTIFACT_CACHE_DIR'], scoring_sources(bundle)).digest()),
+        backend=inference_backend, model=model, scaler=scaler, preprocessor=preprocessor,
+        label_encoder=label_encoder, knowledge_graph=knowledge_graph,
+        model_path=path, cache_status=cache_status,
+        name=bundle.name if bundle is not None else primary_model_name()
+    )
+
+def primary_model_name():
+    return model_registry.primary_name if model_registry is not None else registry.DEFAULT_PRIMARY_NAME
+
+def attach_micro_batcher(old_set, new_set):
+    """Give `new_set` a micro-batcher, reusing the one of `old_set` if it scores the same way"""
+    if new_set.ready and app.config['PREDICT_MICRO_BATCHING']:
+        if (old_set is not None and old_set.micro_batcher is not None
+                and old_set.backend is new_set.backend and old_set.preprocessor is new_set.preprocessor):
+            new_set.micro_batcher = old_set.micro_batcher
+        else:
+            new_set.micro_batcher = microbatch.MicroBatcher(
+                partial(predict_feature_batch, new_set),
+                max_batch_size=app.config['PREDICT_MAX_BATCH_SIZE'],
+                window_ms=app.config['PREDICT_BATCH_WINDOW_MS']
+            )
+
+def close_micro_batcher(old_set, new_set):
+    if old_set is not None and old_set.micro_batcher not in (None, new_set.micro_batcher):
+        old_set.micro_batcher.close()
+
+def attach_scoring_pool(old_set, new_set):
+    """Give `new_set` a pool of scoring processes, reusing the one of `old_set` if it scores the same way"""
+    if not new_set.ready or app.config['PARALLEL_SCORING_WORKERS'] <= 0:
+        return
+    # A retired pool has lost its workers; never carry it over to the next set
+    if (old_set is not None and old_set.scoring_pool is not None and old_set.scoring_pool.running
+            and old_set.backend is new_set.backend and old_set.preprocessor is new_set.preprocessor):
+        new_set.scoring_pool = old_set.scoring_pool
+        return
+    spec = parallel.BackendSpec(
+        new_set.backend.name,
+        None if new_set.backend.name == backends.STUB_BACKEND else new_set.model_path,
+        shared_weights=app.config['TFLITE_SHARED_WEIGHTS'],
+        stub_delay_ms=app.config['STUB_MODEL_DELAY_MS']
+    )
+    logger.info(f"🔄 Starting {app.config['PARALLEL_SCORING_WORKERS']} parallel scoring workers...")
+    try:
+        new_set.scoring_pool = parallel.ScoringPool(
+            spec, new_set.preprocessor, len(new_set.label_encoder.classes_),
+            workers=app.config['PARALLEL_SCORING_WORKERS'],
+            batch_size=app.config['INFERENCE_BATCH_SIZE'],
+            threads_per_worker=app.config['PARALLEL_THREADS_PER_WORKER']
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ Parallel scoring unavailable, batches are scored in-process: {e}")
+
+scoring_pool_restart = threading.Lock()
+last_scoring_pool_restart = 0.0
+
+def restart_scoring_pool(artifact_set):
+    """Replace the retired pool of the live set in the background, at most once per PARALLEL_RESTART_SECONDS"""
+    global last_scoring_pool_restart
+
+    retired = artifact_set.scoring_pool
+    if artifact_set is not current_artifacts:
+        return
+    since = time.monotonic() - max(retired.retired_at, last_scoring_pool_restart)
+    if since < app.config['PARALLEL_RESTART_SECONDS'] or not scoring_pool_restart.acquire(blocking=False):
+        return
+    last_scoring_pool_restart = time.monotonic()
+
+    def restart():
+        try:
+            attach_scoring_pool(None, artifact_set)
+            # A reload may have swapped the set out while the new workers started
+            if artifact_set is not current_artifacts and artifact_set.scoring_pool is not retired:
+                artifact_set.scoring_pool.close()
+        finally:
+            scoring_pool_restart.release()
+
+    threading.Thread(target=restart, name='scoring-pool-restart', daemon=True).start()
+
+def close_scoring_pool(old_set, new_set):
+    if old_set is not None and old_set.scoring_pool not in (None, new_set.scoring_pool):
+        old_set.scoring_pool.close()
+
+def install_artifacts(new_set):
+    """Make `new_set` the artifact set new requests are scored with.
+    
+    Requests already running keep the set they started with; the swap itself is a
+    single assignment of `current_artifacts`.
+    """
+    global current_artifacts, all_components_loaded
+    
+    old_set = current_artifacts
+    attach_micro_batcher(old_set, new_set)
+    attach_scoring_pool(old_set, new_set)
+    if new_set.ready and prediction_cache is not None:
+        prediction_cache.set_version(new_set.scoring_version)
+    
+    current_artifacts = new_set
+    
+    close_micro_batcher(old_set, new_set)
+    close_scoring_pool(old_set, new_set)
+    if new_set.ready and not all_components_loaded:
+        all_components_loaded = True
+        startup_info['seconds'] = round(time.perf_counter() - startup_started, 3)
+        load_progress.ready.set()
+
+def load_all_components(load_backend=True):
+    """Load all AI components with proper error handling"""
+    global all_components_loaded
+    
+    try:
+        logger.info("🚀 STARTING COMPONENT LOADING PROCESS...")
+        new_set = build_artifact_set(load_backend)
+        startup_info['artifact_cache'] = new_set.cache_status
+        startup_info['cache_key'] = new_set.version.rsplit('-', 1)[-1] if new_set.cache_status != 'disabled' else None
+        startup_info['seconds'] = round(time.perf_counter() - startup_started, 3)
         
         # Verify critical components
-        critical_components_loaded = all([model, scaler, label_encoder])
-        if critical_components_loaded:
-            all_components_loaded = True
-            logger.info("🎯 CRITICAL COMPONENTS LOADED - SYSTEM READY!")
+        if not load_backend:
+            install_artifacts(new_set)
+            logger.info("✅ Shared components loaded, waiting for workers")
+            return True
+        
+        if new_set.ready:
+            install_artifacts(new_set)
+            logger.info(f"🎯 CRITICAL COMPONENTS LOADED - SYSTEM READY! ({startup_info['seconds']}s, artifacts {new_set.version})")
+            load_registry_models()
             return True
         else:
             logger.error("❌ Critical components failed to load")
@@ -151,6 +546,91 @@ def load_all_components():
         logger.error(f"❌ CRITICAL ERROR loading components: {e}")
         all_components_loaded = False
         return False
+    finally:
+        if load_backend:
+            load_progress.finished.set()
+
+def install_registry_set(name, new_set):
+    """Make `new_set` the artifact set of the registry model `name`"""
+    old_set = model_registry.sets.get(name)
+    attach_micro_batcher(old_set, new_set)
+    model_registry.install(name, new_set)
+    close_micro_batcher(old_set, new_set)
+
+def load_registry_models():
+    """Load the extra models of the registry once the primary set is in service; a model
+    that fails to load only drops out of routing"""
+    if model_registry is None:
+        return
+    for spec in model_registry.specs.values():
+        try:
+            logger.info(f"🔄 Loading registry model {spec.name} from {spec.dir}...")
+            new_set = build_artifact_set(progress=loading.LoadProgress(LOAD_STAGES), bundle=spec)
+            if not new_set.ready:
+                raise RuntimeError('Critical components failed to load')
+            install_registry_set(spec.name, new_set)
+            logger.info(f"✅ Registry model {spec.name} loaded (artifacts {new_set.version}, weight {spec.weight})")
+        except Exception as e:
+            model_registry.mark_failed(spec.name, str(e))
+            logger.error(f"❌ Registry model {spec.name} failed to load: {e}")
+
+def reload_artifacts(trigger, model_name=None):
+    """Load and warm up a fresh artifact set alongside the live one, then swap it in.
+    
+    `model_name` selects a registry model to reload instead of the primary set.
+    Returns False without doing anything if another reload is already running.
+    """
+    global reload_progress
+    
+    if not reload_lock.acquire(blocking=False):
+        return False
+    started = time.perf_counter()
+    spec = model_registry.specs.get(model_name) if model_registry is not None and model_name else None
+    stamps = source_watcher.stamps() if source_watcher is not None and spec is None else None
+    previous = model_registry.sets.get(spec.name) if spec is not None else current_artifacts
+    previous_version = previous.version if previous is not None else None
+    try:
+        reload_progress = loading.LoadProgress(LOAD_STAGES)
+        reload_status.update(state='reloading', trigger=trigger, model=spec.name if spec else primary_model_name(),
+                             started_at=datetime.now().isoformat(), finished_at=None, seconds=None,
+                             previous_version=previous_version, error=None)
+        logger.info(f"🔄 Reloading artifacts of {reload_status['model']} ({trigger})...")
+        
+        new_set = build_artifact_set(progress=reload_progress, bundle=spec)
+        if not new_set.ready:
+            raise RuntimeError('Critical components failed to load')
+        if spec is not None:
+            install_registry_set(spec.name, new_set)
+        else:
+            install_artifacts(new_set)
+        
+        reload_status.update(state='idle', finished_at=datetime.now().isoformat(),
+                             seconds=round(time.perf_counter() - started, 3))
+        logger.info(f"✅ Artifacts reloaded in {reload_status['seconds']}s: {previous_version} -> {new_set.version}")
+        return True
+    except Exception as e:
+        reload_status.update(state='failed', finished_at=datetime.now().isoformat(),
+                             seconds=round(time.perf_counter() - started, 3), error=str(e))
+        logger.error(f"❌ Artifact reload failed, still serving {previous_version}: {e}")
+        return False
+    finally:
+        # Also after a failure, so the same broken files are not retried on every poll
+        if stamps is not None:
+            source_watcher.mark_loaded(stamps)
+        reload_lock.release()
+
+def watch_artifacts():
+    """Reload the artifact set when the model, scaler or label encoder files change"""
+    while True:
+        time.sleep(app.config['ARTIFACT_RELOAD_SECONDS'])
+        if not all_components_loaded:
+            continue
+        changed = source_watcher.poll()
+        if changed:
+            reload_artifacts(f"changed: {', '.join(changed)}")
+
+def reload_status_payload():
+    return dict(reload_status, loading=reload_progress.snapshot() if reload_progress is not None else None)
 
 def extract_biomarkers(confidence, activity_name):
     """Extract military biomarkers from prediction"""
@@ -183,8 +663,10 @@ def make_military_decision(confidence, biomarkers):
     
     return decision, reason, risk_level
 
-def process_single_candidate(sensor_data_array, candidate_id=None):
-    """Process a single candidate's sensor data"""
+def process_single_candidate(sensor_data_array, candidate_id=None, current=None):
+    """Process a single candidate's sensor data with the artifact set `current`"""
+    current = current or current_artifacts
+    clock = metrics.StageClock(SCORING_STAGES)
     try:
         # Validate input
         if len(sensor_data_array) != 561:
@@ -196,55 +678,38 @@ def process_single_candidate(sensor_data_array, candidate_id=None):
         
         # Reshape for processing
         sensor_array = np.array(sensor_data_array, dtype=np.float64).reshape(1, -1)
+        clock.lap('validation')
         
-        # Preprocess
-        try:
-            if hasattr(scaler, 'feature_names_in_'):
-                cols = list(scaler.feature_names_in_)
-                if len(cols) != sensor_array.shape[1]:
-                    cols = [f'feature_{i}' for i in range(sensor_array.shape[1])]
-            else:
-                cols = [f'feature_{i}' for i in range(sensor_array.shape[1])]
-            
-            sensor_df = pd.DataFrame(sensor_array, columns=cols)
-            scaled_data = scaler.transform(sensor_df)
-        except Exception:
-            scaled_data = scaler.transform(sensor_array)
-        
-        reshaped_data = scaled_data.reshape(1, 561, 1)
+        # Resubmitted vectors are answered from the prediction cache
+        if prediction_cache is not None:
+            predictions = prediction_cache.predict(sensor_array, partial(predict_single, current, clock=clock), current.scoring_version)
+        else:
+            predictions = predict_single(current, sensor_array, clock)
+        clock.skip()
         
-        # Make prediction
-        predictions = model.predict(reshaped_data, verbose=0)
         confidence = float(np.max(predictions))
         predicted_class = int(np.argmax(predictions, axis=1)[0])
-        activity = label_encoder.inverse_transform([predicted_class])[0]
+        activity = current.label_encoder.inverse_transform([predicted_class])[0]
+        clock.lap('label_decode')
         
         # Extract biomarkers
         biomarkers = extract_biomarkers(confidence, activity)
+        clock.lap('biomarkers')
         
-        # Get role recommendations from knowledge graph
-        try:
-            if hasattr(knowledge_graph, 'recommend_roles'):
-                kg_result = knowledge_graph.recommend_roles(biomarkers)
-                roles = kg_result['recommended_roles']
-                detected_risks = kg_result.get('detected_risks', [])
-            else:
-                roles = knowledge_graph.get_recommendations(confidence)
-                detected_risks = []
-        except Exception as e:
-            logger.warning(f"KG recommendation failed: {e}, using fallback")
-            if confidence > 0.8:
-                roles = ["Infantry", "Special Forces", "Combat Engineer"]
-            elif confidence > 0.6:
-                roles = ["Military Police", "Logistics", "Signals"]
-            else:
-                roles = ["Medical Evaluation Required"]
-            detected_risks = []
+        # Get role recommendations from knowledge graph (same rule evaluation as batches)
+        roles, detected_risks, contraindicated = inference.recommend_roles_batch(
+            current.knowledge_graph,
+            np.array([confidence]),
+            {name: np.array([value]) for name, value in biomarkers.items()},
+            np.array([activity])
+        )
+        roles, detected_risks, contraindicated = roles[0], detected_risks[0], contraindicated[0]
+        clock.lap('kg')
         
         # Make decision
         decision, reason, risk_level = make_military_decision(confidence, biomarkers)
         
-        return {
+        result = {
             'success': True,
             'candidate_id': candidate_id or 'Unknown',
             'activity': activity,
@@ -254,9 +719,13 @@ def process_single_candidate(sensor_data_array, candidate_id=None):
             'risk_level': risk_level,
             'recommended_roles': roles,
             'detected_risks': detected_risks,
+            'contraindicated_roles': contraindicated,
             'biomarkers': biomarkers,
             'performance_score': round(confidence * 100, 1)
         }
+        clock.lap('decision')
+        submit_shadow(current, sensor_array, [result])
+        return result
         
     except Exception as e:
         logger.error(f"Error processing candidate {candidate_id}: {e}")
@@ -266,31 +735,306 @@ def process_single_candidate(sensor_data_array, candidate_id=None):
             'error': str(e)
         }
 
+def predict_single(current, sensor_array, clock=None):
+    """Run the scaler and the CNN for one `(1, 561)` row; `clock` times the stages"""
+    clock = clock or metrics.StageClock(SCORING_STAGES)
+    clock.skip()
+    if current.micro_batcher is not None:
+        # Scaled and scored together with concurrent /predict calls
+        predictions = current.micro_batcher.predict(
+            sensor_array[0], timeout=app.config['PREDICT_BATCH_TIMEOUT_SECONDS']).reshape(1, -1)
+        clock.lap('micro_batch')
+        return predictions
+    
+    # Preprocess
+    scaled_data = inference.scale_features(current.preprocessor, sensor_array)
+    clock.lap('scaler')
+    
+    reshaped_data = scaled_data.reshape(1, 561, 1)
+    
+    # Make prediction
+    predictions = current.backend.predict(reshaped_data)
+    clock.lap('model')
+    return predictions
+
+def predict_feature_batch(current, features):
+    """Scale raw feature rows and run the CNN over them in one pass"""
+    scaled = inference.scale_features(current.preprocessor, features)
+    return inference.predict_probabilities(current.backend, scaled, app.config['INFERENCE_BATCH_SIZE'])
+
+def score_candidate_chunk(candidate_ids, features, current=None):
+    """Score one chunk of batch rows with the artifact set `current` (default: the live one)"""
+    current = current or current_artifacts
+    # Large chunks are sharded across the scoring processes when PARALLEL_SCORING_WORKERS is set
+    pool = current.scoring_pool if len(candidate_ids) >= app.config['PARALLEL_MIN_ROWS'] else None
+    if pool is not None and pool.retired_at is not None:
+        logger.warning(f"⚠️ Parallel scoring pool is retired, scoring {len(candidate_ids)} rows in-process")
+        PARALLEL_FALLBACK_ROWS.inc(len(candidate_ids))
+        restart_scoring_pool(current)
+        pool = None
+    results = inference.score_batch(
+        features, candidate_ids, current.backend, current.preprocessor, current.label_encoder,
+        current.knowledge_graph, batch_size=app.config['INFERENCE_BATCH_SIZE'],
+        cache=prediction_cache, cache_version=current.scoring_version, pool=pool
+    )
+    submit_shadow(current, features, results)
+    return results
+
+def shadow_artifacts():
+    """The artifact set of the shadow model, or None while it is not loaded"""
+    if model_registry.shadow == model_registry.primary_name:
+        return current_artifacts
+    return model_registry.sets.get(model_registry.shadow)
+
+def shadow_score_fn():
+    """Scoring function of the shadow model for ShadowScorer; bypasses the prediction
+    cache so shadow traffic does not evict entries of the served models"""
+    shadow = shadow_artifacts()
+    if shadow is None or not shadow.ready:
+        return None
+    return lambda features, candidate_ids: inference.score_batch(
+        features, candidate_ids, shadow.backend, shadow.preprocessor, shadow.label_encoder,
+        shadow.knowledge_graph, batch_size=app.config['INFERENCE_BATCH_SIZE']
+    )
+
+def submit_shadow(current, features, results):
+    """Hand served results to the shadow scorer unless they came from the shadow model"""
+    if shadow_scorer is not None and current.name != model_registry.shadow:
+        shadow_scorer.submit(features, results)
+
+def store_chunk(score_chunk, stored_batch, candidate_ids, features):
+    """Score a chunk and append its results to the stored batch"""
+    results = score_chunk(candidate_ids, features)
+    stored_batch.add(results)
+    return results
+
+def finish_batch(stored_batch, started, summary=None, error=None):
+    """Record a finished (or failed) /batch-predict call in the metrics and the result store"""
+    if error is None:
+        seconds = time.perf_counter() - started
+        BATCHES.labels(outcome='completed').inc()
+        BATCH_ROWS.observe(summary['total_candidates'])
+        note_profiled_rows(summary['total_candidates'])
+        if seconds > 0:
+            BATCH_ROWS_PER_SECOND.observe(summary['total_candidates'] / seconds)
+    else:
+        BATCHES.labels(outcome='failed').inc()
+    if stored_batch is not None:
+        stored_batch.finish(summary=summary, error=error)
+
+def note_profiled_rows(rows):
+    """Attach the number of scored candidates to the request's profile, if it is profiled"""
+    session = g.get('profile_session') if has_app_context() else None
+    if session is not None:
+        session.rows = rows
+
+def batch_links(stored_batch):
+    """Batch ID and download URL of a stored batch, for /batch-predict responses"""
+    if stored_batch is None:
+        return {}
+    return {'batch_id': stored_batch.batch_id, 'download_url': f'/batches/{stored_batch.batch_id}/download'}
+
+def pin_artifacts():
+    """The artifact set this request is scored with, kept for the whole request even if
+    a reload swaps in a new one meanwhile; its version is sent in X-Artifact-Version.
+    
+    With a model registry the set is picked by weight, or by the MODEL_HEADER header;
+    raises registry.UnknownModelError for a model that is not loaded.
+    """
+    current = choose_artifacts(request.headers.get(app.config['MODEL_HEADER']))
+    g.artifact_version = current.version
+    g.model_name = current.name
+    return current
+
+def choose_artifacts(requested_model=None):
+    """The live artifact set of the model picked by the registry (primary without one)"""
+    current = current_artifacts
+    if model_registry is not None:
+        name = model_registry.choose(requested_model)
+        if name != model_registry.primary_name:
+            current = model_registry.sets[name]
+    return current
+
+def not_ready_payload():
+    """Body of the 503 sent while components are still loading (or failed to load)"""
+    state = load_progress.state()
+    return {
+        'success': False,
+        'error': 'System failed to load its components.' if state == loading.FAILED
+                 else 'System is still initializing. Please wait and try again.',
+        'status': 'failed' if state == loading.FAILED else 'initializing',
+        'loading': load_progress.snapshot()
+    }
+
+def not_ready_response():
+    """503 for requests that arrive while components are still loading (or failed to load)"""
+    response = jsonify(not_ready_payload())
+    response.status_code = 503
+    response.headers['Retry-After'] = str(app.config['RETRY_AFTER_SECONDS'])
+    return response
+
+def admin_error():
+    """Return an error response unless the request carries the admin token"""
+    if not app.config['ADMIN_TOKEN']:
+        return jsonify({'success': False, 'error': 'Admin endpoints are disabled; set ADMIN_TOKEN'}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), app.config['ADMIN_TOKEN']):
+        return jsonify({'success': False, 'error': 'Invalid admin token'}), 401
+    return None
+
+def wants_ndjson():
+    """Check whether the client asked for a streamed NDJSON batch response"""
+    if request.args.get('stream', '').lower() in ('1', 'true', 'ndjson'):
+        return True
+    return streaming.NDJSON_MIMETYPE in request.headers.get('Accept', '')
+
 # ==================== ROUTES ====================
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+def profile_trigger():
+    """Why this request should be profiled ('flag' or 'sampled'), or None.
+    
+    The PROFILE_HEADER header or `?profile=1` needs the admin token; PROFILE_SAMPLE_RATE
+    picks a share of the requests to PROFILED_ROUTES.
+    """
+    flag = request.headers.get(app.config['PROFILE_HEADER']) or request.args.get('profile')
+    if flag and flag.lower() in ('1', 'true', 'yes') and admin_error() is None:
+        return 'flag'
+    rule = request.url_rule.rule if request.url_rule is not None else None
+    if rule in PROFILED_ROUTES and app.config['PROFILE_SAMPLE_RATE'] > 0 \
+            and random.random() < app.config['PROFILE_SAMPLE_RATE']:
+        return 'sampled'
+    return None
+
+@app.before_request
+def start_profile():
+    trigger = profile_trigger()
+    if trigger is None:
+        return
+    try:
+        g.profile_session = profiling.ProfileSession(app.config['PROFILER'], app.config['PROFILE_INTERVAL_MS'], trigger)
+    except Exception as e:
+        # e.g. cProfile is already running for a concurrent request
+        logger.warning(f"⚠️ Could not profile {request.path}: {e}")
+
+@app.after_request
+def finish_profile(response):
+    """Save the request's profile once the response (including a stream) is closed"""
+    session = g.get('profile_session')
+    if session is None:
+        return response
+    session.view_done()
+    meta = {
+        'route': request.url_rule.rule if request.url_rule is not None else 'unmatched',
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'streamed': response.is_streamed,
+        'model': g.get('model_name'),
+        'artifact_version': g.get('artifact_version'),
+        'worker_pid': os.getpid()
+    }
+    response.call_on_close(partial(session.finish, profile_store, meta))
+    response.headers['X-Profile-Id'] = session.profile_id
+    return response
+
+@app.after_request
+def record_request_metrics(response):
+    """Count the request and observe its latency under the route pattern (not the raw path)"""
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    REQUESTS.labels(route=route, method=request.method, status=response.status_code).inc()
+    if 'request_started' in g:
+        REQUEST_SECONDS.labels(route=route, method=request.method).observe(time.perf_counter() - g.request_started)
+    return response
+
+@app.after_request
+def add_artifact_version(response):
+    """Tell clients which artifact set produced (or would produce) the response"""
+    version = g.get('artifact_version') or (current_artifacts.version if current_artifacts is not None else None)
+    if version:
+        response.headers['X-Artifact-Version'] = version
+    if g.get('model_name'):
+        response.headers[app.config['MODEL_HEADER']] = g.model_name
+    return response
+
 @app.route('/')
 def home():
     return render_template('index.html')
 
 @app.route('/health')
 def health_check():
-    """Detailed health check endpoint"""
+    """Liveness and detailed status; answers while components are still loading"""
+    return jsonify(health_payload())
+
+def health_payload():
+    current = current_artifacts or artifacts.ArtifactSet(None)
     component_status = {
-        'model_loaded': model is not None,
-        'scaler_loaded': scaler is not None,
-        'label_encoder_loaded': label_encoder is not None,
-        'knowledge_graph_loaded': knowledge_graph is not None,
+        'model_loaded': current.backend is not None,
+        'inference_backend': current.backend.name if current.backend is not None else None,
+        'scaler_loaded': current.scaler is not None,
+        'fast_scaler': isinstance(current.preprocessor, preprocessing.AffineScaler),
+        'label_encoder_loaded': current.label_encoder is not None,
+        'knowledge_graph_loaded': current.knowledge_graph is not None,
         'all_components_ready': all_components_loaded
     }
     
-    status = 'healthy' if all_components_loaded else 'initializing'
+    if all_components_loaded:
+        status = 'healthy'
+    else:
+        status = 'failed' if load_progress.state() == loading.FAILED else 'initializing'
     
-    return jsonify({
+    return {
         'status': status,
         'components': component_status,
         'message': 'Military AI Screening System',
-        'system_ready': all_components_loaded
-    })
+        'system_ready': all_components_loaded,
+        'startup': startup_info,
+        'loading': load_progress.snapshot(),
+        'artifacts': current.describe(),
+        'reload': reload_status_payload(),
+        'micro_batching': current.micro_batcher.stats() if current.micro_batcher is not None else {'enabled': False},
+        'parallel_scoring': current.scoring_pool.stats() if current.scoring_pool is not None else {'enabled': False},
+        'prediction_cache': prediction_cache.stats() if prediction_cache is not None else {'enabled': False},
+        'registry': model_registry.describe() if model_registry is not None else {'enabled': False},
+        'shadow': shadow_scorer.stats() if shadow_scorer is not None else {'enabled': False},
+        'result_store': results_db.stats() if results_db is not None else {'enabled': False}
+    }
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics of this worker process"""
+    return Response(metrics_registry.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/ready')
+def readiness_check():
+    """Readiness probe: 200 once every critical component is loaded, 503 before"""
+    if not all_components_loaded:
+        return not_ready_response()
+    return jsonify({'status': 'ready', 'startup': startup_info, 'artifacts': current_artifacts.describe()})
+
+def prediction_payload(result, current):
+    """/predict response body for one scored candidate"""
+    if not result['success']:
+        return result
+    return {
+        'success': result['success'],
+        'model': current.name,
+        'artifact_version': current.version,
+        'prediction': {
+            'activity': result.get('activity', 'N/A'),
+            'confidence': result.get('confidence', 0),
+            'decision': result.get('decision', 'UNKNOWN'),
+            'reason': result.get('reason', 'Processing error'),
+            'risk_level': result.get('risk_level', 'UNKNOWN'),
+            'recommended_roles': result.get('recommended_roles', []),
+            'detected_risks': result.get('detected_risks', []),
+            'contraindicated_roles': result.get('contraindicated_roles', []),
+            'performance_score': result.get('performance_score', 0),
+            'biomarkers': result.get('biomarkers', {})
+        }
+    }
 
 @app.route('/predict', methods=['POST', 'OPTIONS'])
 def predict():
@@ -300,41 +1044,42 @@ def predict():
     
     try:
         if not all_components_loaded:
-            return jsonify({
-                'success': False, 
-                'error': 'System is still initializing. Please wait and try again.'
-            })
+            return not_ready_response()
         
         # Get and validate request data
-        data = request.get_json()
-        if not data or 'sensor_data' not in data:
-            return jsonify({'success': False, 'error': 'No sensor_data provided'})
-        
-        sensor_data = data['sensor_data']
-        candidate_id = data.get('candidate_id', 'Demo')
+        if payloads.is_binary(request.mimetype):
+            # Binary body: one row of features read straight from the request bytes
+            candidate_ids, features = payloads.decode(request.get_data(cache=False), request.mimetype)
+            if len(features) != 1:
+                return jsonify({'success': False, 'error': f'Expected one candidate, got {len(features)}'})
+            sensor_data = features[0]
+            candidate_id = request.args.get('candidate_id') or (candidate_ids[0] if candidate_ids else 'Demo')
+        else:
+            data = request.get_json()
+            if not data or 'sensor_data' not in data:
+                return jsonify({'success': False, 'error': 'No sensor_data provided'})
+            
+            sensor_data = data['sensor_data']
+            candidate_id = data.get('candidate_id', 'Demo')
+        current = pin_artifacts()
         
         # Process candidate
-        result = process_single_candidate(sensor_data, candidate_id)
+        result = process_single_candidate(sensor_data, candidate_id, current)
         
         if result['success']:
             logger.info(f"✅ Prediction for {candidate_id}: {result['activity']} ({result['confidence']:.3f})")
+        note_profiled_rows(1)
         
         # Format response for frontend
-        return jsonify({
-            'success': result['success'],
-            'prediction': {
-                'activity': result.get('activity', 'N/A'),
-                'confidence': result.get('confidence', 0),
-                'decision': result.get('decision', 'UNKNOWN'),
-                'reason': result.get('reason', 'Processing error'),
-                'risk_level': result.get('risk_level', 'UNKNOWN'),
-                'recommended_roles': result.get('recommended_roles', []),
-                'detected_risks': result.get('detected_risks', []),
-                'performance_score': result.get('performance_score', 0),
-                'biomarkers': result.get('biomarkers', {})
-            }
-        } if result['success'] else result)
+        serialize_started = time.perf_counter()
+        response = jsonify(prediction_payload(result, current))
+        SCORING_STAGES['serialization'].observe(time.perf_counter() - serialize_started)
+        return response
         
+    except streaming.BatchValidationError as e:
+        return jsonify({'success': False, 'error': str(e)})
+    except registry.UnknownModelError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         logger.error(f"❌ Prediction endpoint error: {e}")
         return jsonify({'success': False, 'error': str(e)})
@@ -344,162 +1089,409 @@ def batch_predict():
     """Batch CSV prediction endpoint"""
     try:
         if not all_components_loaded:
-            return jsonify({
-                'success': False,
-                'error': 'System is still initializing.'
-            })
-        
-        # Check if file was uploaded
-        if 'file' not in request.files:
-            return jsonify({'success': False, 'error': 'No file uploaded'})
-        
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'success': False, 'error': 'No file selected'})
+            return not_ready_response()
         
-        if not allowed_file(file.filename):
-            return jsonify({'success': False, 'error': 'Only CSV files are allowed'})
+        if payloads.is_binary(request.mimetype):
+            # Binary body: the feature matrix is a view of the request bytes
+            candidate_ids, features = payloads.decode(request.get_data(cache=False), request.mimetype)
+            logger.info(f"📦 Processing {request.mimetype} batch: {len(features)} candidates")
+            chunks = payloads.iter_chunks(candidate_ids, features, app.config['BATCH_CHUNK_ROWS'])
+        else:
+            # Check if file was uploaded
+            upload_error = validate_upload()
+            if upload_error:
+                return jsonify({'success': False, 'error': upload_error})
+            
+            file = request.files['file']
+            upload_format = columnar.upload_format(file.filename)
+            logger.info(f"📁 Processing {upload_format} file: {file.filename}")
+            chunks = columnar.iter_upload_chunks(file, upload_format, app.config['BATCH_CHUNK_ROWS'])
         
-        logger.info(f"📁 Processing CSV file: {file.filename}")
+        # Every chunk of the upload is scored with the same artifact set
+        current = pin_artifacts()
+        started = time.perf_counter()
+        score_chunk = partial(score_candidate_chunk, current=current)
         
-        # Read CSV
-        df = pd.read_csv(file)
-        logger.info(f"CSV shape: {df.shape}")
+        # Validate the upload on its first chunk before anything is stored
+        chunks = streaming.prefetch_first(chunks)
         
-        # Validate structure
-        if df.shape[1] < 561:
-            return jsonify({
-                'success': False,
-                'error': f'CSV must have at least 561 feature columns. Found: {df.shape[1]}'
-            })
+        # Keep the results server-side so the client can download them by batch ID
+        stored_batch = None
+        if results_db is not None:
+            stored_batch = results_db.start_batch(
+                request.files['file'].filename if 'file' in request.files else request.mimetype,
+                current.name, current.version
+            )
+            score_chunk = partial(store_chunk, score_chunk, stored_batch)
+        on_finish = partial(finish_batch, stored_batch, started)
         
-        # Check for candidate ID column
-        has_id = 'candidate_id' in df.columns or 'id' in df.columns
+        if wants_ndjson():
+            # Stream each scored chunk as it completes, summary last
+            return Response(
+                stream_with_context(streaming.iter_ndjson_results(
+                    chunks, score_chunk,
+                    on_finish=on_finish,
+                    summary_extra=batch_links(stored_batch)
+                )),
+                mimetype=streaming.NDJSON_MIMETYPE,
+                headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'}
+            )
         
-        if has_id:
-            id_col = 'candidate_id' if 'candidate_id' in df.columns else 'id'
-            candidate_ids = df[id_col].tolist()
-            feature_cols = [col for col in df.columns if col != id_col][:561]
-        else:
-            candidate_ids = [f"Candidate_{i+1:03d}" for i in range(len(df))]
-            feature_cols = df.columns[:561].tolist()
-        
-        # Process all candidates
+        # Read and score the CSV one chunk of rows at a time
         results = []
-        for idx in range(len(df)):
-            sensor_data = df.iloc[idx][feature_cols].values
-            candidate_id = candidate_ids[idx]
-            
-            result = process_single_candidate(sensor_data, candidate_id)
-            results.append(result)
-        
-        # Calculate summary
-        successful = [r for r in results if r.get('success', False)]
-        pass_count = sum(1 for r in successful if 'PASS' in r.get('decision', ''))
-        fail_count = len(successful) - pass_count
-        
-        summary = {
-            'total_candidates': len(results),
-            'successful_screenings': len(successful),
-            'failed_screenings': len(results) - len(successful),
-            'pass_count': pass_count,
-            'fail_count': fail_count,
-            'pass_rate': round((pass_count / len(successful) * 100), 1) if successful else 0
-        }
+        summary = streaming.BatchSummary()
+        try:
+            for candidate_ids, features in chunks:
+                chunk_results = score_chunk(candidate_ids, features)
+                summary.add(chunk_results)
+                results.extend(chunk_results)
+                logger.info(f"Scored {summary.total} candidates so far")
+        except Exception as e:
+            on_finish(error=str(e))
+            raise
+        
+        summary = summary.as_dict()
+        on_finish(summary=summary)
         
         logger.info(f"✅ Batch processing complete: {len(results)} candidates")
         
-        return jsonify({
+        return jsonify(dict({
             'success': True,
+            'model': current.name,
+            'artifact_version': current.version,
             'summary': summary,
             'results': results
-        })
+        }, **batch_links(stored_batch)))
         
+    except streaming.BatchValidationError as e:
+        return jsonify({'success': False, 'error': str(e)})
+    except registry.UnknownModelError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         logger.error(f"❌ Batch prediction error: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/download-template')
 def download_template():
-    """Download CSV template for batch screening"""
+    """Download CSV template for batch screening (`?rows=N` sample candidates, default 5)"""
     try:
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Header
-        header = ['candidate_id'] + [f'feature_{i}' for i in range(561)]
-        writer.writerow(header)
-        
-        # Sample rows with realistic data
-        for i in range(5):
-            row = [f'CANDIDATE_{i+1:03d}'] + list(np.random.randn(561))
-            writer.writerow(row)
-        
-        output.seek(0)
-        return send_file(
-            io.BytesIO(output.getvalue().encode('utf-8')),
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name='military_screening_template.csv'
-        )
+        rows = int(request.args.get('rows', csv_export.DEFAULT_TEMPLATE_ROWS))
+        if not 0 <= rows <= TEMPLATE_MAX_ROWS:
+            return jsonify({'success': False, 'error': f'rows must be between 0 and {TEMPLATE_MAX_ROWS}'})
+        
+        # Sample rows with realistic data, generated and streamed a block at a time
+        return csv_response(csv_export.iter_template_csv(rows), 'military_screening_template')
         
     except Exception as e:
         logger.error(f"Template download error: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
+def csv_response(chunks, name):
+    """Stream encoded CSV blocks as an attachment"""
+    return Response(
+        chunks,
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={name}.csv'}
+    )
+
+def csv_download(results, name):
+    """Stream results as a CSV attachment, a block of rows at a time"""
+    # The first block is built before the response starts, so a malformed payload is still reported as an error
+    return csv_response(streaming.prefetch_first(csv_export.iter_results_csv(results)), name)
+
+def results_download(results, fmt, name):
+    """Send stored results in the requested export format"""
+    if fmt == columnar.CSV_FORMAT:
+        return csv_download(results, name)
+    return columnar_download(results, fmt, name)
+
+def columnar_download(results, fmt, name):
+    """Send results as a Parquet or Feather attachment"""
+    mimetype, extension = columnar.EXPORT_FORMATS[fmt]
+    return send_file(
+        columnar.write_results(results, fmt),
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=f'{name}.{extension}'
+    )
+
+def export_format():
+    """Requested download format (`?format=csv|parquet|feather`) or an error message"""
+    return parse_export_format(request.args.get('format'))
+
+def parse_export_format(value):
+    """`(format, None)` for a known export format name (default csv), else `(None, error)`"""
+    fmt = (value or columnar.CSV_FORMAT).lower()
+    if fmt != columnar.CSV_FORMAT and fmt not in columnar.EXPORT_FORMATS:
+        return None, f"Unknown format {fmt!r}; use csv, {', '.join(columnar.EXPORT_FORMATS)}"
+    return fmt, None
+
 @app.route('/download-results', methods=['POST'])
 def download_results():
-    """Download screening results as CSV"""
+    """Download screening results as CSV (or `?format=parquet|feather`)"""
     try:
         data = request.json
         results = data.get('results', [])
+        if not isinstance(results, list):
+            return jsonify({'success': False, 'error': 'results must be a list of screening results'})
+        
+        fmt, format_error = export_format()
+        if format_error:
+            return jsonify({'success': False, 'error': format_error})
         
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Header
-        writer.writerow([
-            'Candidate ID', 'Activity', 'Confidence', 'Decision',
-            'Risk Level', 'Reason', 'Recommended Roles',
-            'Movement Quality', 'Fatigue Index', 'Movement Smoothness', 'Performance Score'
-        ])
-        
-        # Data rows
-        for result in results:
-            if result.get('success', False):
-                biomarkers = result.get('biomarkers', {})
-                writer.writerow([
-                    result.get('candidate_id', 'N/A'),
-                    result.get('activity', 'N/A'),
-                    f"{result.get('confidence', 0):.3f}",
-                    result.get('decision', 'N/A'),
-                    result.get('risk_level', 'N/A'),
-                    result.get('reason', 'N/A'),
-                    ', '.join(result.get('recommended_roles', [])),
-                    f"{biomarkers.get('movement_quality', 0):.3f}",
-                    f"{biomarkers.get('fatigue_index', 0):.3f}",
-                    f"{biomarkers.get('movement_smoothness', 0):.3f}",
-                    result.get('performance_score', 0)
-                ])
-        
-        output.seek(0)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        return send_file(
-            io.BytesIO(output.getvalue().encode('utf-8')),
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=f'screening_results_{timestamp}.csv'
-        )
+        return results_download(results, fmt, f'screening_results_{timestamp}')
         
     except Exception as e:
         logger.error(f"Results download error: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
+# ==================== ADMIN ====================
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Load a new artifact set in the background and swap it in once warmed up
+    (`?model=<name>` reloads a registry model instead of the primary set)"""
+    error = admin_error()
+    if error:
+        return error
+    if not all_components_loaded:
+        return not_ready_response()
+    model_name = request.args.get('model')
+    if model_name and model_name != primary_model_name() and (model_registry is None or model_name not in model_registry.specs):
+        return jsonify({'success': False, 'error': f'Unknown model {model_name!r}'}), 404
+    if reload_lock.locked():
+        return jsonify({'success': False, 'error': 'A reload is already running', 'reload': reload_status_payload()}), 409
+    
+    threading.Thread(target=reload_artifacts, args=('admin', model_name), name='artifact-reload', daemon=True).start()
+    return jsonify({'success': True, 'artifacts': current_artifacts.describe(), 'reload': reload_status_payload()}), 202
+
+@app.route('/admin/profiles')
+def list_profiles():
+    """Metadata of the stored request profiles, newest first"""
+    error = admin_error()
+    if error:
+        return error
+    return jsonify({'success': True, 'profiles': profile_store.list()})
+
+@app.route('/admin/profiles/<profile_id>')
+def profile_status(profile_id):
+    error = admin_error()
+    if error:
+        return error
+    meta = profile_store.get(profile_id)
+    if meta is None:
+        return jsonify({'success': False, 'error': 'Profile not found'}), 404
+    return jsonify(dict(meta, success=True, download_url=f'/admin/profiles/{profile_id}/download'))
+
+@app.route('/admin/profiles/<profile_id>/download')
+def profile_download(profile_id):
+    """The profile file: collapsed stacks (text) or a pstats dump"""
+    error = admin_error()
+    if error:
+        return error
+    meta = profile_store.get(profile_id)
+    if meta is None:
+        return jsonify({'success': False, 'error': 'Profile not found'}), 404
+    return send_file(
+        os.path.abspath(profile_store.file_path(meta)),
+        mimetype='text/plain' if meta['profiler'] == profiling.SAMPLING else 'application/octet-stream',
+        as_attachment=True,
+        download_name=meta['file']
+    )
+
+@app.route('/admin/reload', methods=['GET'])
+def admin_reload_status():
+    """Report the state of the last reload and the artifact set in use"""
+    error = admin_error()
+    if error:
+        return error
+    current = current_artifacts
+    return jsonify({
+        'success': True,
+        'artifacts': current.describe() if current is not None else None,
+        'reload': reload_status_payload()
+    })
+
+# ==================== BATCH JOBS ====================
+
+def score_job_chunk(candidate_ids, features):
+    """Score a chunk for a background job, waiting for components that are still loading"""
+    if not all_components_loaded and not load_progress.ready.wait(JOB_READY_TIMEOUT_SECONDS):
+        raise RuntimeError('System is still initializing.')
+    return score_candidate_chunk(candidate_ids, features)
+
+def job_status_payload(state):
+    """Add progress percentage and follow-up URLs to a stored job state"""
+    job_id = state['job_id']
+    total = state.get('rows_total') or 0
+    return dict(
+        state,
+        progress=round(state['rows_done'] / total * 100, 1) if total else (100.0 if state['status'] == 'completed' else 0.0),
+        status_url=f'/batch-jobs/{job_id}',
+        results_url=f'/batch-jobs/{job_id}/results',
+        download_url=f'/batch-jobs/{job_id}/download'
+    )
+
+@app.route('/batch-jobs', methods=['POST'])
+def submit_batch_job():
+    """Queue a CSV upload for background scoring and return its job ID"""
+    try:
+        if not all_components_loaded:
+            return not_ready_response()
+        
+        upload_error = validate_upload()
+        if upload_error:
+            return jsonify({'success': False, 'error': upload_error})
+        
+        file = request.files['file']
+        state = job_manager.submit(file, secure_filename(file.filename))
+        return jsonify({'success': True, 'job': job_status_payload(state)}), 202
+        
+    except Exception as e:
+        logger.error(f"❌ Batch job submission error: {e}")
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/batch-jobs', methods=['GET'])
+def list_batch_jobs():
+    """List known batch jobs, newest first"""
+    return jsonify({'success': True, 'jobs': [job_status_payload(s) for s in job_manager.list()]})
+
+@app.route('/batch-jobs/<job_id>')
+def batch_job_status(job_id):
+    """Report job status and progress (rows done, rows per second, ETA)"""
+    state = job_manager.get(job_id)
+    if state is None:
+        return jsonify({'success': False, 'error': 'Unknown job ID'}), 404
+    return jsonify({'success': True, 'job': job_status_payload(state)})
+
+@app.route('/batch-jobs/<job_id>/results')
+def batch_job_results(job_id):
+    """Return the results of a completed job, as JSON or streamed NDJSON"""
+    state = job_manager.get(job_id)
+    if state is None:
+        return jsonify({'success': False, 'error': 'Unknown job ID'}), 404
+    if state['status'] != 'completed':
+        return jsonify({'success': False, 'error': f"Job is {state['status']}", 'job': job_status_payload(state)}), 409
+    
+    if wants_ndjson():
+        lines = (streaming.ndjson_line({'type': 'result', 'result': r}) for r in job_manager.iter_results(job_id))
+        tail = [streaming.ndjson_line({'type': 'summary', 'success': True, 'summary': state['summary']})]
+        return Response(itertools.chain(lines, tail), mimetype=streaming.NDJSON_MIMETYPE)
+    
+    return jsonify({
+        'success': True,
+        'summary': state['summary'],
+        'results': list(job_manager.iter_results(job_id))
+    })
+
+@app.route('/batch-jobs/<job_id>/download')
+def batch_job_download(job_id):
+    """Download the results of a completed job as CSV (or `?format=parquet|feather`)"""
+    state = job_manager.get(job_id)
+    if state is None:
+        return jsonify({'success': False, 'error': 'Unknown job ID'}), 404
+    if state['status'] != 'completed':
+        return jsonify({'success': False, 'error': f"Job is {state['status']}"}), 409
+    
+    fmt, format_error = export_format()
+    if format_error:
+        return jsonify({'success': False, 'error': format_error}), 400
+    return results_download(job_manager.iter_results(job_id), fmt, f'screening_results_{job_id}')
+
+# ==================== STORED BATCHES ====================
+
+@app.route('/batches/<batch_id>')
+def stored_batch_status(batch_id):
+    """Report a stored /batch-predict batch: status, row count, summary and expiry"""
+    if results_db is None:
+        return jsonify({'success': False, 'error': 'The result store is disabled'}), 404
+    batch = results_db.get(batch_id)
+    if batch is None:
+        return jsonify({'success': False, 'error': 'Unknown or expired batch ID'}), 404
+    return jsonify({'success': True, 'batch': dict(batch, download_url=f'/batches/{batch_id}/download')})
+
+@app.route('/batches/<batch_id>/download')
+def stored_batch_download(batch_id):
+    """Stream the results of a stored batch as CSV (or `?format=parquet|feather`)"""
+    if results_db is None:
+        return jsonify({'success': False, 'error': 'The result store is disabled'}), 404
+    batch = results_db.get(batch_id)
+    if batch is None:
+        return jsonify({'success': False, 'error': 'Unknown or expired batch ID'}), 404
+    if batch['status'] != 'completed':
+        return jsonify({'success': False, 'error': f"Batch is {batch['status']}"}), 409
+    
+    fmt, format_error = export_format()
+    if format_error:
+        return jsonify({'success': False, 'error': format_error}), 400
+    return results_download(results_db.iter_results(batch_id), fmt, f'screening_results_{batch_id}')
+
 # ==================== INITIALIZATION ====================
 
-# Initialize components when app starts
-logger.info("🚀 Military AI Screening System Starting...")
-load_all_components()
+def start_worker_services():
+    """Start the per-process background threads (batch jobs, file watchers); the
+    micro-batcher belongs to the artifact set and starts with it"""
+    global job_manager, source_watcher, shadow_scorer
+    
+    job_manager = jobs.JobManager(
+        score_job_chunk,
+        jobs_dir=app.config['BATCH_JOBS_DIR'],
+        max_workers=app.config['BATCH_JOB_WORKERS'],
+        chunk_rows=app.config['BATCH_CHUNK_ROWS'],
+        retention_hours=app.config['BATCH_JOB_RETENTION_HOURS'],
+        max_jobs=app.config['BATCH_JOB_MAX_JOBS']
+    )
+    if app.config['KG_RELOAD_SECONDS'] > 0:
+        threading.Thread(target=watch_knowledge_graph, name='kg-watcher', daemon=True).start()
+    if app.config['ARTIFACT_RELOAD_SECONDS'] > 0:
+        # The KG file has its own, lighter reload above
+        source_watcher = artifacts.SourceWatcher([p for p in artifact_sources() if p != app.config['KG_PATH']])
+        threading.Thread(target=watch_artifacts, name='artifact-watcher', daemon=True).start()
+    if model_registry is not None and model_registry.shadow:
+        shadow_scorer = registry.ShadowScorer(
+            model_registry.shadow, shadow_score_fn,
+            max_pending_rows=app.config['SHADOW_MAX_PENDING_ROWS'],
+            sample_rate=app.config['SHADOW_SAMPLE_RATE']
+        )
+
+def init_worker():
+    """Finish setup in a gunicorn worker forked from a preloaded master (see gunicorn_conf.py)"""
+    logger.info(f"🔄 Initializing worker {os.getpid()}...")
+    start_worker_services()
+    if app.config['BACKGROUND_LOADING']:
+        loading.run_in_background(load_worker_backend, name=f'backend-loader-{os.getpid()}')
+    else:
+        load_worker_backend()
+
+def load_worker_backend():
+    """Load this worker's inference backend on top of the preloaded shared artifacts"""
+    try:
+        shared = current_artifacts
+        if shared is not None and shared.scaler is not None and shared.label_encoder is not None:
+            model, backend = load_inference_backend(shared.model_path, load_progress)
+            install_artifacts(shared.replace(shared.version, model=model, backend=backend))
+            logger.info(f"🎯 Worker {os.getpid()} ready ({startup_info['seconds']}s)")
+            load_registry_models()
+    except Exception as e:
+        logger.error(f"❌ CRITICAL ERROR loading inference backend in worker {os.getpid()}: {e}")
+    finally:
+        load_progress.finished.set()
+
+# Initialize components when app starts (not in parallel scoring workers, which
+# re-import the main script, e.g. `python app.py`, before they load their own model)
+if not parallel.in_worker():
+    logger.info("🚀 Military AI Screening System Starting...")
+    if app.config['PRELOAD_APP']:
+        # Running in the gunicorn master: load shareable artifacts once, workers finish in init_worker()
+        load_all_components(load_backend=False)
+    else:
+        # Start accepting requests right away; /ready and the scoring endpoints answer 503 until loaded
+        start_worker_services()
+        if app.config['BACKGROUND_LOADING']:
+            loading.run_in_background(load_all_components)
+        else:
+            load_all_components()
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
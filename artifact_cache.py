@@ -0,0 +1,184 @@
+"""
+Content-addressed cache of extracted and pre-converted model artifacts.
+
+On ephemeral disks `military_screening_cnn.h5` is missing on every boot, so the app
+decompresses the .7z archive with py7zr and unpickles scikit-learn objects each time.
+`ArtifactCache` stores the results of that work under a directory named after a
+SHA-256 digest of the source artifacts:
+
+    <cache_dir>/<digest>/manifest.json         digest, source files, creation time
+    <cache_dir>/<digest>/model.h5              the extracted Keras model
+    <cache_dir>/<digest>/scaler_mean.npy       float32 scaler mean
+    <cache_dir>/<digest>/scaler_inv_scale.npy  float32 1 / scaler scale
+    <cache_dir>/<digest>/encoder_classes.npy   label encoder classes
+    <cache_dir>/<digest>/knowledge_graph.json  KG document (when the KG is a kg.MilitaryScreeningKG)
+
+Hashing the sources is far cheaper than extracting them, so startup validates the
+digest and loads straight from the matching entry; any change to a source artifact
+yields a new digest and the cache is rebuilt on that boot. Entries are written to a
+temporary directory and renamed into place, so a crash never leaves a half entry.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+import kg
+from preprocessing import AffineScaler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = '.artifact_cache'
+CACHE_FORMAT_VERSION = 2
+
+MANIFEST_FILE = 'manifest.json'
+MODEL_FILE = 'model.h5'
+SCALER_MEAN_FILE = 'scaler_mean.npy'
+SCALER_INV_SCALE_FILE = 'scaler_inv_scale.npy'
+ENCODER_CLASSES_FILE = 'encoder_classes.npy'
+KG_FILE = 'knowledge_graph.json'
+
+
+class LabelDecoder:
+    """Minimal stand-in for a fitted LabelEncoder: maps class indices back to labels"""
+
+    def __init__(self, classes: np.ndarray):
+        self.classes_ = np.asarray(classes)
+
+    def inverse_transform(self, indices) -> np.ndarray:
+        return self.classes_[np.asarray(indices, dtype=np.intp)]
+
+
+def file_digest(path: str, hasher=None):
+    hasher = hasher or hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            hasher.update(block)
+    return hasher
+
+
+class CacheEntry:
+    """A validated cache directory"""
+
+    def __init__(self, path: str, manifest: Dict[str, Any]):
+        self.path = path
+        self.manifest = manifest
+        self.digest = manifest['digest']
+
+    @property
+    def model_path(self) -> Optional[str]:
+        path = os.path.join(self.path, MODEL_FILE)
+        return path if os.path.exists(path) else None
+
+    def load_scaler(self) -> AffineScaler:
+        mean = np.load(os.path.join(self.path, SCALER_MEAN_FILE), allow_pickle=False)
+        inv_scale = np.load(os.path.join(self.path, SCALER_INV_SCALE_FILE), allow_pickle=False)
+        return AffineScaler(mean, 1.0 / inv_scale.astype(np.float64))
+
+    def load_label_encoder(self) -> LabelDecoder:
+        return LabelDecoder(np.load(os.path.join(self.path, ENCODER_CLASSES_FILE), allow_pickle=False))
+
+    def load_knowledge_graph(self) -> Optional[kg.MilitaryScreeningKG]:
+        path = os.path.join(self.path, KG_FILE)
+        if not os.path.exists(path):
+            return None
+        return kg.load_json(path)
+
+
+class ArtifactCache:
+    """Looks up and stores pre-converted artifacts keyed by a digest of their sources.
+
+    sources: ordered list of source files; missing files are skipped when hashing,
+             so e.g. either the .7z archive or the bare .h5 can be the model source.
+    """
+
+    def __init__(self, cache_dir: str, sources: List[str]):
+        self.cache_dir = cache_dir
+        self.sources = sources
+        self._digest = None
+
+    def present_sources(self) -> List[str]:
+        return [path for path in self.sources if os.path.exists(path)]
+
+    def digest(self) -> str:
+        """SHA-256 over the names and contents of the present source files"""
+        if self._digest is None:
+            hasher = hashlib.sha256(f'artifact-cache-v{CACHE_FORMAT_VERSION}'.encode())
+            for path in self.present_sources():
+                hasher.update(os.path.basename(path).encode() + b'\0')
+                file_digest(path, hasher)
+            self._digest = hasher.hexdigest()
+        return self._digest
+
+    def lookup(self) -> Optional[CacheEntry]:
+        """Return the entry for the current sources, or None on a miss"""
+        path = os.path.join(self.cache_dir, self.digest())
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ Unreadable artifact cache manifest {manifest_path}: {e}")
+            return None
+
+        required = [SCALER_MEAN_FILE, SCALER_INV_SCALE_FILE, ENCODER_CLASSES_FILE]
+        if manifest.get('digest') != self.digest() or not all(os.path.exists(os.path.join(path, f)) for f in required):
+            logger.warning(f"⚠️ Artifact cache entry {path} is incomplete, ignoring it")
+            return None
+        return CacheEntry(path, manifest)
+
+    def store(self, model_path: Optional[str], scaler: AffineScaler, label_encoder,
+              knowledge_graph) -> Optional[CacheEntry]:
+        """Write a new entry for the current sources from freshly loaded artifacts.
+
+        `scaler` must be the verified AffineScaler. `model_path` may be None (e.g. when
+        serving a TFLite export) to cache only the preprocessing artifacts.
+        """
+        classes = getattr(label_encoder, 'classes_', None)
+        if not isinstance(scaler, AffineScaler) or classes is None:
+            logger.warning("⚠️ Scaler or label encoder cannot be cached, skipping artifact cache")
+            return None
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        final_path = os.path.join(self.cache_dir, self.digest())
+        tmp_path = tempfile.mkdtemp(prefix='.tmp-', dir=self.cache_dir)
+        try:
+            if model_path and os.path.exists(model_path):
+                shutil.copy2(model_path, os.path.join(tmp_path, MODEL_FILE))
+
+            np.save(os.path.join(tmp_path, SCALER_MEAN_FILE), scaler.mean)
+            np.save(os.path.join(tmp_path, SCALER_INV_SCALE_FILE), scaler.inv_scale)
+            np.save(os.path.join(tmp_path, ENCODER_CLASSES_FILE), np.asarray(classes), allow_pickle=False)
+
+            if isinstance(knowledge_graph, kg.MilitaryScreeningKG):
+                try:
+                    kg.save_json(knowledge_graph, os.path.join(tmp_path, KG_FILE))
+                except (TypeError, ValueError) as e:
+                    logger.warning(f"⚠️ Knowledge graph rules cannot be stored as JSON, not caching them: {e}")
+
+            manifest = {
+                'digest': self.digest(),
+                'format_version': CACHE_FORMAT_VERSION,
+                'sources': [os.path.basename(p) for p in self.present_sources()],
+                'created_at': datetime.now().isoformat()
+            }
+            with open(os.path.join(tmp_path, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+
+            if os.path.exists(final_path):
+                shutil.rmtree(final_path)
+            os.replace(tmp_path, final_path)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+        logger.info(f"✅ Artifacts cached under {final_path}")
+        return CacheEntry(final_path, manifest)
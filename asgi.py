@@ -0,0 +1,443 @@
+"""
+ASGI serving mode.
+
+Under gunicorn's gthread workers a slow upload, a template download or a health probe
+holds one of the few request threads for its whole duration, and those are the same
+threads that run inference. `application` serves the app on an event loop instead:
+
+    /predict, /batch-predict, /download-template, /download-results, /health
+        native async endpoints: request bodies are received on the loop, CSV / Parquet
+        parsing, JSON encoding and result-store writes run in the default thread pool,
+        and responses are streamed from the loop
+    scoring (scaler, CNN, KG rules)
+        runs on a dedicated pool of ASGI_INFERENCE_THREADS threads; at most
+        ASGI_MAX_PENDING scoring requests are admitted at a time, the rest get a 503
+    every other route
+        the Flask app, through a WSGI adapter
+
+Connection concurrency and model parallelism are therefore tuned separately. The
+loaded artifacts, model registry, caches, result store and metrics are the ones in
+app.py. Run with `uvicorn asgi:application`, or under gunicorn with
+`-k uvicorn.workers.UvicornWorker`.
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app as web
+import columnar
+import csv_export
+import payloads
+import registry
+import streaming
+
+logger = logging.getLogger(__name__)
+
+inference_executor = ThreadPoolExecutor(max_workers=web.app.config['ASGI_INFERENCE_THREADS'],
+                                        thread_name_prefix='inference')
+
+
+class InferenceBusy(Exception):
+    """Raised when ASGI_MAX_PENDING scoring requests are already admitted"""
+
+
+class PayloadTooLarge(Exception):
+    """Raised when a request body exceeds MAX_CONTENT_LENGTH"""
+
+
+class InferenceAdmission:
+    """Counts admitted scoring requests; only touched from the event loop, so no lock"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.pending = 0
+
+    def acquire(self):
+        """Admit one scoring request, checking and counting it in one step (no await in
+        between); returns the function that gives the slot back, safe to call twice"""
+        if self.pending >= self.limit:
+            raise InferenceBusy(f'{self.pending} scoring requests already in progress')
+        self.pending += 1
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.pending -= 1
+        return release
+
+    @contextlib.contextmanager
+    def slot(self):
+        release = self.acquire()
+        try:
+            yield
+        finally:
+            release()
+
+
+admission = InferenceAdmission(web.app.config['ASGI_MAX_PENDING'])
+
+
+async def run_inference(fn, *args):
+    """Run CPU-bound scoring on the inference pool"""
+    return await asyncio.get_running_loop().run_in_executor(inference_executor, partial(fn, *args))
+
+
+# ---------- request / response helpers ----------
+
+def mimetype_of(request):
+    return request.headers.get('content-type', '').split(';')[0].strip().lower()
+
+
+def check_content_length(request):
+    length = request.headers.get('content-length')
+    if length is not None and int(length) > web.app.config['MAX_CONTENT_LENGTH']:
+        raise PayloadTooLarge()
+
+
+async def read_body(request):
+    """The request body, received without blocking; MAX_CONTENT_LENGTH applies"""
+    check_content_length(request)
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > web.app.config['MAX_CONTENT_LENGTH']:
+            raise PayloadTooLarge()
+    return bytes(body)
+
+
+def json_bytes(payload):
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(payload, status_code=200, headers=None, body=None):
+    return Response(body if body is not None else json_bytes(payload), status_code=status_code,
+                    media_type='application/json', headers=headers)
+
+
+def error_response(message, status_code=200):
+    return json_response({'success': False, 'error': message}, status_code)
+
+
+def model_headers(current):
+    return {'X-Artifact-Version': current.version, web.app.config['MODEL_HEADER']: current.name}
+
+
+def attachment(name):
+    return {'Content-Disposition': f'attachment; filename={name}'}
+
+
+def not_ready():
+    return json_response(web.not_ready_payload(), 503,
+                         {'Retry-After': str(web.app.config['RETRY_AFTER_SECONDS'])})
+
+
+def common_errors(handler):
+    """Map the errors shared by the scoring endpoints onto responses, as app.py does"""
+    async def endpoint(request):
+        try:
+            return await handler(request)
+        except streaming.BatchValidationError as e:
+            return error_response(str(e))
+        except registry.UnknownModelError as e:
+            return error_response(str(e), 400)
+        except InferenceBusy as e:
+            response = error_response(f'Server is busy: {e}. Please retry.', 503)
+            response.headers['Retry-After'] = str(web.app.config['RETRY_AFTER_SECONDS'])
+            return response
+        except PayloadTooLarge:
+            return error_response('Request body is too large', 413)
+        except Exception as e:
+            logger.error(f"❌ {request.url.path} error: {e}")
+            return error_response(str(e))
+    return endpoint
+
+
+def route(path, handler, methods):
+    """A Route that records the same request metrics as the Flask hooks"""
+    async def endpoint(request):
+        started = time.perf_counter()
+        response = await handler(request)
+        if 'x-artifact-version' not in response.headers and web.current_artifacts is not None:
+            response.headers['X-Artifact-Version'] = web.current_artifacts.version
+        web.REQUESTS.labels(route=path, method=request.method, status=response.status_code).inc()
+        web.REQUEST_SECONDS.labels(route=path, method=request.method).observe(time.perf_counter() - started)
+        return response
+    return Route(path, endpoint, methods=methods)
+
+
+# ---------- endpoints ----------
+
+@common_errors
+async def predict(request):
+    """Single candidate prediction endpoint"""
+    if request.method == 'OPTIONS':
+        return Response(status_code=200)
+    if not web.all_components_loaded:
+        return not_ready()
+
+    mimetype = mimetype_of(request)
+    body = await read_body(request)
+    if payloads.is_binary(mimetype):
+        # Binary body: one row of features read straight from the request bytes
+        candidate_ids, features = payloads.decode(body, mimetype)
+        if len(features) != 1:
+            return error_response(f'Expected one candidate, got {len(features)}')
+        sensor_data = features[0]
+        candidate_id = request.query_params.get('candidate_id') or (candidate_ids[0] if candidate_ids else 'Demo')
+    else:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict) or 'sensor_data' not in data:
+            return error_response('No sensor_data provided')
+        sensor_data = data['sensor_data']
+        candidate_id = data.get('candidate_id', 'Demo')
+    current = web.choose_artifacts(request.headers.get(web.app.config['MODEL_HEADER']))
+
+    with admission.slot():
+        result = await run_inference(web.process_single_candidate, sensor_data, candidate_id, current)
+
+    if result['success']:
+        logger.info(f"✅ Prediction for {candidate_id}: {result['activity']} ({result['confidence']:.3f})")
+
+    serialize_started = time.perf_counter()
+    response = json_response(web.prediction_payload(result, current), headers=model_headers(current))
+    web.SCORING_STAGES['serialization'].observe(time.perf_counter() - serialize_started)
+    return response
+
+
+async def iter_scored_chunks(chunks, current, stored_batch):
+    """Parse the next chunk in the thread pool, score it on the inference pool"""
+    while True:
+        chunk = await run_in_threadpool(next, chunks, None)
+        if chunk is None:
+            return
+        candidate_ids, features = chunk
+        results = await run_inference(web.score_candidate_chunk, candidate_ids, features, current)
+        if stored_batch is not None:
+            await run_in_threadpool(stored_batch.add, results)
+        yield results
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """A streamed response that holds an admission slot until it has been sent, however it ends
+    (the body generator may never start if the client disconnects first)"""
+
+    def __init__(self, content, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+
+async def iter_ndjson(scored_chunks, on_finish, summary_extra, form, release):
+    """Async counterpart of streaming.iter_ndjson_results; gives the admission slot back when done"""
+    summary = streaming.BatchSummary()
+    finished = False
+    try:
+        async for results in scored_chunks:
+            summary.add(results)
+            yield ''.join(streaming.ndjson_line({'type': 'result', 'result': result}) for result in results)
+        finished = True
+    except Exception as e:
+        logger.error(f"❌ Streaming batch aborted after {summary.total} candidates: {e}")
+        finished = True
+        await run_in_threadpool(on_finish, error=str(e))
+        yield streaming.ndjson_line({'type': 'error', 'success': False, 'error': str(e)})
+        return
+    finally:
+        release()
+        # A disconnect cancels the response task (CancelledError) or closes the generator;
+        # nothing can be awaited then, so the batch is marked failed right here
+        if not finished:
+            logger.warning(f"⚠️ Client disconnected after {summary.total} streamed candidates")
+            on_finish(error='client disconnected')
+        if form is not None:
+            await form.close()
+
+    logger.info(f"✅ Streamed batch complete: {summary.total} candidates")
+    await run_in_threadpool(on_finish, summary=summary.as_dict())
+    yield streaming.ndjson_line(dict({'type': 'summary', 'success': True, 'summary': summary.as_dict()},
+                                     **summary_extra))
+
+
+@common_errors
+async def batch_predict(request):
+    """Batch CSV prediction endpoint"""
+    if not web.all_components_loaded:
+        return not_ready()
+    # The slot is held from before the upload is received until the results are out
+    release = admission.acquire()
+    try:
+        response = await admitted_batch_predict(request, release)
+    except BaseException:
+        release()
+        raise
+    if not isinstance(response, AdmittedStreamingResponse):
+        release()
+    return response
+
+
+async def admitted_batch_predict(request, release):
+    form = None
+    mimetype = mimetype_of(request)
+    if payloads.is_binary(mimetype):
+        # Binary body: the feature matrix is a view of the request bytes
+        candidate_ids, features = payloads.decode(await read_body(request), mimetype)
+        logger.info(f"📦 Processing {mimetype} batch: {len(features)} candidates")
+        chunks = payloads.iter_chunks(candidate_ids, features, web.app.config['BATCH_CHUNK_ROWS'])
+        source = mimetype
+    else:
+        # The multipart body is received on the loop and spooled to a temporary file
+        check_content_length(request)
+        form = await request.form(max_files=1)
+        upload_error = web.validate_upload(form)
+        if upload_error:
+            await form.close()
+            return error_response(upload_error)
+        upload = form['file']
+        upload_format = columnar.upload_format(upload.filename)
+        logger.info(f"📁 Processing {upload_format} file: {upload.filename}")
+        chunks = columnar.iter_upload_chunks(upload.file, upload_format, web.app.config['BATCH_CHUNK_ROWS'])
+        source = upload.filename
+
+    try:
+        # Every chunk of the upload is scored with the same artifact set
+        current = web.choose_artifacts(request.headers.get(web.app.config['MODEL_HEADER']))
+        started = time.perf_counter()
+
+        # Validate the upload on its first chunk before anything is stored
+        chunks = await run_in_threadpool(streaming.prefetch_first, chunks)
+
+        stored_batch = None
+        if web.results_db is not None:
+            stored_batch = await run_in_threadpool(web.results_db.start_batch, source, current.name, current.version)
+        on_finish = partial(web.finish_batch, stored_batch, started)
+        scored_chunks = iter_scored_chunks(chunks, current, stored_batch)
+    except BaseException:
+        if form is not None:
+            await form.close()
+        raise
+
+    accept = request.headers.get('accept', '')
+    if request.query_params.get('stream', '').lower() in ('1', 'true', 'ndjson') or streaming.NDJSON_MIMETYPE in accept:
+        # Stream each scored chunk as it completes, summary last
+        return AdmittedStreamingResponse(
+            iter_ndjson(scored_chunks, on_finish, web.batch_links(stored_batch), form, release),
+            release,
+            media_type=streaming.NDJSON_MIMETYPE,
+            headers=dict(model_headers(current), **{'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+        )
+
+    results = []
+    summary = streaming.BatchSummary()
+    try:
+        async for chunk_results in scored_chunks:
+            summary.add(chunk_results)
+            results.extend(chunk_results)
+            logger.info(f"Scored {summary.total} candidates so far")
+    except Exception as e:
+        await run_in_threadpool(on_finish, error=str(e))
+        raise
+    finally:
+        if form is not None:
+            await form.close()
+
+    summary = summary.as_dict()
+    await run_in_threadpool(on_finish, summary=summary)
+    logger.info(f"✅ Batch processing complete: {len(results)} candidates")
+
+    body = await run_in_threadpool(json_bytes, dict({
+        'success': True,
+        'model': current.name,
+        'artifact_version': current.version,
+        'summary': summary,
+        'results': results
+    }, **web.batch_links(stored_batch)))
+    return json_response(None, headers=model_headers(current), body=body)
+
+
+@common_errors
+async def download_template(request):
+    """Download CSV template for batch screening (`?rows=N` sample candidates, default 5)"""
+    rows = int(request.query_params.get('rows', csv_export.DEFAULT_TEMPLATE_ROWS))
+    if not 0 <= rows <= web.TEMPLATE_MAX_ROWS:
+        return error_response(f'rows must be between 0 and {web.TEMPLATE_MAX_ROWS}')
+    # A sync iterator: Starlette generates the blocks in the thread pool
+    return StreamingResponse(csv_export.iter_template_csv(rows), media_type='text/csv',
+                             headers=attachment('military_screening_template.csv'))
+
+
+@common_errors
+async def download_results(request):
+    """Download screening results as CSV (or `?format=parquet|feather`)"""
+    data = await run_in_threadpool(json.loads, await read_body(request))
+    results = data.get('results', [])
+    if not isinstance(results, list):
+        return error_response('results must be a list of screening results')
+
+    fmt, format_error = web.parse_export_format(request.query_params.get('format'))
+    if format_error:
+        return error_response(format_error)
+
+    name = f'screening_results_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+    if fmt == columnar.CSV_FORMAT:
+        chunks = await run_in_threadpool(streaming.prefetch_first, csv_export.iter_results_csv(results))
+        return StreamingResponse(chunks, media_type='text/csv', headers=attachment(f'{name}.csv'))
+    mimetype, extension = columnar.EXPORT_FORMATS[fmt]
+    buffer = await run_in_threadpool(columnar.write_results, results, fmt)
+    return Response(buffer.getvalue(), media_type=mimetype, headers=attachment(f'{name}.{extension}'))
+
+
+async def health(request):
+    """Liveness and detailed status; answers while components are still loading"""
+    payload = await run_in_threadpool(web.health_payload)
+    payload['asgi'] = {
+        'inference_threads': web.app.config['ASGI_INFERENCE_THREADS'],
+        'max_pending': admission.limit,
+        'pending': admission.pending
+    }
+    return json_response(payload)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_):
+    logger.info(f"🌐 ASGI mode: {web.app.config['ASGI_INFERENCE_THREADS']} inference threads, "
+                f"up to {admission.limit} scoring requests admitted")
+    yield
+    inference_executor.shutdown(wait=False)
+
+
+application = Starlette(
+    routes=[
+        route('/predict', predict, ['POST', 'OPTIONS']),
+        route('/batch-predict', batch_predict, ['POST']),
+        route('/download-template', download_template, ['GET']),
+        route('/download-results', download_results, ['POST']),
+        route('/health', health, ['GET']),
+        # Everything else (UI, /ready, /metrics, stored batches, jobs, admin) is the Flask app
+        Mount('/', app=WSGIMiddleware(web.app)),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
@@ -0,0 +1,201 @@
+"""
+Inference backends wrapping the loaded CNN.
+
+`model.predict` builds a data adapter, callbacks and a progress bar on every call,
+which dwarfs the actual forward pass for the tiny inputs `/predict` sends. The
+backends here expose one method, `predict(x) -> np.ndarray` over `(N, 561, 1)`
+float32 inputs, so the single and batch paths share the same inference call:
+
+    keras  - the original `model.predict(x, verbose=0)` path
+    graph  - the model traced once into a `tf.function` with a fixed
+             `(None, 561, 1)` input signature and called directly (default)
+    tflite - a `.tflite` export of the CNN (see export_model.py) run with the
+             standalone LiteRT / tflite-runtime interpreter, so serving does not
+             need to import full TensorFlow at all
+    stub   - a fixed random linear layer with softmax and an optional delay, no
+             model file or TensorFlow needed; for benchmarks (see benchmark.py)
+"""
+import logging
+import sys
+import threading
+import time
+
+import numpy as np
+
+from inference import FEATURE_COUNT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = 'graph'
+TFLITE_BACKEND = 'tflite'
+DEFAULT_TFLITE_MODEL_PATH = 'military_screening_cnn.tflite'
+STUB_BACKEND = 'stub'
+STUB_CLASSES = 6  # the six UCI HAR activities the label encoder knows
+
+
+class KerasPredictBackend:
+    """Calls `model.predict` exactly like the original code path"""
+
+    name = 'keras'
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        return np.asarray(self.model.predict(x, verbose=0))
+
+
+class GraphBackend:
+    """Runs the model through a traced `tf.function` with a fixed input signature"""
+
+    name = 'graph'
+
+    def __init__(self, model):
+        import tensorflow as tf
+
+        self.model = model
+        self._tf = tf
+        self._forward = tf.function(
+            lambda x: model(x, training=False),
+            input_signature=[tf.TensorSpec(shape=(None, FEATURE_COUNT, 1), dtype=tf.float32)]
+        )
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        return np.asarray(self._forward(self._tf.convert_to_tensor(x, dtype=self._tf.float32)))
+
+
+class TFLiteBackend:
+    """Runs an exported `.tflite` model without importing TensorFlow.
+
+    A TFLite interpreter has a fixed input shape, so batches are padded up to the
+    next power of two and one interpreter is kept per padded size. Interpreters
+    are not thread-safe; each one is guarded by its own lock.
+
+    Interpreters memory-map the model file, so every interpreter and every forked
+    worker reads the same page-cache copy of the weights. The default XNNPACK
+    delegate repacks weights into private buffers; `shared_weights=True` turns it
+    off so kernels read straight from the mapped file.
+    """
+
+    name = TFLITE_BACKEND
+
+    def __init__(self, model_path: str, num_threads: int = None, shared_weights: bool = False):
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.shared_weights = shared_weights
+        self._interpreter_cls = load_tflite_interpreter()
+        self._interpreters = {}
+        self._lock = threading.Lock()
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        n_rows = len(x)
+        padded_rows = 1 << (n_rows - 1).bit_length() if n_rows > 1 else 1
+        if padded_rows != n_rows:
+            x = np.concatenate([x, np.zeros((padded_rows - n_rows,) + x.shape[1:], dtype=np.float32)])
+
+        interpreter, input_index, output_index, lock = self._interpreter_for(padded_rows)
+        with lock:
+            interpreter.set_tensor(input_index, x)
+            interpreter.invoke()
+            return interpreter.get_tensor(output_index)[:n_rows].copy()
+
+    def _interpreter_for(self, n_rows: int):
+        with self._lock:
+            if n_rows not in self._interpreters:
+                kwargs = {}
+                if self.shared_weights:
+                    resolver_types = sys.modules[self._interpreter_cls.__module__].OpResolverType
+                    kwargs['experimental_op_resolver_type'] = resolver_types.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+                interpreter = self._interpreter_cls(model_path=self.model_path, num_threads=self.num_threads, **kwargs)
+                input_index = interpreter.get_input_details()[0]['index']
+                interpreter.resize_tensor_input(input_index, [n_rows, FEATURE_COUNT, 1], strict=False)
+                interpreter.allocate_tensors()
+                output_index = interpreter.get_output_details()[0]['index']
+                self._interpreters[n_rows] = (interpreter, input_index, output_index, threading.Lock())
+            return self._interpreters[n_rows]
+
+
+class StubBackend:
+    """Stands in for the CNN when measuring the rest of the service.
+
+    Scores are a softmax over a fixed random `(561, classes)` projection, so equal
+    inputs give equal outputs and every class occurs. `delay_ms` sleeps once per call
+    to mimic the model's cost without using CPU.
+    """
+
+    name = STUB_BACKEND
+
+    def __init__(self, delay_ms: float = 0.0, classes: int = STUB_CLASSES, seed: int = 0):
+        self.delay_seconds = delay_ms / 1000.0
+        self.weights = np.random.default_rng(seed).standard_normal((FEATURE_COUNT, classes)).astype(np.float32) / 8
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        if self.delay_seconds:
+            time.sleep(self.delay_seconds)
+        logits = np.asarray(x, dtype=np.float32).reshape(len(x), FEATURE_COUNT) @ self.weights
+        logits -= logits.max(axis=1, keepdims=True)
+        scores = np.exp(logits)
+        return scores / scores.sum(axis=1, keepdims=True)
+
+
+def load_tflite_interpreter():
+    """Return the lightest available TFLite `Interpreter` class"""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    logger.warning("⚠️ No standalone TFLite runtime installed, falling back to tf.lite (imports TensorFlow)")
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+
+BACKENDS = {
+    KerasPredictBackend.name: KerasPredictBackend,
+    GraphBackend.name: GraphBackend,
+}
+
+
+def load_keras_model(model_path: str):
+    """Load the Keras CNN (imports TensorFlow)"""
+    import tensorflow as tf
+    return tf.keras.models.load_model(model_path)
+
+
+def create_backend(name: str, model):
+    """Build the named backend around a loaded Keras model"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}'. Choose from: {', '.join(sorted(BACKENDS))}")
+    return BACKENDS[name](model)
+
+
+def load_backend(name: str, model_path: str = None, num_threads: int = None, shared_weights: bool = False,
+                 stub_delay_ms: float = 0.0):
+    """Build the named backend from its model file (`.tflite` for the TFLite backend, the
+    Keras `.h5` otherwise). Returns `(model, backend)`; `model` is None unless Keras was loaded."""
+    if name == STUB_BACKEND:
+        return None, StubBackend(stub_delay_ms)
+    if name == TFLITE_BACKEND:
+        return None, TFLiteBackend(model_path, num_threads=num_threads, shared_weights=shared_weights)
+    model = load_keras_model(model_path)
+    return model, create_backend(name, model)
+
+
+def warm_up(backend, batch_sizes=(1,)) -> float:
+    """Run dummy batches through the backend so tracing happens before the first request.
+
+    Returns the warm-up time in seconds.
+    """
+    started = time.perf_counter()
+    for size in batch_sizes:
+        backend.predict(np.zeros((size, FEATURE_COUNT, 1), dtype=np.float32))
+    elapsed = time.perf_counter() - started
+    logger.info(f"✅ {backend.name} inference backend warmed up in {elapsed:.2f}s")
+    return elapsed
@@ -0,0 +1,423 @@
+"""benchmark.py
+
+Latency, throughput and memory benchmarks for the screening service.
+
+Usage examples:
+    # Micro-benchmarks of the scoring stages, in this process
+    python benchmark.py micro
+
+    # Load test /predict and /batch-predict against a local server
+    python benchmark.py load --concurrency 8 --requests 500 --batch-requests 20 --batch-rows 1000
+
+    # Both, saved for comparison across changes
+    python benchmark.py all --out bench.json
+
+Notes:
+ - Without --app-dir the benchmark runs in a temporary directory with a synthetic
+   scaler.pkl and label_encoder.pkl, and the `stub` inference backend replaces the
+   CNN (no model file or TensorFlow needed). --stub-delay-ms adds a fixed model
+   cost per call. To measure the real model, pass --app-dir with the real
+   artifacts and --backend graph (or tflite).
+ - Candidates are synthetic: 561 standard normal features per row, as in
+   /download-template. The prediction cache is off unless --cache is given, so
+   repeated rows are scored every time.
+ - The load test starts the app under gunicorn with gunicorn_conf.py (the Flask
+   development server on Windows or without gunicorn). --server-threads and
+   --server-workers set GUNICORN_THREADS and WEB_CONCURRENCY.
+ - The result is one JSON document: p50 / p95 / p99 latency, throughput and peak
+   memory for every case, plus the configuration and git commit.
+"""
+import argparse
+import concurrent.futures
+import json
+import logging
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+try:
+    import joblib
+    import numpy as np
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    import csv_export
+    import inference
+    import metrics
+except Exception as e:
+    print("Missing dependencies. Install requirements.txt and run this from the repo root.")
+    raise
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+ACTIVITIES = ['LAYING', 'SITTING', 'STANDING', 'WALKING', 'WALKING_DOWNSTAIRS', 'WALKING_UPSTAIRS']
+SERVER_READY_TIMEOUT = 300
+DISTINCT_PREDICT_BODIES = 256
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Benchmark the screening service")
+    p.add_argument("mode", choices=["micro", "load", "all"], help="What to run")
+    p.add_argument("--app-dir", help="Directory with real artifacts (default: synthetic ones in a temp dir)")
+    p.add_argument("--backend", default="stub", help="INFERENCE_BACKEND to benchmark (default: stub)")
+    p.add_argument("--stub-delay-ms", type=float, default=0.0, help="Sleep per stub model call")
+    p.add_argument("--cache", action="store_true", help="Keep the prediction cache enabled")
+    p.add_argument("--repeat", type=int, default=200, help="Calls per micro-benchmark case")
+    p.add_argument("--micro-rows", type=int, default=inference.DEFAULT_BATCH_SIZE, help="Rows in batch micro-benchmarks")
+    p.add_argument("--parallel-workers", type=int, default=0, help="PARALLEL_SCORING_WORKERS (default: off)")
+    p.add_argument("--concurrency", type=int, default=4, help="Concurrent clients in the load test")
+    p.add_argument("--requests", type=int, default=200, help="/predict requests in the load test")
+    p.add_argument("--batch-requests", type=int, default=10, help="/batch-predict requests in the load test")
+    p.add_argument("--batch-rows", type=int, default=1000, help="Candidates per /batch-predict upload")
+    p.add_argument("--server-threads", type=int, default=None, help="GUNICORN_THREADS (default: --concurrency)")
+    p.add_argument("--server-workers", type=int, default=1, help="WEB_CONCURRENCY")
+    p.add_argument("--port", type=int, default=0, help="Server port (default: a free one)")
+    p.add_argument("--out", help="Also write the JSON result to this file")
+    return p.parse_args()
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+# ---------- setup ----------
+
+def make_synthetic_artifacts(directory):
+    """Write a scaler and label encoder shaped like the real ones"""
+    rng = np.random.default_rng(0)
+    joblib.dump(StandardScaler().fit(rng.standard_normal((1000, inference.FEATURE_COUNT))),
+                os.path.join(directory, "scaler.pkl"))
+    joblib.dump(LabelEncoder().fit(ACTIVITIES), os.path.join(directory, "label_encoder.pkl"))
+
+
+def app_environment(args):
+    """Environment variables the app is configured with for a benchmark run"""
+    return {
+        "INFERENCE_BACKEND": args.backend,
+        "STUB_MODEL_DELAY_MS": str(args.stub_delay_ms),
+        "PREDICTION_CACHE": "1" if args.cache else "0",
+        "ARTIFACT_RELOAD_SECONDS": "0",
+        "KG_RELOAD_SECONDS": "0",
+        "PARALLEL_SCORING_WORKERS": str(args.parallel_workers),
+    }
+
+
+def synthetic_features(rows, seed=0):
+    return np.random.default_rng(seed).standard_normal((rows, inference.FEATURE_COUNT))
+
+
+def latency_summary(seconds, elapsed=None, rows_per_call=1, errors=0):
+    """p50 / p95 / p99 in milliseconds, plus throughput when `elapsed` wall time is given"""
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    summary = {
+        "calls": int(len(ms)),
+        "errors": errors,
+        "rows_per_call": rows_per_call,
+        "mean_ms": round(float(ms.mean()), 4) if len(ms) else None,
+        "p50_ms": round(float(np.percentile(ms, 50)), 4) if len(ms) else None,
+        "p95_ms": round(float(np.percentile(ms, 95)), 4) if len(ms) else None,
+        "p99_ms": round(float(np.percentile(ms, 99)), 4) if len(ms) else None,
+        "max_ms": round(float(ms.max()), 4) if len(ms) else None,
+    }
+    elapsed = elapsed if elapsed is not None else float(np.sum(seconds))
+    if elapsed > 0:
+        summary["calls_per_second"] = round(len(ms) / elapsed, 2)
+        summary["rows_per_second"] = round(len(ms) * rows_per_call / elapsed, 2)
+    return summary
+
+
+def peak_rss_bytes(pid=None):
+    """Peak resident memory (VmHWM) of a process from /proc; None where that is unavailable"""
+    try:
+        with open(f"/proc/{pid or os.getpid()}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def child_pids(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as children:
+            return [int(child) for child in children.read().split()]
+    except OSError:
+        return []
+
+
+# ---------- micro-benchmarks ----------
+
+def time_calls(fn, repeat, warmup=5):
+    for _ in range(warmup):
+        fn()
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def run_micro(args, workdir):
+    """Time the scoring stages in-process on the artifacts the app loads from `workdir`"""
+    os.environ.update(app_environment(args), BACKGROUND_LOADING="0", ARTIFACT_CACHE="0")
+    os.chdir(workdir)
+    import app
+    logging.getLogger().setLevel(logging.WARNING)
+
+    current = app.current_artifacts
+    if not app.all_components_loaded or current is None:
+        raise RuntimeError("The app failed to load its components; see the log above")
+
+    rows = args.micro_rows
+    single = synthetic_features(DISTINCT_PREDICT_BODIES, seed=1)
+    single_lists = single.tolist()
+    batch = synthetic_features(rows, seed=2)
+    ids = [f"BENCH_{i:05d}" for i in range(rows)]
+    counter = iter(range(10 ** 12))
+
+    scaled_1 = inference.scale_features(current.preprocessor, single[:1])
+    scaled_n = inference.scale_features(current.preprocessor, batch)
+    model_in_1 = scaled_1.astype(np.float32).reshape(1, inference.FEATURE_COUNT, 1)
+    model_in_n = scaled_n.astype(np.float32).reshape(rows, inference.FEATURE_COUNT, 1)
+    predictions = current.backend.predict(model_in_n)
+    confidences = predictions.max(axis=1).astype(np.float64)
+    activities = np.asarray(current.label_encoder.inverse_transform(predictions.argmax(axis=1)))
+    columns = inference.biomarker_columns(confidences, activities)
+
+    cases = {
+        "process_single_candidate": (1, lambda: app.process_single_candidate(
+            single_lists[next(counter) % len(single_lists)], "BENCH", current)),
+        "scaler_1": (1, lambda: inference.scale_features(current.preprocessor, single[:1])),
+        f"scaler_{rows}": (rows, lambda: inference.scale_features(current.preprocessor, batch)),
+        "model_1": (1, lambda: current.backend.predict(model_in_1)),
+        f"model_{rows}": (rows, lambda: current.backend.predict(model_in_n)),
+        "kg_1": (1, lambda: inference.recommend_roles_batch(
+            current.knowledge_graph, confidences[:1], {k: v[:1] for k, v in columns.items()}, activities[:1])),
+        f"kg_{rows}": (rows, lambda: inference.recommend_roles_batch(
+            current.knowledge_graph, confidences, columns, activities)),
+        f"score_batch_{rows}": (rows, lambda: inference.score_batch(
+            batch, ids, current.backend, current.preprocessor, current.label_encoder,
+            current.knowledge_graph, batch_size=app.app.config['INFERENCE_BATCH_SIZE'])),
+    }
+    if current.scoring_pool is not None:
+        cases[f"score_batch_parallel_{rows}"] = (rows, lambda: inference.score_batch(
+            batch, ids, current.backend, current.preprocessor, current.label_encoder,
+            current.knowledge_graph, batch_size=app.app.config['INFERENCE_BATCH_SIZE'], pool=current.scoring_pool))
+
+    results = {}
+    for name, (rows_per_call, fn) in cases.items():
+        log(f"micro: {name}")
+        results[name] = latency_summary(time_calls(fn, args.repeat), rows_per_call=rows_per_call)
+    return {
+        "backend": current.backend.name,
+        "artifact_version": current.version,
+        "cases": results,
+        "peak_rss_bytes": peak_rss_bytes() or metrics.process_rss_bytes(),
+    }
+
+
+# ---------- load test ----------
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, workdir, port):
+    env = dict(os.environ, **app_environment(args))
+    env.update(
+        PORT=str(port),
+        GUNICORN_THREADS=str(args.server_threads or args.concurrency),
+        WEB_CONCURRENCY=str(args.server_workers),
+        PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.environ.get("PYTHONPATH")])),
+    )
+    if os.name != "nt" and importable("gunicorn"):
+        command = [sys.executable, "-m", "gunicorn", "--config", os.path.join(REPO_DIR, "gunicorn_conf.py"), "app:app"]
+        server = "gunicorn"
+    else:
+        command = [sys.executable, os.path.join(REPO_DIR, "app.py")]
+        server = "flask"
+    log_file = open(os.path.join(workdir, "server.log"), "wb")
+    proc = subprocess.Popen(command, cwd=workdir, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+    proc.log_file = log_file
+    proc.server = server
+
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + SERVER_READY_TIMEOUT
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"The server exited with code {proc.returncode}; see {log_file.name}")
+        try:
+            with urllib.request.urlopen(base_url + "/ready", timeout=2) as response:
+                if response.status == 200:
+                    return proc, base_url
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.5)
+    stop_server(proc)
+    raise RuntimeError(f"The server was not ready after {SERVER_READY_TIMEOUT}s; see {log_file.name}")
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+    proc.log_file.close()
+
+
+def importable(module):
+    try:
+        __import__(module)
+        return True
+    except ImportError:
+        return False
+
+
+def post(url, body, content_type):
+    """POST and check the JSON answer; returns True for a successful screening response"""
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": content_type}, method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=600) as response:
+            return response.status == 200 and json.loads(response.read()).get("success", False)
+    except (urllib.error.URLError, OSError, ValueError):
+        return False
+
+
+def multipart_csv(data, filename="benchmark.csv"):
+    """A multipart/form-data body with `data` as the `file` field"""
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: text/csv\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def run_requests(send, total, concurrency):
+    """Send `total` requests from `concurrency` client threads; returns (latencies, wall time, errors)"""
+    def one(i):
+        started = time.perf_counter()
+        ok = send(i)
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+    return [seconds for seconds, _ in outcomes], elapsed, sum(1 for _, ok in outcomes if not ok)
+
+
+def server_memory(proc, base_url):
+    """Peak RSS of the server processes, or the worker's current RSS from /metrics"""
+    peaks = {pid: peak_rss_bytes(pid) for pid in [proc.pid] + child_pids(proc.pid)}
+    peaks = {pid: peak for pid, peak in peaks.items() if peak is not None}
+    if peaks:
+        return {"peak_rss_bytes": max(peaks.values()), "peak_rss_bytes_by_pid": peaks}
+    try:
+        with urllib.request.urlopen(base_url + "/metrics", timeout=10) as response:
+            for line in response.read().decode().splitlines():
+                if line.startswith("process_resident_memory_bytes "):
+                    return {"rss_bytes_at_end": int(float(line.split()[1]))}
+    except (urllib.error.URLError, OSError):
+        pass
+    return {}
+
+
+def run_load(args, workdir):
+    port = args.port or free_port()
+    log(f"load: starting server on port {port}")
+    proc, base_url = start_server(args, workdir, port)
+    try:
+        bodies = [json.dumps({"sensor_data": row, "candidate_id": f"BENCH_{i:05d}"}).encode()
+                  for i, row in enumerate(synthetic_features(DISTINCT_PREDICT_BODIES, seed=3).tolist())]
+        upload, upload_type = multipart_csv(b"".join(csv_export.iter_template_csv(args.batch_rows)))
+
+        # Warm up both routes before measuring
+        post(base_url + "/predict", bodies[0], "application/json")
+        post(base_url + "/batch-predict", upload, upload_type)
+
+        log(f"load: {args.requests} x /predict at concurrency {args.concurrency}")
+        latencies, elapsed, errors = run_requests(
+            lambda i: post(base_url + "/predict", bodies[i % len(bodies)], "application/json"),
+            args.requests, args.concurrency)
+        predict = latency_summary(latencies, elapsed, errors=errors)
+
+        log(f"load: {args.batch_requests} x /batch-predict of {args.batch_rows} rows at concurrency {args.concurrency}")
+        latencies, elapsed, errors = run_requests(
+            lambda i: post(base_url + "/batch-predict", upload, upload_type),
+            args.batch_requests, args.concurrency)
+        batch = latency_summary(latencies, elapsed, rows_per_call=args.batch_rows, errors=errors)
+
+        return dict({
+            "server": proc.server,
+            "server_threads": args.server_threads or args.concurrency,
+            "server_workers": args.server_workers,
+            "concurrency": args.concurrency,
+            "predict": predict,
+            "batch_predict": batch,
+        }, **server_memory(proc, base_url))
+    finally:
+        stop_server(proc)
+
+
+# ---------- main ----------
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    args = parse_args()
+    tmpdir = None
+    if args.app_dir:
+        workdir = os.path.abspath(args.app_dir)
+    else:
+        workdir = tmpdir = tempfile.mkdtemp(prefix="screening-bench-")
+        make_synthetic_artifacts(workdir)
+        log(f"Synthetic artifacts in {workdir}")
+
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": vars(args),
+    }
+    cwd = os.getcwd()
+    try:
+        # The load test runs first: the micro-benchmarks import the app into this process
+        if args.mode in ("load", "all"):
+            report["load"] = run_load(args, workdir)
+        if args.mode in ("micro", "all"):
+            report["micro"] = run_micro(args, workdir)
+    finally:
+        os.chdir(cwd)
+        if tmpdir is not None:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+        log(f"Wrote {args.out}")
+
+
+if __name__ == '__main__':
+    main()
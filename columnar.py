@@ -0,0 +1,179 @@
+"""
+Parquet / Feather batch uploads and columnar results export.
+
+The sensor pipeline already writes its feature matrices as columnar files, and
+parsing the same data as 561-wide CSV text was most of the batch wall time. Uploads
+named `*.parquet` or `*.feather` / `*.arrow` (Arrow IPC file) are read with pyarrow
+one record batch at a time, projecting just the id and feature columns, and yield the
+same `(candidate_ids, features)` chunks as `streaming.iter_csv_chunks`.
+
+Results can be exported the other way round as a typed Parquet or Feather table
+(roles as list columns, biomarkers as float columns) instead of formatted CSV text.
+
+pyarrow is imported on first use only, so CSV-only deployments do not need it.
+"""
+import io
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+import payloads
+import streaming
+from inference import FEATURE_COUNT
+
+logger = logging.getLogger(__name__)
+
+CSV_FORMAT = 'csv'
+PARQUET_FORMAT = 'parquet'
+FEATHER_FORMAT = 'feather'
+
+# Upload file extension -> format
+UPLOAD_EXTENSIONS = {'csv': CSV_FORMAT, 'parquet': PARQUET_FORMAT, 'feather': FEATHER_FORMAT, 'arrow': FEATHER_FORMAT}
+
+# Export format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    PARQUET_FORMAT: ('application/vnd.apache.parquet', 'parquet'),
+    FEATHER_FORMAT: ('application/vnd.apache.arrow.file', 'feather'),
+}
+
+EXPORT_ROW_GROUP = 10000
+
+BIOMARKER_COLUMNS = ['movement_quality', 'fatigue_index', 'movement_smoothness', 'dynamic_power_score']
+
+
+def require_pyarrow():
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        raise streaming.BatchValidationError('Parquet and Feather files need pyarrow installed on the server')
+
+
+def upload_format(filename: str) -> str:
+    """Format of an upload from its file extension (CSV for anything unknown)"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return UPLOAD_EXTENSIONS.get(extension, CSV_FORMAT)
+
+
+def iter_upload_chunks(source, fmt: str, chunk_rows: int = streaming.DEFAULT_CHUNK_ROWS
+                       ) -> Iterator[Tuple[List[Any], np.ndarray]]:
+    """Read a CSV, Parquet or Feather upload (a path or a seekable file) in chunks of
+    at most `chunk_rows` rows"""
+    if fmt == CSV_FORMAT:
+        yield from streaming.iter_csv_chunks(source, chunk_rows)
+        return
+
+    offset = 0
+    for batch in _iter_record_batches(source, fmt, chunk_rows):
+        for start in range(0, batch.num_rows, chunk_rows):
+            candidate_ids, features = payloads.arrow_table_features(
+                require_pyarrow().Table.from_batches([batch.slice(start, chunk_rows)])
+            )
+            if features.shape[1] != FEATURE_COUNT:
+                raise streaming.BatchValidationError(
+                    f'Expected {FEATURE_COUNT} features per row, got {features.shape[1]}'
+                )
+            if candidate_ids is None:
+                candidate_ids = [f"Candidate_{offset + i + 1:03d}" for i in range(len(features))]
+            offset += len(features)
+            yield candidate_ids, features
+
+
+def count_rows(path: str, fmt: str) -> int:
+    """Row count of a Parquet or Feather file from its metadata"""
+    pa = require_pyarrow()
+    if fmt == PARQUET_FORMAT:
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    import pyarrow.ipc
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+
+def _iter_record_batches(source, fmt: str, chunk_rows: int):
+    pa = require_pyarrow()
+    try:
+        if fmt == PARQUET_FORMAT:
+            import pyarrow.parquet as pq
+            parquet_file = pq.ParquetFile(source)
+            yield from parquet_file.iter_batches(batch_size=chunk_rows,
+                                                 columns=_projected_columns(parquet_file.schema_arrow.names))
+        else:
+            import pyarrow.ipc
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i)
+    except (pa.ArrowInvalid, OSError) as e:
+        raise streaming.BatchValidationError(f'Could not read {fmt} file: {e}')
+
+
+def _projected_columns(names: List[str]) -> List[str]:
+    """Only the id and feature columns are read from a Parquet file"""
+    id_cols = [name for name in ('candidate_id', 'id') if name in names][:1]
+    values = [name for name in names if name not in id_cols]
+    if len(values) == 1:
+        return names
+    _, feature_cols = streaming.split_columns(names)
+    return id_cols + feature_cols
+
+
+def results_schema():
+    pa = require_pyarrow()
+    roles = pa.list_(pa.string())
+    return pa.schema(
+        [('candidate_id', pa.string()), ('activity', pa.string()), ('confidence', pa.float64()),
+         ('decision', pa.string()), ('risk_level', pa.string()), ('reason', pa.string()),
+         ('recommended_roles', roles), ('detected_risks', roles), ('contraindicated_roles', roles)]
+        + [(name, pa.float64()) for name in BIOMARKER_COLUMNS]
+        + [('performance_score', pa.float64())]
+    )
+
+
+def results_table(results: List[Dict[str, Any]]):
+    """Arrow table of the successful results (the same rows as the CSV export)"""
+    pa = require_pyarrow()
+    rows = [r for r in results if r.get('success', False)]
+    columns = {
+        'candidate_id': [str(r.get('candidate_id', 'N/A')) for r in rows],
+        'activity': [r.get('activity') for r in rows],
+        'confidence': [r.get('confidence') for r in rows],
+        'decision': [r.get('decision') for r in rows],
+        'risk_level': [r.get('risk_level') for r in rows],
+        'reason': [r.get('reason') for r in rows],
+        'recommended_roles': [r.get('recommended_roles', []) for r in rows],
+        'detected_risks': [r.get('detected_risks', []) for r in rows],
+        'contraindicated_roles': [r.get('contraindicated_roles', []) for r in rows],
+    }
+    for name in BIOMARKER_COLUMNS:
+        columns[name] = [r.get('biomarkers', {}).get(name) for r in rows]
+    columns['performance_score'] = [r.get('performance_score') for r in rows]
+    return pa.Table.from_pydict(columns, schema=results_schema())
+
+
+def write_results(results: Iterable[Dict[str, Any]], fmt: str) -> io.BytesIO:
+    """Write results as Parquet or Feather, `EXPORT_ROW_GROUP` rows at a time so a
+    large job is never held as one list of dicts"""
+    pa = require_pyarrow()
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+
+    sink = io.BytesIO()
+    schema = results_schema()
+    if fmt == PARQUET_FORMAT:
+        writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_file(sink, schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+
+    with writer:
+        group = []
+        for result in results:
+            group.append(result)
+            if len(group) == EXPORT_ROW_GROUP:
+                writer.write_table(results_table(group))
+                group = []
+        if group:
+            writer.write_table(results_table(group))
+    sink.seek(0)
+    return sink
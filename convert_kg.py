@@ -0,0 +1,71 @@
+"""convert_kg.py
+
+One-time conversion of the pickled knowledge graph to the JSON KG format.
+
+Usage examples:
+    # Convert military_knowledge_graph.pkl -> military_knowledge_graph.json
+    python convert_kg.py
+
+    # Custom paths
+    python convert_kg.py --pickle old/military_knowledge_graph.pkl --out military_knowledge_graph.json
+
+Notes:
+ - Unpickling can run arbitrary code: only convert the repo's own pickle.
+ - The script checks that the JSON file gives the same roles and risks as the
+   pickle over a sweep of movement quality values before you deploy it.
+ - Once the JSON file is deployed the app loads it instead of the pickle
+   (KG_PATH selects another location) and reloads it when it changes.
+"""
+import argparse
+from pathlib import Path
+import sys
+import time
+
+try:
+    import numpy as np
+    import kg
+except Exception as e:
+    print("Missing dependencies. Ensure numpy is installed and run this from the repo root.")
+    raise
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Convert the knowledge graph pickle to JSON")
+    p.add_argument("--pickle", default=kg.LEGACY_KG_PATH, help="Path to the pickled knowledge graph")
+    p.add_argument("--out", default=kg.DEFAULT_KG_PATH, help="Output path for the JSON knowledge graph")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not Path(args.pickle).exists():
+        print(f"Pickle not found: {args.pickle}")
+        sys.exit(2)
+
+    print(f"Loading pickled knowledge graph: {args.pickle}")
+    try:
+        legacy = kg.load_legacy_pickle(args.pickle)
+    except kg.KnowledgeGraphFormatError as e:
+        print(f"The pickled rules cannot be converted: {e}")
+        sys.exit(1)
+
+    kg.save_json(legacy, args.out)
+    print(f"Wrote JSON knowledge graph to: {args.out}")
+
+    started = time.perf_counter()
+    converted = kg.load_json(args.out)
+    print(f"JSON load time: {(time.perf_counter() - started) * 1000:.2f} ms")
+
+    movement_quality = np.linspace(0.0, 1.0, 1001)
+    expected = [legacy.recommend_roles({'movement_quality': float(v)}) for v in movement_quality]
+    actual = converted.recommend_roles_batch({'movement_quality': movement_quality})
+    mismatches = sum(e != a for e, a in zip(expected, actual))
+    if mismatches:
+        print(f"JSON knowledge graph disagrees with the pickle on {mismatches} of {len(expected)} checks")
+        sys.exit(1)
+
+    print("Done. Deploy the .json file; the .pkl is no longer needed.")
+
+
+if __name__ == '__main__':
+    main()
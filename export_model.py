@@ -0,0 +1,81 @@
+"""export_model.py
+
+Convert the Keras CNN to a TensorFlow Lite flatbuffer for the `tflite` inference backend.
+
+Usage examples:
+    # Convert military_screening_cnn.h5 -> military_screening_cnn.tflite
+    python export_model.py
+
+    # Custom paths, with dynamic-range weight quantization
+    python export_model.py --model military_screening_cnn.h5 --out military_screening_cnn.tflite --quantize
+
+Notes:
+ - This needs full TensorFlow; the app serving the exported model does not
+   (install `ai-edge-litert` or `tflite-runtime` there instead).
+ - The script runs random inputs through both models and prints the largest
+   probability difference so a broken export is caught before deploying.
+ - Serve the export with INFERENCE_BACKEND=tflite (and TFLITE_MODEL_PATH if the
+   file is not in the working directory).
+"""
+import argparse
+from pathlib import Path
+import sys
+
+try:
+    import numpy as np
+    import tensorflow as tf
+except Exception as e:
+    print("Missing dependencies. Ensure numpy and tensorflow are installed.")
+    raise
+
+FEATURE_COUNT = 561
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Export the Keras CNN to TensorFlow Lite")
+    p.add_argument("--model", default="military_screening_cnn.h5", help="Path to the Keras .h5 model")
+    p.add_argument("--out", default="military_screening_cnn.tflite", help="Output path for the .tflite model")
+    p.add_argument("--quantize", action="store_true", help="Apply dynamic-range weight quantization")
+    p.add_argument("--check-rows", type=int, default=32, help="Random rows used to compare both models")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    model_path = Path(args.model)
+    if not model_path.exists():
+        print(f"Model file not found: {model_path}")
+        sys.exit(2)
+
+    print(f"Loading Keras model: {model_path}")
+    model = tf.keras.models.load_model(model_path, compile=False)
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if args.quantize:
+        print("Applying dynamic-range quantization")
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    tflite_model = converter.convert()
+
+    print(f"Writing TFLite model to: {args.out} ({len(tflite_model) / 1024:.1f} KB)")
+    Path(args.out).write_bytes(tflite_model)
+
+    x = np.random.randn(args.check_rows, FEATURE_COUNT, 1).astype(np.float32)
+    expected = model(x, training=False).numpy()
+
+    interpreter = tf.lite.Interpreter(model_path=args.out)
+    input_index = interpreter.get_input_details()[0]['index']
+    interpreter.resize_tensor_input(input_index, list(x.shape), strict=False)
+    interpreter.allocate_tensors()
+    interpreter.set_tensor(input_index, x)
+    interpreter.invoke()
+    actual = interpreter.get_tensor(interpreter.get_output_details()[0]['index'])
+
+    max_diff = float(np.max(np.abs(expected - actual)))
+    same_class = float(np.mean(expected.argmax(axis=1) == actual.argmax(axis=1)) * 100)
+    print(f"Max probability difference: {max_diff:.2e}, same predicted class: {same_class:.1f}%")
+
+    print("Done. Deploy the .tflite file and set INFERENCE_BACKEND=tflite.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,26 @@
+import gc
 import os
 
 # Gunicorn configuration for Render / minimal memory usage
 bind = "0.0.0.0:" + os.environ.get("PORT", "10000")
-workers = 1  # keep workers small when model is loaded in memory
-threads = 2
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))  # keep at 1 for the TensorFlow backends; the tflite backend can run several
+threads = int(os.environ.get("GUNICORN_THREADS", "2"))  # raise with PREDICT_MICRO_BATCHING so requests can coalesce
 timeout = 120  # allow longer startup/loads
-preload_app = False  # avoid loading model in master if memory is tight
+
+# PRELOAD_APP=1: the master imports app.py once and loads the scaler, label encoder and
+# knowledge graph; forked workers share those pages copy-on-write. Each worker then
+# runs app.init_worker() to load its own inference backend (TensorFlow is not fork-safe;
+# the tflite backend memory-maps the model file, so its weights are shared too).
+preload_app = os.environ.get("PRELOAD_APP", "0").lower() in ("1", "true", "yes")
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the GC's reach; otherwise collections in the
+    # workers touch those objects and un-share their pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app import init_worker
+        init_worker()
@@ -0,0 +1,256 @@
+"""
+Vectorized scoring engine for batches of candidates.
+
+`process_single_candidate` in app.py builds a DataFrame, calls the scaler and runs
+the CNN once per candidate. For batch uploads that per-call overhead dominates, so
+this module scores a whole feature matrix at once: the scaler runs once, the CNN
+runs over `(N, 561, 1)` in fixed-size mini-batches, labels are decoded with a single
+`inverse_transform` and biomarkers / decisions are derived with array operations.
+
+The result dicts produced here have exactly the same shape as the ones returned by
+`process_single_candidate`, so the endpoints and the frontend do not need to care
+which path produced them. The CNN is reached through an inference backend (see
+backends.py): any object with a `predict(x) -> np.ndarray` method.
+"""
+import logging
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from preprocessing import AffineScaler
+
+logger = logging.getLogger(__name__)
+
+FEATURE_COUNT = 561
+DEFAULT_BATCH_SIZE = 256
+
+HIGH_CONFIDENCE = 0.8
+MEDIUM_CONFIDENCE = 0.6
+
+DYNAMIC_ACTIVITIES = ['WALKING', 'WALKING_UPSTAIRS', 'WALKING_DOWNSTAIRS']
+
+# (decision, reason, risk_level) for the high / medium / low confidence bands
+DECISION_TABLE = [
+    ("PASS", "Excellent movement quality and physical performance", "LOW"),
+    ("CONDITIONAL PASS", "Adequate performance with some areas for improvement", "MODERATE"),
+    ("FAIL", "Movement analysis indicates physical limitations", "HIGH"),
+]
+
+FALLBACK_ROLES = [
+    ["Infantry", "Special Forces", "Combat Engineer"],
+    ["Military Police", "Logistics", "Signals"],
+    ["Medical Evaluation Required"],
+]
+
+
+def confidence_bands(confidences: np.ndarray) -> np.ndarray:
+    """Map confidences to band indices (0 = high, 1 = medium, 2 = low)"""
+    return np.where(confidences > HIGH_CONFIDENCE, 0,
+                    np.where(confidences > MEDIUM_CONFIDENCE, 1, 2))
+
+
+def coerce_feature_matrix(rows: Any) -> tuple:
+    """Convert raw rows to a float64 matrix.
+
+    Returns `(matrix, errors)` where `errors` maps row index -> error message for
+    rows that could not be converted (those rows are left as zeros in the matrix
+    and must be reported as failed screenings).
+    """
+    if isinstance(rows, pd.DataFrame):
+        rows = rows.to_numpy()
+    try:
+        return np.asarray(rows, dtype=np.float64), {}
+    except (TypeError, ValueError):
+        pass
+
+    rows = list(rows)
+    matrix = np.zeros((len(rows), FEATURE_COUNT), dtype=np.float64)
+    errors = {}
+    for idx, row in enumerate(rows):
+        try:
+            values = np.asarray(row, dtype=np.float64)
+            if values.shape != (FEATURE_COUNT,):
+                raise ValueError(f'Expected {FEATURE_COUNT} features, got {len(values)}')
+            matrix[idx] = values
+        except (TypeError, ValueError) as e:
+            errors[idx] = str(e)
+    return matrix, errors
+
+
+def scale_features(scaler, features: np.ndarray) -> np.ndarray:
+    """Run the scaler once over the whole feature matrix.
+
+    `scaler` is either a precomputed `AffineScaler` or the sklearn scaler itself.
+    """
+    if isinstance(scaler, AffineScaler):
+        return scaler.transform(features)
+    try:
+        if hasattr(scaler, 'feature_names_in_') and len(scaler.feature_names_in_) == features.shape[1]:
+            cols = list(scaler.feature_names_in_)
+        else:
+            cols = [f'feature_{i}' for i in range(features.shape[1])]
+        return scaler.transform(pd.DataFrame(features, columns=cols))
+    except Exception:
+        return scaler.transform(features)
+
+
+def predict_probabilities(backend, scaled: np.ndarray, batch_size: int = DEFAULT_BATCH_SIZE) -> np.ndarray:
+    """Run the CNN backend over `(N, 561, 1)` in mini-batches of `batch_size` rows"""
+    reshaped = np.ascontiguousarray(scaled, dtype=np.float32).reshape(-1, FEATURE_COUNT, 1)
+    outputs = []
+    for start in range(0, len(reshaped), batch_size):
+        outputs.append(np.asarray(backend.predict(reshaped[start:start + batch_size])))
+    return np.concatenate(outputs, axis=0)
+
+
+def biomarker_columns(confidences: np.ndarray, activities: np.ndarray) -> Dict[str, np.ndarray]:
+    """Vectorized equivalent of `app.extract_biomarkers`, one array per biomarker
+    (`dynamic_power_score` is NaN for non-dynamic activities)"""
+    dynamic = np.isin(activities, DYNAMIC_ACTIVITIES)
+    return {
+        'movement_quality': confidences,
+        'fatigue_index': np.where(confidences > HIGH_CONFIDENCE, 0.05, 0.15),
+        'movement_smoothness': confidences * 0.9 + 0.1,
+        'dynamic_power_score': np.where(dynamic, confidences * 0.95, np.nan)
+    }
+
+
+def biomarker_dicts(columns: Dict[str, np.ndarray]) -> List[Dict[str, float]]:
+    """Per-candidate biomarker dicts, as returned by `app.extract_biomarkers`"""
+    names = list(columns)
+    biomarkers = []
+    for values in zip(*(columns[name].tolist() for name in names)):
+        biomarkers.append({name: value for name, value in zip(names, values) if value == value})  # drop NaN
+    return biomarkers
+
+
+def recommend_roles_batch(knowledge_graph, confidences: np.ndarray, columns: Dict[str, np.ndarray],
+                          activities: np.ndarray) -> tuple:
+    """Return `(roles, detected_risks, contraindicated_roles)` lists for every candidate.
+
+    A KG with `recommend_roles_batch` (kg.MilitaryScreeningKG) evaluates the whole
+    batch in one call; other KG objects are asked one candidate at a time.
+    """
+    bands = confidence_bands(confidences)
+    if hasattr(knowledge_graph, 'recommend_roles_batch'):
+        try:
+            outcomes = knowledge_graph.recommend_roles_batch(columns, activities)
+            return ([o['recommended_roles'] for o in outcomes],
+                    [o.get('detected_risks', []) for o in outcomes],
+                    [o.get('contraindicated_roles', []) for o in outcomes])
+        except Exception as e:
+            logger.warning(f"KG batch recommendation failed: {e}, using fallback")
+            return ([list(FALLBACK_ROLES[band]) for band in bands.tolist()],
+                    [[] for _ in bands], [[] for _ in bands])
+
+    roles, risks, contraindicated = [], [], []
+    for band, confidence, markers in zip(bands.tolist(), confidences.tolist(), biomarker_dicts(columns)):
+        try:
+            if hasattr(knowledge_graph, 'recommend_roles'):
+                kg_result = knowledge_graph.recommend_roles(markers)
+                roles.append(kg_result['recommended_roles'])
+                risks.append(kg_result.get('detected_risks', []))
+                contraindicated.append(kg_result.get('contraindicated_roles', []))
+            else:
+                roles.append(knowledge_graph.get_recommendations(confidence))
+                risks.append([])
+                contraindicated.append([])
+        except Exception as e:
+            logger.warning(f"KG recommendation failed: {e}, using fallback")
+            roles.append(list(FALLBACK_ROLES[band]))
+            risks.append([])
+            contraindicated.append([])
+    return roles, risks, contraindicated
+
+
+def predict_features(features: np.ndarray, backend, scaler, batch_size: int = DEFAULT_BATCH_SIZE,
+                     cache=None, cache_version: str = None, pool=None) -> np.ndarray:
+    """Scale raw feature rows and run the CNN, reusing cached probabilities when a
+    `result_cache.PredictionCache` is given. With a `parallel.ScoringPool` the rows are
+    scaled and scored in its worker processes instead (in-process once it is closed)."""
+    def predict(rows):
+        if pool is not None:
+            probabilities = pool.predict(rows)
+            if probabilities is not None:
+                return probabilities
+        return predict_probabilities(backend, scale_features(scaler, rows), batch_size)
+    return cache.predict(features, predict, cache_version) if cache is not None else predict(features)
+
+
+def score_batch(features: Any, candidate_ids: Sequence[Any], backend, scaler, label_encoder,
+                knowledge_graph, batch_size: int = DEFAULT_BATCH_SIZE, cache=None,
+                cache_version: str = None, pool=None) -> List[Dict[str, Any]]:
+    """Score a matrix of candidates and return one result dict per row, in order"""
+    matrix, errors = coerce_feature_matrix(features)
+    n_rows = len(candidate_ids)
+    results: List[Dict[str, Any]] = [None] * n_rows
+
+    if matrix.ndim != 2 or matrix.shape[1] != FEATURE_COUNT:
+        width = matrix.shape[1] if matrix.ndim == 2 else 0
+        return [{
+            'success': False,
+            'candidate_id': cid or 'Unknown',
+            'error': f'Expected {FEATURE_COUNT} features, got {width}'
+        } for cid in candidate_ids]
+
+    for idx, message in errors.items():
+        logger.error(f"Error processing candidate {candidate_ids[idx]}: {message}")
+        results[idx] = {
+            'success': False,
+            'candidate_id': candidate_ids[idx] or 'Unknown',
+            'error': message
+        }
+
+    valid = np.array([i for i in range(n_rows) if i not in errors], dtype=np.intp)
+    if len(valid):
+        try:
+            scored = _score_valid_rows(matrix[valid], backend, scaler, label_encoder,
+                                       knowledge_graph, batch_size, cache, cache_version, pool)
+            for idx, result in zip(valid.tolist(), scored):
+                result['candidate_id'] = candidate_ids[idx] or 'Unknown'
+                results[idx] = result
+        except Exception as e:
+            logger.error(f"Error processing batch of {len(valid)} candidates: {e}")
+            for idx in valid.tolist():
+                results[idx] = {
+                    'success': False,
+                    'candidate_id': candidate_ids[idx] or 'Unknown',
+                    'error': str(e)
+                }
+
+    return results
+
+
+def _score_valid_rows(matrix, backend, scaler, label_encoder, knowledge_graph, batch_size,
+                      cache=None, cache_version=None, pool=None):
+    predictions = predict_features(matrix, backend, scaler, batch_size, cache, cache_version, pool)
+
+    confidences = predictions.max(axis=1).astype(np.float64)
+    predicted_classes = predictions.argmax(axis=1)
+    activities = np.asarray(label_encoder.inverse_transform(predicted_classes))
+
+    columns = biomarker_columns(confidences, activities)
+    biomarkers = biomarker_dicts(columns)
+    roles, detected_risks, contraindicated = recommend_roles_batch(knowledge_graph, confidences, columns, activities)
+
+    bands = confidence_bands(confidences).tolist()
+
+    results = []
+    for i, (confidence, activity) in enumerate(zip(confidences.tolist(), activities.tolist())):
+        decision, reason, risk_level = DECISION_TABLE[bands[i]]
+        results.append({
+            'success': True,
+            'candidate_id': None,
+            'activity': activity,
+            'confidence': confidence,
+            'decision': decision,
+            'reason': reason,
+            'risk_level': risk_level,
+            'recommended_roles': roles[i],
+            'detected_risks': detected_risks[i],
+            'contraindicated_roles': contraindicated[i],
+            'biomarkers': biomarkers[i],
+            'performance_score': round(confidence * 100, 1)
+        })
+    return results
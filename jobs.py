@@ -0,0 +1,294 @@
+"""
+Background batch jobs for large uploads.
+
+Scoring a big CSV inside the request ties up a gunicorn thread and can run into the
+worker timeout. `JobManager` instead stores the upload on disk, hands it to a small
+bounded thread pool and lets clients poll for progress and fetch the results later.
+
+Every job lives in its own directory under the jobs folder:
+
+    <jobs_dir>/<job_id>/input.csv       the uploaded file (input.parquet / input.feather)
+    <jobs_dir>/<job_id>/results.ndjson  one scored candidate per line
+    <jobs_dir>/<job_id>/state.json      status, progress counters and summary
+
+`state.json` is rewritten atomically after every chunk, so finished results survive
+a worker restart; jobs that were still queued or running when the process died are
+re-queued from their stored input on startup. The input file is deleted once a job
+has completed or failed, and `evict()` removes the directories of finished jobs past
+the retention period or beyond `max_jobs`.
+
+The directory is also the source of truth when several gunicorn workers share it:
+a job is owned by the worker that queued it (`worker_pid`), status lookups for jobs
+owned by another worker read their `state.json`, and a worker only re-queues jobs
+whose owner is no longer alive. Where `fcntl` is available a running job also holds
+an exclusive lock on `<job_id>/run.lock`, so two workers never score the same job.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development server only
+    fcntl = None
+
+import columnar
+import streaming
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS_DIR = 'jobs'
+DEFAULT_JOB_WORKERS = 1
+DEFAULT_RETENTION_HOURS = 24.0
+DEFAULT_MAX_JOBS = 100
+
+INPUT_FILES = {fmt: f'input.{fmt}' for fmt in (columnar.CSV_FORMAT, columnar.PARQUET_FORMAT, columnar.FEATHER_FORMAT)}
+RESULTS_FILE = 'results.ndjson'
+STATE_FILE = 'state.json'
+LOCK_FILE = 'run.lock'
+
+
+def count_csv_rows(path: str) -> int:
+    """Count data rows (excluding the header) without parsing the CSV"""
+    newlines = 0
+    last = b''
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            newlines += block.count(b'\n')
+            last = block
+    if last and not last.endswith(b'\n'):
+        newlines += 1
+    return max(newlines - 1, 0)
+
+
+def pid_alive(pid: Optional[int]) -> bool:
+    """Check whether a process with this pid is still running"""
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+class JobManager:
+    """Runs batch scoring jobs on a bounded thread pool with on-disk state.
+
+    retention_hours: finished jobs older than this are deleted; 0 keeps them until
+                     evicted by `max_jobs`.
+    max_jobs: at most this many finished jobs are kept, oldest evicted first.
+    """
+
+    def __init__(self, score_chunk: Callable, jobs_dir: str = DEFAULT_JOBS_DIR,
+                 max_workers: int = DEFAULT_JOB_WORKERS, chunk_rows: int = streaming.DEFAULT_CHUNK_ROWS,
+                 retention_hours: float = DEFAULT_RETENTION_HOURS, max_jobs: int = DEFAULT_MAX_JOBS):
+        self.score_chunk = score_chunk
+        self.jobs_dir = jobs_dir
+        self.chunk_rows = chunk_rows
+        self.retention_seconds = float(retention_hours) * 3600
+        self.max_jobs = max(1, int(max_jobs))
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch-job')
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self._recover()
+        self.evict()
+
+    # ---------- public API ----------
+
+    def submit(self, file, filename: str) -> Dict[str, Any]:
+        """Store an uploaded file and queue it for scoring"""
+        job_id = uuid.uuid4().hex
+        input_format = columnar.upload_format(filename)
+        input_path = self._path(job_id, INPUT_FILES[input_format])
+        os.makedirs(self._path(job_id), exist_ok=True)
+        file.save(input_path)
+
+        state = {
+            'job_id': job_id,
+            'filename': filename,
+            'input_format': input_format,
+            'status': 'queued',
+            'created_at': datetime.now().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+            'rows_total': (count_csv_rows(input_path) if input_format == columnar.CSV_FORMAT
+                           else columnar.count_rows(input_path, input_format)),
+            'rows_done': 0,
+            'rows_per_second': 0.0,
+            'eta_seconds': None,
+            'summary': None,
+            'error': None,
+            'worker_pid': os.getpid()
+        }
+        with self.lock:
+            self.jobs[job_id] = state
+        self._save_state(job_id)
+        self.executor.submit(self._run, job_id)
+        logger.info(f"📥 Queued batch job {job_id} ({state['rows_total']} rows)")
+        self.evict()
+        return dict(state)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        # Job IDs are uuid hex; anything else (e.g. '..' from a URL) is unknown, not a path
+        if not job_id.isalnum():
+            return None
+        with self.lock:
+            state = self.jobs.get(job_id)
+            if state and state.get('worker_pid') == os.getpid():
+                return dict(state)
+        # Owned by another worker (or finished before a restart): read the stored state
+        return self._read_state(job_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        states = (self.get(job_id) for job_id in os.listdir(self.jobs_dir))
+        return sorted((s for s in states if s), key=lambda s: s['created_at'], reverse=True)
+
+    def evict(self) -> int:
+        """Delete finished jobs past the retention period and the oldest beyond `max_jobs`.
+
+        Queued and running jobs are never removed, and neither are directories without
+        a readable state (a job that is still being stored).
+        """
+        finished = []
+        for job_id in os.listdir(self.jobs_dir):
+            state = self._read_state(job_id)
+            if state is not None and state.get('status') in ('completed', 'failed'):
+                finished.append((datetime.fromisoformat(state['created_at']), job_id))
+        finished.sort(reverse=True)
+
+        expired = [job_id for _, job_id in finished[self.max_jobs:]]
+        if self.retention_seconds:
+            cutoff = datetime.now().timestamp() - self.retention_seconds
+            expired += [job_id for created_at, job_id in finished[:self.max_jobs] if created_at.timestamp() < cutoff]
+        if not expired:
+            return 0
+
+        for job_id in expired:
+            with self.lock:
+                self.jobs.pop(job_id, None)
+            shutil.rmtree(self._path(job_id), ignore_errors=True)
+        logger.info(f"🧹 Evicted {len(expired)} batch job(s)")
+        return len(expired)
+
+    def iter_results(self, job_id: str) -> Iterator[Dict[str, Any]]:
+        """Yield the stored result dicts of a job, in input order"""
+        if not job_id.isalnum():
+            return
+        path = self._path(job_id, RESULTS_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    # ---------- worker ----------
+
+    def _run(self, job_id: str):
+        with open(self._path(job_id, LOCK_FILE), 'w') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    logger.info(f"⏭️ Batch job {job_id} is being run by another worker")
+                    return
+            state = self._read_state(job_id)
+            if state is None or state['status'] in ('completed', 'failed'):
+                return
+            with self.lock:
+                self.jobs[job_id] = state
+            self._score_job(job_id)
+
+    def _score_job(self, job_id: str):
+        started = time.perf_counter()
+        self._update(job_id, status='running', started_at=datetime.now().isoformat(), worker_pid=os.getpid(),
+                     rows_done=0, rows_per_second=0.0, eta_seconds=None, error=None)
+        logger.info(f"🔄 Running batch job {job_id}")
+
+        summary = streaming.BatchSummary()
+        # Jobs stored before Parquet / Feather support have no input_format
+        input_format = self.jobs[job_id].get('input_format', columnar.CSV_FORMAT)
+        input_path = self._path(job_id, INPUT_FILES[input_format])
+        try:
+            chunks = columnar.iter_upload_chunks(input_path, input_format, self.chunk_rows)
+            with open(self._path(job_id, RESULTS_FILE), 'w', encoding='utf-8') as out:
+                for candidate_ids, features in chunks:
+                    results = self.score_chunk(candidate_ids, features)
+                    summary.add(results)
+                    out.writelines(streaming.ndjson_line(result) for result in results)
+                    out.flush()
+
+                    elapsed = max(time.perf_counter() - started, 1e-9)
+                    rate = summary.total / elapsed
+                    remaining = max(self.jobs[job_id]['rows_total'] - summary.total, 0)
+                    self._update(job_id, rows_done=summary.total, rows_per_second=round(rate, 1),
+                                 eta_seconds=round(remaining / rate, 1) if rate else None)
+
+            self._update(job_id, status='completed', finished_at=datetime.now().isoformat(),
+                         rows_total=summary.total, eta_seconds=0.0, summary=summary.as_dict())
+            logger.info(f"✅ Batch job {job_id} complete: {summary.total} candidates")
+        except Exception as e:
+            logger.error(f"❌ Batch job {job_id} failed: {e}")
+            self._update(job_id, status='failed', finished_at=datetime.now().isoformat(), error=str(e))
+        # Finished jobs are never re-run, and the upload can be as large as the results
+        try:
+            os.remove(input_path)
+        except OSError:
+            pass
+
+    # ---------- persistence ----------
+
+    def _path(self, job_id: str, name: str = '') -> str:
+        return os.path.join(self.jobs_dir, job_id, name) if name else os.path.join(self.jobs_dir, job_id)
+
+    def _update(self, job_id: str, **changes):
+        with self.lock:
+            self.jobs[job_id].update(changes)
+        self._save_state(job_id)
+
+    def _save_state(self, job_id: str):
+        with self.lock:
+            state = dict(self.jobs[job_id])
+        path = self._path(job_id, STATE_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def _read_state(self, job_id: str) -> Optional[Dict[str, Any]]:
+        state_path = self._path(job_id, STATE_FILE)
+        if not os.path.exists(state_path):
+            return None
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ Skipping unreadable job state {state_path}: {e}")
+            return None
+
+    def _recover(self):
+        """Re-queue unfinished jobs whose owning worker is gone"""
+        for job_id in os.listdir(self.jobs_dir):
+            state = self._read_state(job_id)
+            if state is None or state.get('status') not in ('queued', 'running'):
+                continue
+            if state.get('worker_pid') != os.getpid() and pid_alive(state.get('worker_pid')):
+                continue
+
+            logger.info(f"🔄 Re-queueing interrupted batch job {job_id}")
+            with self.lock:
+                self.jobs[job_id] = state
+            self._update(job_id, status='queued', worker_pid=os.getpid())
+            self.executor.submit(self._run, job_id)
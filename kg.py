@@ -4,8 +4,196 @@ and as a reasonable default if the original pickled KG cannot be loaded.
 
 This class implements a small ruleset and a `recommend_roles` method which the app
 expects. It is intentionally small and safe to import during unpickling.
+
+The ruleset is compiled on first use into lookup tables so a whole batch of
+candidates is evaluated with a few NumPy calls (`recommend_roles_batch`):
+
+    role_tiers          {'biomarker', 'thresholds' (ascending), 'roles' (one list per
+                        band, lowest first)}; `high_confidence` /
+                        `medium_confidence` / `low_confidence` over movement_quality
+                        when absent (the original format)
+    risk_rules          conditions on any biomarker (`biomarker`, `op`, `value`) and/or
+                        the activity (`activities`); a firing rule adds its `risk`,
+                        its `add_roles` and its `contraindicated_roles`
+
+Example rule:
+
+    {'risk': 'Elevated fatigue', 'biomarker': 'fatigue_index', 'op': '>', 'value': 0.1,
+     'activities': ['WALKING_UPSTAIRS'], 'contraindicated_roles': ['Special Forces']}
+
+Rules sharing a biomarker and operator are kept in one sorted threshold table, so
+finding every rule that fires for a candidate is a single `np.searchsorted`.
+
+Rulesets are stored as validated JSON documents (`save_json` / `load_json`):
+
+    {"format": "military-screening-kg", "format_version": 1, "rules": {...}}
+
+`load_legacy_pickle` reads the old military_knowledge_graph.pkl once so it can be
+converted (see convert_kg.py); `KnowledgeGraphFile` reloads a JSON file when it
+changes on disk.
 """
-from typing import Dict, Any
+import json
+import logging
+import os
+import pickle
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+OPERATORS = ('>', '>=', '<', '<=')
+TIER_KEYS = ('low_confidence', 'medium_confidence', 'high_confidence')
+RISK_RULE_KEYS = {'risk', 'biomarker', 'op', 'value', 'activities', 'add_roles', 'contraindicated_roles'}
+
+KG_FORMAT = 'military-screening-kg'
+KG_FORMAT_VERSION = 1
+DEFAULT_KG_PATH = 'military_knowledge_graph.json'
+LEGACY_KG_PATH = 'military_knowledge_graph.pkl'
+
+# Original behaviour: candidates in the low movement quality band are flagged
+DEFAULT_RISK_RULES = [
+    {'risk': 'Low movement quality', 'biomarker': 'movement_quality', 'op': '<=', 'value': 0.6}
+]
+
+
+class KnowledgeGraphFormatError(ValueError):
+    """A KG document or ruleset does not match the expected format"""
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+
+
+def _check_role_list(value, where: str):
+    if not isinstance(value, list) or not all(isinstance(role, str) for role in value):
+        raise KnowledgeGraphFormatError(f'{where} must be a list of role names')
+
+
+def validate_rules(rules: Any):
+    """Raise KnowledgeGraphFormatError unless `rules` is a well-formed ruleset"""
+    if not isinstance(rules, dict):
+        raise KnowledgeGraphFormatError('rules must be an object')
+
+    tiers = rules.get('role_tiers')
+    if tiers is None:
+        for key in TIER_KEYS:
+            _check_role_list(rules.get(key), f'rules.{key}')
+    else:
+        if not isinstance(tiers, dict) or not isinstance(tiers.get('biomarker'), str):
+            raise KnowledgeGraphFormatError('rules.role_tiers needs a biomarker name')
+        thresholds = tiers.get('thresholds')
+        if not isinstance(thresholds, list) or not all(_is_number(t) for t in thresholds):
+            raise KnowledgeGraphFormatError('rules.role_tiers.thresholds must be a list of numbers')
+        if thresholds != sorted(thresholds):
+            raise KnowledgeGraphFormatError('rules.role_tiers.thresholds must be in ascending order')
+        roles = tiers.get('roles')
+        if not isinstance(roles, list) or len(roles) != len(thresholds) + 1:
+            raise KnowledgeGraphFormatError('rules.role_tiers.roles needs one role list per band (thresholds + 1)')
+        for i, band in enumerate(roles):
+            _check_role_list(band, f'rules.role_tiers.roles[{i}]')
+
+    risk_rules = rules.get('risk_rules', [])
+    if not isinstance(risk_rules, list):
+        raise KnowledgeGraphFormatError('rules.risk_rules must be a list')
+    for i, rule in enumerate(risk_rules):
+        where = f'rules.risk_rules[{i}]'
+        if not isinstance(rule, dict):
+            raise KnowledgeGraphFormatError(f'{where} must be an object')
+        unknown = set(rule) - RISK_RULE_KEYS
+        if unknown:
+            raise KnowledgeGraphFormatError(f'{where} has unknown keys {sorted(unknown)}')
+        if 'biomarker' not in rule and 'activities' not in rule:
+            raise KnowledgeGraphFormatError(f'{where} needs a biomarker condition or activities')
+        if 'biomarker' in rule:
+            if not isinstance(rule['biomarker'], str) or rule.get('op') not in OPERATORS or not _is_number(rule.get('value')):
+                raise KnowledgeGraphFormatError(f'{where} needs a biomarker name, an op in {OPERATORS} and a numeric value')
+        if 'risk' in rule and not isinstance(rule['risk'], str):
+            raise KnowledgeGraphFormatError(f'{where}.risk must be a string')
+        for key in ('activities', 'add_roles', 'contraindicated_roles'):
+            if key in rule:
+                _check_role_list(rule[key], f'{where}.{key}')
+
+
+class CompiledRules:
+    """Lookup tables built from a KG ruleset; see the module docstring for the format"""
+
+    def __init__(self, rules: Dict[str, Any]):
+        validate_rules(rules)
+        tiers = rules.get('role_tiers') or {
+            'biomarker': 'movement_quality',
+            'thresholds': [0.6, 0.8],
+            'roles': [rules['low_confidence'], rules['medium_confidence'], rules['high_confidence']]
+        }
+        self.tier_biomarker = tiers['biomarker']
+        self.tier_thresholds = np.asarray(tiers['thresholds'], dtype=np.float64)
+        # Tier i covers values strictly above the first i thresholds
+        self.tier_roles = [list(roles) for roles in tiers['roles']]
+
+        self.risk_rules = list(rules.get('risk_rules', DEFAULT_RISK_RULES))
+
+        # (biomarker, op) -> (rule indices, sorted thresholds)
+        self.threshold_tables: Dict[tuple, tuple] = {}
+        groups: Dict[tuple, List[int]] = {}
+        for idx, rule in enumerate(self.risk_rules):
+            if 'biomarker' in rule:
+                groups.setdefault((rule['biomarker'], rule['op']), []).append(idx)
+        for key, indices in groups.items():
+            values = np.asarray([self.risk_rules[i]['value'] for i in indices], dtype=np.float64)
+            order = np.argsort(values, kind='stable')
+            self.threshold_tables[key] = (np.asarray(indices)[order], values[order])
+
+        self.activity_sets = {
+            idx: sorted(rule['activities']) for idx, rule in enumerate(self.risk_rules) if 'activities' in rule
+        }
+
+    def tiers(self, columns: Dict[str, np.ndarray], n: int) -> np.ndarray:
+        values = _column(columns, self.tier_biomarker, n, default=0.0)
+        return np.searchsorted(self.tier_thresholds, values, side='left')
+
+    def fired(self, columns: Dict[str, np.ndarray], activities: Optional[np.ndarray], n: int) -> np.ndarray:
+        """Boolean `(n, n_rules)` matrix of which risk rules fire for which candidate"""
+        fired = np.ones((n, len(self.risk_rules)), dtype=bool)
+        for (biomarker, op), (indices, thresholds) in self.threshold_tables.items():
+            values = _column(columns, biomarker, n)
+            positions = np.arange(len(thresholds))
+            if op == '>':
+                hits = positions < np.searchsorted(thresholds, values, side='left')[:, None]
+            elif op == '>=':
+                hits = positions < np.searchsorted(thresholds, values, side='right')[:, None]
+            elif op == '<':
+                hits = positions >= np.searchsorted(thresholds, values, side='right')[:, None]
+            else:
+                hits = positions >= np.searchsorted(thresholds, values, side='left')[:, None]
+            # A missing biomarker (NaN) never satisfies a condition
+            hits &= ~np.isnan(values)[:, None]
+            fired[:, indices] &= hits
+
+        for idx, allowed in self.activity_sets.items():
+            fired[:, idx] &= np.isin(activities, allowed) if activities is not None else False
+        return fired
+
+    def outcome(self, tier: int, fired_row: np.ndarray) -> Dict[str, Any]:
+        roles = list(self.tier_roles[tier])
+        risks, contraindicated = [], []
+        for idx in np.flatnonzero(fired_row).tolist():
+            rule = self.risk_rules[idx]
+            if rule.get('risk'):
+                risks.append(rule['risk'])
+            roles.extend(r for r in rule.get('add_roles', []) if r not in roles)
+            contraindicated.extend(r for r in rule.get('contraindicated_roles', []) if r not in contraindicated)
+        return {
+            'recommended_roles': [r for r in roles if r not in contraindicated],
+            'detected_risks': risks,
+            'contraindicated_roles': contraindicated
+        }
+
+
+def _column(columns: Dict[str, Any], name: str, n: int, default: float = np.nan) -> np.ndarray:
+    values = columns.get(name)
+    if values is None:
+        return np.full(n, default, dtype=np.float64)
+    return np.asarray(values, dtype=np.float64).reshape(n)
 
 
 class MilitaryScreeningKG:
@@ -25,24 +213,154 @@ class MilitaryScreeningKG:
             'low_confidence': ['Medical Evaluation Required']
         }
 
-    def recommend_roles(self, biomarkers: Dict[str, float]) -> Dict[str, Any]:
-        """Return recommended roles and detected risks based on simple thresholds.
+    @property
+    def compiled(self) -> CompiledRules:
+        # Built lazily: unpickled instances skip __init__
+        compiled = self.__dict__.get('_compiled')
+        if compiled is None:
+            compiled = self.__dict__['_compiled'] = CompiledRules(self.rules)
+        return compiled
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop('_compiled', None)
+        return state
+
+    def recommend_roles(self, biomarkers: Dict[str, float], activity: str = None) -> Dict[str, Any]:
+        """Return recommended roles, detected risks and contraindicated roles for one candidate.
 
         biomarkers: dict with keys like 'movement_quality', 'fatigue_index', etc.
         """
-        mq = biomarkers.get('movement_quality', 0.0)
-        recommended = []
-        detected_risks = []
-
-        if mq > 0.8:
-            recommended = self.rules['high_confidence']
-        elif mq > 0.6:
-            recommended = self.rules['medium_confidence']
-        else:
-            recommended = self.rules['low_confidence']
-            detected_risks.append('Low movement quality')
+        columns = {name: [value] for name, value in biomarkers.items()}
+        return self.recommend_roles_batch(columns, None if activity is None else [activity])[0]
 
-        return {
-            'recommended_roles': recommended,
-            'detected_risks': detected_risks
-        }
+    def recommend_roles_batch(self, biomarkers: Dict[str, Sequence[float]],
+                              activities: Sequence[str] = None) -> List[Dict[str, Any]]:
+        """Evaluate the ruleset for a batch of candidates in one call.
+
+        biomarkers: biomarker name -> array of values, one per candidate (NaN if missing)
+        activities: predicted activity per candidate, for activity rules
+        """
+        compiled = self.compiled
+        n = len(next(iter(biomarkers.values()))) if biomarkers else len(activities or [])
+        if n == 0:
+            return []
+
+        activities = np.asarray(activities) if activities is not None else None
+        signatures = np.column_stack([compiled.tiers(biomarkers, n), compiled.fired(biomarkers, activities, n)])
+
+        # Candidates with the same tier and firing rules share one outcome
+        unique, inverse = np.unique(signatures, axis=0, return_inverse=True)
+        outcomes = [compiled.outcome(int(row[0]), row[1:]) for row in unique]
+        return [
+            {key: list(value) for key, value in outcomes[i].items()}
+            for i in inverse.reshape(-1).tolist()
+        ]
+
+
+# ---------- serialization ----------
+
+def to_document(knowledge_graph: MilitaryScreeningKG) -> Dict[str, Any]:
+    validate_rules(knowledge_graph.rules)
+    return {'format': KG_FORMAT, 'format_version': KG_FORMAT_VERSION, 'rules': knowledge_graph.rules}
+
+
+def from_document(document: Any) -> MilitaryScreeningKG:
+    """Validate a KG document and return a KG with its rules already compiled"""
+    if not isinstance(document, dict) or document.get('format') != KG_FORMAT:
+        raise KnowledgeGraphFormatError(f'not a {KG_FORMAT} document')
+    if document.get('format_version') != KG_FORMAT_VERSION:
+        raise KnowledgeGraphFormatError(f"unsupported format_version {document.get('format_version')!r}")
+    validate_rules(document.get('rules'))
+    knowledge_graph = MilitaryScreeningKG(document['rules'])
+    knowledge_graph.compiled  # compile now rather than on the first request
+    return knowledge_graph
+
+
+def load_json(path: str) -> MilitaryScreeningKG:
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            document = json.load(f)
+        except json.JSONDecodeError as e:
+            raise KnowledgeGraphFormatError(f'{path} is not valid JSON: {e}') from e
+    return from_document(document)
+
+
+def save_json(knowledge_graph: MilitaryScreeningKG, path: str):
+    """Write the KG document atomically (temporary file + rename)"""
+    document = to_document(knowledge_graph)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_legacy_pickle(path: str = LEGACY_KG_PATH) -> MilitaryScreeningKG:
+    """Read an old KG pickle, mapping `__main__.MilitaryScreeningKG` onto this module.
+
+    Unpickling runs arbitrary code: only use this on the repo's own pickle, once, to
+    convert it to JSON.
+    """
+    class FixUnpickler(pickle.Unpickler):
+        def find_class(self, module, name):
+            if module == "__main__" and name == "MilitaryScreeningKG":
+                return MilitaryScreeningKG
+            return super().find_class(module, name)
+
+    try:
+        import joblib
+        knowledge_graph = joblib.load(path)
+    except Exception as e:
+        logger.warning(f"⚠️ joblib could not load {path} ({e}), retrying with FixUnpickler")
+        with open(path, 'rb') as f:
+            knowledge_graph = FixUnpickler(f).load()
+
+    rules = getattr(knowledge_graph, 'rules', None)
+    validate_rules(rules)
+    return knowledge_graph if isinstance(knowledge_graph, MilitaryScreeningKG) else MilitaryScreeningKG(rules)
+
+
+class KnowledgeGraphFile:
+    """A KG JSON file that can be reloaded when it changes on disk"""
+
+    def __init__(self, path: str = DEFAULT_KG_PATH):
+        self.path = path
+        self.loaded_stamp = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def stamp(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self) -> MilitaryScreeningKG:
+        stamp = self.stamp()
+        knowledge_graph = load_json(self.path)
+        self.loaded_stamp = stamp
+        return knowledge_graph
+
+    def mark_loaded(self):
+        """Record the current file as loaded (its rules came from an identical copy)"""
+        self.loaded_stamp = self.stamp()
+
+    def reload_if_changed(self) -> Optional[MilitaryScreeningKG]:
+        """Return the new KG if the file changed since the last load, else None.
+
+        An invalid file is logged and skipped, so the current KG stays in use.
+        """
+        stamp = self.stamp()
+        if stamp is None or stamp == self.loaded_stamp:
+            return None
+        try:
+            knowledge_graph = load_json(self.path)
+        except (OSError, KnowledgeGraphFormatError) as e:
+            logger.error(f"❌ Not reloading knowledge graph from {self.path}: {e}")
+            self.loaded_stamp = stamp
+            return None
+        self.loaded_stamp = stamp
+        logger.info(f"🔄 Knowledge graph reloaded from {self.path}")
+        return knowledge_graph
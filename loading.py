@@ -0,0 +1,74 @@
+"""
+Staged component loading with per-component progress.
+
+The app used to load TensorFlow, the model and every pickle at import time, so a
+gunicorn worker could not answer even a `/health` probe until all of it was done.
+`LoadProgress` records the state and timing of each loading stage so the loader can
+run on a background thread while `/health` reports how far it got and `/ready`
+gates traffic until everything is loaded.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+
+class LoadProgress:
+    """Thread-safe status and timing of named loading stages"""
+
+    def __init__(self, stages: List[str]):
+        self.lock = threading.Lock()
+        self.stages: Dict[str, Dict[str, Any]] = {
+            name: {'status': PENDING, 'seconds': None, 'detail': None} for name in stages
+        }
+        self.ready = threading.Event()
+        self.finished = threading.Event()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a stage; it is marked failed if the block raises"""
+        self._set(name, status=LOADING)
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self._set(name, status=FAILED, seconds=round(time.perf_counter() - started, 3), detail=str(e))
+            raise
+        self._set(name, status=READY, seconds=round(time.perf_counter() - started, 3))
+
+    def mark(self, name: str, status: str, detail: str = None):
+        self._set(name, status=status, detail=detail)
+
+    def set_detail(self, name: str, detail: str):
+        self._set(name, detail=detail)
+
+    def state(self) -> str:
+        """Overall state: 'ready', 'loading' or 'failed'"""
+        if self.ready.is_set():
+            return READY
+        return FAILED if self.finished.is_set() else LOADING
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {name: dict(info) for name, info in self.stages.items()}
+
+    def _set(self, name: str, **changes):
+        with self.lock:
+            self.stages.setdefault(name, {'status': PENDING, 'seconds': None, 'detail': None}).update(changes)
+
+
+def run_in_background(target: Callable, name: str = 'component-loader') -> threading.Thread:
+    """Run a loader on a daemon thread so the server can accept requests meanwhile"""
+    thread = threading.Thread(target=target, name=name, daemon=True)
+    thread.start()
+    logger.info(f"🔄 Loading components in the background ({name})")
+    return thread
@@ -0,0 +1,145 @@
+"""
+Dynamic micro-batching for concurrent single-candidate predictions.
+
+Every `/predict` call pays the full per-call overhead of the scaler and Keras for a
+single `(1, 561, 1)` tensor. When several screening stations post at the same time,
+`MicroBatcher` collects their feature vectors for up to `window_ms` (or until
+`max_batch_size` requests are waiting), runs one batched forward pass on a
+dedicated thread and hands every caller back its own row of probabilities.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_MS = 2.0
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_TIMEOUT_SECONDS = 30.0
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-row requests into batched calls of `batch_fn`.
+
+    batch_fn: callable taking an `(N, n_features)` float array and returning an
+              `(N, n_classes)` array of probabilities, in the same row order.
+    """
+
+    def __init__(self, batch_fn: Callable[[np.ndarray], np.ndarray],
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, window_ms: float = DEFAULT_WINDOW_MS):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.window_ms = float(window_ms)
+        self.queue: queue.Queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.closed = False
+
+        self.requests = 0
+        self.batches = 0
+        self.max_observed_batch_size = 0
+        self.batch_size_counts: Dict[int, int] = {}
+
+        self.thread = threading.Thread(target=self._loop, name='micro-batcher', daemon=True)
+        self.thread.start()
+        logger.info(f"✅ Micro-batching enabled (window {self.window_ms}ms, max batch {self.max_batch_size})")
+
+    def submit(self, features: np.ndarray) -> Future:
+        """Queue one feature vector and return a future for its probabilities.
+
+        After `close()` the row is scored right away on the calling thread, so requests
+        still holding an artifact set that was swapped out keep working.
+        """
+        future: Future = Future()
+        item = (np.asarray(features, dtype=np.float64).ravel(), future)
+        with self.lock:
+            if not self.closed:
+                self.queue.put(item)
+                return future
+        self._run([item])
+        return future
+
+    def predict(self, features: np.ndarray, timeout: float = None) -> np.ndarray:
+        """Block until the batch containing `features` has been scored"""
+        return self.submit(features).result(timeout=timeout)
+
+    def close(self):
+        """Stop the batching thread once every request queued so far has been scored"""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.queue.put(None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'enabled': True,
+                'window_ms': self.window_ms,
+                'max_batch_size': self.max_batch_size,
+                'requests': self.requests,
+                'batches': self.batches,
+                'mean_batch_size': round(self.requests / self.batches, 2) if self.batches else 0,
+                'max_observed_batch_size': self.max_observed_batch_size,
+                'batch_size_counts': {str(k): v for k, v in sorted(self.batch_size_counts.items())},
+                'queue_depth': self.queue.qsize()
+            }
+
+    def _loop(self):
+        try:
+            self._batch_until_closed()
+        finally:
+            self._fail_pending()
+
+    def _batch_until_closed(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.window_ms / 1000.0
+            closing = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            self._run(batch)
+            if closing:
+                return
+
+    def _fail_pending(self):
+        """Fail anything still queued once the batching thread stops, so no caller waits forever"""
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None and not item[1].done():
+                item[1].set_exception(RuntimeError('Micro-batcher closed'))
+
+    def _run(self, batch):
+        try:
+            outputs = np.asarray(self.batch_fn(np.stack([features for features, _ in batch])))
+            for (_, future), row in zip(batch, outputs):
+                future.set_result(row)
+        except Exception as e:
+            logger.error(f"Micro-batch of {len(batch)} failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+        with self.lock:
+            self.requests += len(batch)
+            self.batches += 1
+            self.max_observed_batch_size = max(self.max_observed_batch_size, len(batch))
+            self.batch_size_counts[len(batch)] = self.batch_size_counts.get(len(batch), 0) + 1
@@ -0,0 +1,256 @@
+"""
+Parallel batch scoring in a pool of worker processes.
+
+One `/batch-predict` call scores its chunks on a single request thread, and the
+scaler and the model's Python glue hold the GIL while they run. `ScoringPool` spreads
+that work over several processes instead: every worker loads and warms up its own
+copy of the inference backend and the scaler once, when the pool starts, and then
+scores whole shards of a chunk.
+
+    pool = ScoringPool(BackendSpec('tflite', 'military_screening_cnn.tflite'),
+                       preprocessor, classes=6, workers=8)
+    probabilities = pool.predict(features)   # (N, 561) float64 -> (N, classes) float32
+
+The feature matrix is copied once into a `multiprocessing.shared_memory` block and
+each worker writes its probabilities straight into a second, shared output block, so
+neither array is pickled; only the block names and row ranges travel through the
+pool's queues. Shards are contiguous row ranges, so the merged output is in the
+input's order. Label decoding, biomarkers and KG rules stay with the caller.
+
+Workers are started with the `spawn` method: TensorFlow is not fork-safe, and a
+fresh interpreter does not inherit the web server's threads and locks. A spawned
+worker does re-import the parent's `__main__` script; modules that load models at
+import time should skip that when `in_worker()` is true.
+"""
+import logging
+import multiprocessing
+import multiprocessing.pool
+import os
+import queue
+import threading
+import time
+import weakref
+from multiprocessing import shared_memory
+from typing import Any, Dict, NamedTuple, Optional
+
+import numpy as np
+
+import backends
+from inference import FEATURE_COUNT, DEFAULT_BATCH_SIZE, predict_probabilities, scale_features
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_ROWS = 500
+DEFAULT_THREADS_PER_WORKER = 1
+# How long the app waits before replacing a retired pool with a fresh one
+DEFAULT_RESTART_SECONDS = 60.0
+START_TIMEOUT_SECONDS = 300
+# A worker that dies mid-shard (OOM kill, crash in the runtime) never reports back;
+# a call gives up after this long, plus a little per row, and the pool is retired
+SHARD_TIMEOUT_SECONDS = 30.0
+SHARD_TIMEOUT_PER_ROW_SECONDS = 0.005
+WORKER_NAME_PREFIX = 'ScoringWorker'
+
+
+class BackendSpec(NamedTuple):
+    """How a worker builds its own inference backend (see `backends.load_backend`)"""
+    name: str
+    model_path: Optional[str] = None
+    shared_weights: bool = False
+    stub_delay_ms: float = 0.0
+
+
+class _WorkerPool(multiprocessing.pool.Pool):
+    """A process pool whose workers can tell they are scoring workers (see `in_worker`)"""
+
+    @staticmethod
+    def Process(ctx, *args, **kwds):
+        process = ctx.Process(*args, **kwds)
+        process.name = f'{WORKER_NAME_PREFIX}-{process.name.rsplit("-", 1)[-1]}'
+        return process
+
+
+def in_worker() -> bool:
+    """True in a scoring worker process, already while it imports the parent's main module"""
+    return multiprocessing.current_process().name.startswith(WORKER_NAME_PREFIX)
+
+
+# Set in each worker process by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(spec: BackendSpec, preprocessor, batch_size: int, threads: int, ready):
+    try:
+        # One worker per core: keep each worker's math libraries to `threads` threads
+        for variable in ('OMP_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS'):
+            os.environ[variable] = str(threads)
+        os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+        _, backend = backends.load_backend(spec.name, spec.model_path, num_threads=threads,
+                                           shared_weights=spec.shared_weights, stub_delay_ms=spec.stub_delay_ms)
+        backend.predict(np.zeros((batch_size, FEATURE_COUNT, 1), dtype=np.float32))
+        _worker.update(backend=backend, preprocessor=preprocessor, batch_size=batch_size)
+        ready.put((os.getpid(), None))
+    except Exception as e:
+        ready.put((os.getpid(), f'{type(e).__name__}: {e}'))
+
+
+def _score_shard(input_name: str, output_name: str, n_rows: int, classes: int, start: int, stop: int) -> float:
+    """Score rows `start:stop` of the shared input into the shared output; returns the seconds taken"""
+    started = time.perf_counter()
+    input_block = shared_memory.SharedMemory(name=input_name)
+    output_block = shared_memory.SharedMemory(name=output_name)
+    try:
+        features = np.ndarray((n_rows, FEATURE_COUNT), dtype=np.float64, buffer=input_block.buf)
+        output = np.ndarray((n_rows, classes), dtype=np.float32, buffer=output_block.buf)
+        scaled = scale_features(_worker['preprocessor'], features[start:stop])
+        output[start:stop] = predict_probabilities(_worker['backend'], scaled, _worker['batch_size'])
+        # The views must go before the blocks can be closed
+        del features, output
+    finally:
+        input_block.close()
+        output_block.close()
+    return time.perf_counter() - started
+
+
+class ScoringPool:
+    """Worker processes that each hold a warmed-up backend and scaler.
+
+    `predict` may be called from several request threads at once. After `close()` it
+    returns None, and the caller scores in-process; shards already submitted finish
+    first. A call whose shards fail or do not come back in time also returns None; on
+    a timeout the pool is terminated and stops taking work (`retired_at` is set).
+    """
+
+    def __init__(self, spec: BackendSpec, preprocessor, classes: int, workers: int,
+                 batch_size: int = DEFAULT_BATCH_SIZE, threads_per_worker: int = DEFAULT_THREADS_PER_WORKER,
+                 start_timeout: float = START_TIMEOUT_SECONDS):
+        self.spec = spec
+        self.classes = int(classes)
+        self.workers = max(1, int(workers))
+        self.lock = threading.Lock()
+        self.running = False
+        self.retired_at = None
+        self.in_flight = 0
+        self.idle = threading.Condition(self.lock)
+
+        self.calls = 0
+        self.rows = 0
+        self.failures = 0
+        self.shard_seconds = 0.0
+        self.wall_seconds = 0.0
+
+        started = time.perf_counter()
+        context = multiprocessing.get_context('spawn')
+        ready = context.Queue()
+        self.pool = _WorkerPool(self.workers, initializer=_init_worker,
+                                initargs=(spec, preprocessor, batch_size, threads_per_worker, ready), context=context)
+        self._finalizer = weakref.finalize(self, self.pool.terminate)
+        try:
+            for _ in range(self.workers):
+                pid, error = ready.get(timeout=start_timeout)
+                if error is not None:
+                    raise RuntimeError(f'Scoring worker {pid} failed to start: {error}')
+        except queue.Empty:
+            self._finalizer()
+            raise RuntimeError(f'Scoring workers did not start within {start_timeout:.0f}s')
+        except Exception:
+            self._finalizer()
+            raise
+        self.running = True
+        self.start_seconds = time.perf_counter() - started
+        logger.info(f"✅ Parallel scoring pool ready: {self.workers} {spec.name} workers "
+                    f"in {self.start_seconds:.2f}s")
+
+    def predict(self, features: np.ndarray) -> Optional[np.ndarray]:
+        """Scale and score a `(N, 561)` feature matrix across the workers, rows in order"""
+        features = np.asarray(features, dtype=np.float64)
+        n_rows = len(features)
+        with self.lock:
+            if not self.running:
+                return None
+            self.in_flight += 1
+        started = time.perf_counter()
+        input_block = output_block = None
+        try:
+            if n_rows == 0:
+                return np.zeros((0, self.classes), dtype=np.float32)
+            input_block = shared_memory.SharedMemory(create=True, size=features.nbytes)
+            output_block = shared_memory.SharedMemory(create=True, size=n_rows * self.classes * 4)
+            np.ndarray(features.shape, dtype=np.float64, buffer=input_block.buf)[:] = features
+
+            bounds = np.linspace(0, n_rows, min(self.workers, n_rows) + 1).astype(int).tolist()
+            shards = [self.pool.apply_async(_score_shard, (input_block.name, output_block.name, n_rows,
+                                                          self.classes, start, stop))
+                      for start, stop in zip(bounds[:-1], bounds[1:])]
+            deadline = time.monotonic() + SHARD_TIMEOUT_SECONDS + n_rows * SHARD_TIMEOUT_PER_ROW_SECONDS
+            try:
+                shard_seconds = sum(shard.get(timeout=max(0.0, deadline - time.monotonic())) for shard in shards)
+            except multiprocessing.TimeoutError:
+                logger.error(f"❌ Parallel scoring of {n_rows} rows timed out (a worker died?); "
+                             f"retiring the pool and scoring in-process")
+                self._retire()
+                return None
+            except Exception as e:
+                logger.error(f"❌ Parallel scoring of {n_rows} rows failed, scoring in-process: {e}")
+                with self.lock:
+                    self.failures += 1
+                return None
+
+            output = np.ndarray((n_rows, self.classes), dtype=np.float32, buffer=output_block.buf)
+            probabilities = output.copy()
+            del output
+            with self.lock:
+                self.calls += 1
+                self.rows += n_rows
+                self.shard_seconds += shard_seconds
+                self.wall_seconds += time.perf_counter() - started
+            return probabilities
+        finally:
+            for block in (input_block, output_block):
+                if block is not None:
+                    block.close()
+                    block.unlink()
+            with self.lock:
+                self.in_flight -= 1
+                self.idle.notify_all()
+
+    def close(self):
+        """Stop accepting work and shut the workers down once running calls are done"""
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+        threading.Thread(target=self._close_when_idle, name='scoring-pool-close', daemon=True).start()
+
+    def _retire(self):
+        """Stop using a pool that lost a shard: its workers may be gone or stuck"""
+        with self.lock:
+            self.running = False
+            self.retired_at = time.monotonic()
+            self.failures += 1
+        self._finalizer()
+
+    def _close_when_idle(self):
+        with self.lock:
+            while self.in_flight:
+                self.idle.wait()
+        self._finalizer.detach()
+        self.pool.close()
+        self.pool.join()
+        logger.info(f"🛑 Parallel scoring pool ({self.spec.name}) shut down")
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'enabled': True,
+                'running': self.running,
+                'retired': self.retired_at is not None,
+                'workers': self.workers,
+                'backend': self.spec.name,
+                'start_seconds': round(self.start_seconds, 3),
+                'calls': self.calls,
+                'rows': self.rows,
+                'failures': self.failures,
+                # Worker busy time over wall time: close to `workers` when the shards run in parallel
+                'mean_parallelism': round(self.shard_seconds / self.wall_seconds, 2) if self.wall_seconds else None
+            }
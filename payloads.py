@@ -0,0 +1,167 @@
+"""
+Binary request bodies for /predict and /batch-predict.
+
+A JSON list of 561 numbers (or a 561-wide CSV) is parsed into one Python float per
+value before it becomes an array, which dominates the CPU time of small requests.
+Clients that already hold the features as arrays can instead POST them as a binary
+body; the bytes are viewed with `np.frombuffer` and go to the scaler without any
+per-element Python objects. JSON and CSV uploads keep working unchanged.
+
+Supported `Content-Type`s:
+
+    application/x-screening-float32      raw little-endian float32 rows with a small
+                                         header (see `encode_float32`)
+    application/x-npy                    a `.npy` file (numpy.save), shape (561,) or (N, 561)
+    application/vnd.apache.arrow.stream  Arrow IPC stream / file with 561 numeric
+    application/vnd.apache.arrow.file    columns (plus an optional `candidate_id` or
+                                         `id` column), or one fixed-size-list column;
+                                         needs pyarrow
+
+Raw float32 layout (all integers little-endian uint32):
+
+    b'MSF1' | rows | features | ids_length | ids | padding to 4 bytes | rows * features float32
+
+`ids` is `ids_length` bytes of UTF-8 candidate ids separated by newlines (0 for
+generated ids).
+"""
+import io
+import struct
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from inference import FEATURE_COUNT
+from streaming import BatchValidationError, split_columns
+
+FLOAT32_MIMETYPE = 'application/x-screening-float32'
+NPY_MIMETYPE = 'application/x-npy'
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+ARROW_FILE_MIMETYPE = 'application/vnd.apache.arrow.file'
+BINARY_MIMETYPES = (FLOAT32_MIMETYPE, NPY_MIMETYPE, ARROW_STREAM_MIMETYPE, ARROW_FILE_MIMETYPE)
+
+FLOAT32_MAGIC = b'MSF1'
+FLOAT32_HEADER = struct.Struct('<4sIII')
+
+
+def is_binary(mimetype: str) -> bool:
+    return mimetype in BINARY_MIMETYPES
+
+
+def encode_float32(features: np.ndarray, candidate_ids: Optional[List[str]] = None) -> bytes:
+    """Client-side encoder for the raw float32 format"""
+    features = np.ascontiguousarray(np.atleast_2d(features), dtype='<f4')
+    ids = '\n'.join(str(c) for c in candidate_ids).encode('utf-8') if candidate_ids else b''
+    padding = b'\0' * (-(FLOAT32_HEADER.size + len(ids)) % 4)
+    header = FLOAT32_HEADER.pack(FLOAT32_MAGIC, features.shape[0], features.shape[1], len(ids))
+    return header + ids + padding + features.tobytes()
+
+
+def decode(body: bytes, mimetype: str) -> Tuple[Optional[List[str]], np.ndarray]:
+    """Return `(candidate_ids, features)` for a binary body; `candidate_ids` is None when
+    the body does not carry any. `features` is an `(N, 561)` array, for raw float32 and
+    .npy bodies a read-only view of `body` itself"""
+    if mimetype == FLOAT32_MIMETYPE:
+        candidate_ids, features = _decode_float32(body)
+    elif mimetype == NPY_MIMETYPE:
+        candidate_ids, features = None, _decode_npy(body)
+    elif mimetype in (ARROW_STREAM_MIMETYPE, ARROW_FILE_MIMETYPE):
+        candidate_ids, features = _decode_arrow(body, mimetype == ARROW_FILE_MIMETYPE)
+    else:
+        raise BatchValidationError(f'Unsupported content type {mimetype!r}')
+
+    features = features.reshape(1, -1) if features.ndim == 1 else features
+    if features.ndim != 2 or features.shape[1] != FEATURE_COUNT:
+        raise BatchValidationError(f'Expected {FEATURE_COUNT} features per row, got shape {features.shape}')
+    if candidate_ids is not None and len(candidate_ids) != len(features):
+        raise BatchValidationError(f'Got {len(candidate_ids)} candidate ids for {len(features)} rows')
+    return candidate_ids, features
+
+
+def iter_chunks(candidate_ids: Optional[List[str]], features: np.ndarray,
+                chunk_rows: int) -> Iterator[Tuple[List[str], np.ndarray]]:
+    """Yield `(candidate_ids, feature_rows)` slices, like streaming.iter_csv_chunks"""
+    for start in range(0, len(features), chunk_rows):
+        stop = min(start + chunk_rows, len(features))
+        if candidate_ids is not None:
+            ids = candidate_ids[start:stop]
+        else:
+            ids = [f"Candidate_{i + 1:03d}" for i in range(start, stop)]
+        yield ids, features[start:stop]
+
+
+def _decode_float32(body: bytes) -> Tuple[Optional[List[str]], np.ndarray]:
+    if len(body) < FLOAT32_HEADER.size:
+        raise BatchValidationError('Truncated float32 header')
+    magic, rows, features, ids_length = FLOAT32_HEADER.unpack_from(body)
+    if magic != FLOAT32_MAGIC:
+        raise BatchValidationError('Not a float32 screening payload (bad magic)')
+
+    offset = FLOAT32_HEADER.size + ids_length
+    try:
+        candidate_ids = body[FLOAT32_HEADER.size:offset].decode('utf-8').split('\n') if ids_length else None
+    except UnicodeDecodeError:
+        raise BatchValidationError('Candidate ids must be UTF-8')
+    offset += -offset % 4
+    if len(body) - offset != rows * features * 4:
+        raise BatchValidationError(
+            f'float32 payload has {len(body) - offset} data bytes, expected {rows * features * 4}'
+        )
+    return candidate_ids, np.frombuffer(body, dtype='<f4', count=rows * features, offset=offset).reshape(rows, features)
+
+
+def _decode_npy(body: bytes) -> np.ndarray:
+    buffer = io.BytesIO(body)
+    try:
+        version = np.lib.format.read_magic(buffer)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(buffer)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(buffer)
+    except ValueError as e:
+        raise BatchValidationError(f'Invalid .npy payload: {e}')
+    if dtype.hasobject or dtype.kind not in 'fiu':
+        raise BatchValidationError(f'.npy payload must hold numbers, got dtype {dtype}')
+
+    count = int(np.prod(shape))
+    if len(body) - buffer.tell() != count * dtype.itemsize:
+        raise BatchValidationError('Truncated .npy payload')
+    data = np.frombuffer(body, dtype=dtype, count=count, offset=buffer.tell())
+    return data.reshape(shape[::-1]).T if fortran_order else data.reshape(shape)
+
+
+def _decode_arrow(body: bytes, file_format: bool) -> Tuple[Optional[List[str]], np.ndarray]:
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+    except ImportError:
+        raise BatchValidationError('Arrow payloads need pyarrow installed on the server')
+
+    try:
+        source = pa.py_buffer(body)
+        reader = pa.ipc.open_file(source) if file_format else pa.ipc.open_stream(source)
+        table = reader.read_all()
+    except pa.ArrowInvalid as e:
+        raise BatchValidationError(f'Invalid Arrow payload: {e}')
+    return arrow_table_features(table)
+
+
+def arrow_table_features(table) -> Tuple[Optional[List[str]], np.ndarray]:
+    """Candidate ids and the `(N, 561)` feature matrix of an Arrow table"""
+    import pyarrow as pa
+
+    columns = table.column_names
+    id_col = 'candidate_id' if 'candidate_id' in columns else ('id' if 'id' in columns else None)
+    candidate_ids = [str(c) for c in table.column(id_col).to_pylist()] if id_col else None
+
+    value_cols = [c for c in columns if c != id_col]
+    if len(value_cols) == 1 and pa.types.is_fixed_size_list(table.schema.field(value_cols[0]).type):
+        # One list<float>[561] column: a single contiguous values buffer
+        column = table.column(value_cols[0]).combine_chunks()
+        width = column.type.list_size
+        return candidate_ids, column.flatten().to_numpy().reshape(-1, width)
+
+    _, feature_cols = split_columns(columns)
+    features = np.empty((table.num_rows, len(feature_cols)), dtype=np.float64)
+    for i, name in enumerate(feature_cols):
+        features[:, i] = table.column(name).to_numpy()
+    return candidate_ids, features
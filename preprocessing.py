@@ -0,0 +1,81 @@
+"""
+Fast feature preprocessing.
+
+The scaler in scaler.pkl is a scikit-learn StandardScaler, i.e. an affine transform
+`(x - mean_) / scale_`. Calling `scaler.transform` needs a DataFrame with the right
+column names (or it warns), validates its input and allocates on every call.
+`AffineScaler` extracts `mean_` and `scale_` once at load time into contiguous
+float32 arrays and applies the transform in place with plain NumPy. The sklearn
+object is only kept as a verification oracle, checked once when the app loads.
+"""
+import logging
+import warnings
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VERIFY_TOLERANCE = 1e-4
+
+
+class AffineScaler:
+    """Precomputed `(x - mean) / scale` over float32 feature matrices"""
+
+    def __init__(self, mean: np.ndarray, scale: np.ndarray):
+        self.mean = np.ascontiguousarray(mean, dtype=np.float32)
+        self.inv_scale = np.ascontiguousarray(1.0 / np.asarray(scale, dtype=np.float64), dtype=np.float32)
+        self.n_features = len(self.mean)
+        if self.inv_scale.shape != (self.n_features,):
+            raise ValueError(f'mean has {self.n_features} features but scale has {len(self.inv_scale)}')
+
+    @classmethod
+    def from_sklearn(cls, scaler, n_features: int) -> 'AffineScaler':
+        """Build from a fitted StandardScaler, validating the feature count once"""
+        mean = getattr(scaler, 'mean_', None)
+        scale = getattr(scaler, 'scale_', None)
+        if mean is None and scale is None:
+            raise TypeError(f'{type(scaler).__name__} has neither mean_ nor scale_; not an affine scaler')
+        if getattr(scaler, 'n_features_in_', n_features) != n_features:
+            raise ValueError(f'Scaler was fit on {scaler.n_features_in_} features, expected {n_features}')
+        mean = np.zeros(n_features) if mean is None else mean
+        scale = np.ones(n_features) if scale is None else scale
+        return cls(mean, scale)
+
+    def transform(self, features: np.ndarray, copy: bool = True) -> np.ndarray:
+        """Scale an `(N, n_features)` matrix; with `copy=False` a float32 input is scaled in place"""
+        if copy:
+            x = np.array(features, dtype=np.float32, order='C', ndmin=2)
+        else:
+            x = np.ascontiguousarray(features, dtype=np.float32)
+        if x.shape[1] != self.n_features:
+            raise ValueError(f'Expected {self.n_features} features, got {x.shape[1]}')
+        x -= self.mean
+        x *= self.inv_scale
+        return x
+
+    def verify(self, oracle, n_rows: int = 16) -> float:
+        """Compare against the sklearn scaler on synthetic rows; return the max difference
+        (relative for outputs larger than 1)"""
+        rng = np.random.default_rng(0)
+        scale = np.where(self.inv_scale != 0, 1.0 / self.inv_scale, 1.0)
+        rows = self.mean + rng.standard_normal((n_rows, self.n_features)) * scale
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')  # oracle may have been fit on a DataFrame
+            expected = oracle.transform(rows)
+        return float(np.max(np.abs(self.transform(rows) - expected) / np.maximum(1.0, np.abs(expected))))
+
+
+def build_fast_scaler(scaler, n_features: int) -> Optional[AffineScaler]:
+    """Return a verified AffineScaler for `scaler`, or None to keep using sklearn"""
+    try:
+        fast = AffineScaler.from_sklearn(scaler, n_features)
+        max_diff = fast.verify(scaler)
+    except Exception as e:
+        logger.warning(f"⚠️ Fast scaler unavailable, using scaler.transform: {e}")
+        return None
+    if max_diff > VERIFY_TOLERANCE:
+        logger.warning(f"⚠️ Fast scaler disagrees with scaler.transform (max diff {max_diff:.2e}), not using it")
+        return None
+    logger.info(f"✅ Fast scaler ready (max diff vs sklearn {max_diff:.2e})")
+    return fast
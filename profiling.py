@@ -0,0 +1,201 @@
+"""
+Opt-in per-request profiling.
+
+A profiled request runs under one of two profilers, from the start of the request to
+the moment its response is closed, so NDJSON streams are covered as well:
+
+    sampling - a background thread records the request thread's Python stack every
+               `interval_ms` (`sys._current_frames`) and keeps the counts as collapsed
+               stacks, one `frame;frame;... count` line per distinct stack. The
+               request itself runs at full speed. Feed the file to flamegraph.pl or
+               speedscope. Time spent in C code (numpy, pandas, TensorFlow) is charged
+               to the Python frame that called into it.
+    cprofile - `cProfile` over the request thread, saved as a pstats file
+               (`python -m pstats <file>`, snakeviz). Exact call counts, but every
+               Python call pays the tracing overhead.
+
+Profiles are written to a local directory together with their metadata:
+
+    <profile_dir>/<profile_id>.json        route, status, rows scored, timings, ...
+    <profile_dir>/<profile_id>.collapsed   (sampling) or .pstats (cprofile)
+
+Only the newest `max_profiles` are kept.
+"""
+import cProfile
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SAMPLING = 'sampling'
+CPROFILE = 'cprofile'
+PROFILERS = (SAMPLING, CPROFILE)
+PROFILE_EXTENSIONS = {SAMPLING: 'collapsed', CPROFILE: 'pstats'}
+
+DEFAULT_PROFILE_DIR = 'profiles'
+DEFAULT_MAX_PROFILES = 200
+DEFAULT_INTERVAL_MS = 5.0
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class SamplingProfiler:
+    """Samples one thread's stack from a background thread"""
+
+    def __init__(self, thread_id: int, interval_ms: float = DEFAULT_INTERVAL_MS):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000.0
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def write(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(frame_label(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(labels))] += 1
+            self.samples += 1
+
+
+class CProfileProfiler:
+    """cProfile over the thread that starts and stops it"""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.samples = None
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def write(self, path: str):
+        pstats.Stats(self.profile).dump_stats(path)
+
+
+class ProfileSession:
+    """One profiled request: started in `before_request`, finished when its response closes.
+
+    `rows` is filled in by the scoring code; everything else is measured here.
+    """
+
+    def __init__(self, profiler: str = SAMPLING, interval_ms: float = DEFAULT_INTERVAL_MS, trigger: str = None):
+        if profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler '{profiler}'. Choose from: {', '.join(PROFILERS)}")
+        self.profile_id = uuid.uuid4().hex
+        self.kind = profiler
+        self.trigger = trigger
+        self.rows = None
+        self.view_seconds = None
+        self.profiler = (SamplingProfiler(threading.get_ident(), interval_ms) if profiler == SAMPLING
+                         else CProfileProfiler())
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.cpu_started = time.thread_time()
+        self.profiler.start()
+
+    def view_done(self):
+        """The view returned; a streamed response may still be running"""
+        self.view_seconds = time.perf_counter() - self.started
+
+    def finish(self, store: 'ProfileStore', meta: Dict[str, Any]):
+        """Stop the profiler and save the profile with `meta` (route, status, ...)"""
+        self.profiler.stop()
+        meta = dict(meta, **{
+            'profile_id': self.profile_id,
+            'profiler': self.kind,
+            'trigger': self.trigger,
+            'started_at': self.started_at,
+            'rows': self.rows,
+            'timings': {
+                'view_seconds': round(self.view_seconds, 6) if self.view_seconds is not None else None,
+                'total_seconds': round(time.perf_counter() - self.started, 6),
+                'cpu_seconds': round(time.thread_time() - self.cpu_started, 6)
+            },
+            'samples': self.profiler.samples
+        })
+        try:
+            store.save(meta, self.profiler)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not save profile {self.profile_id}: {e}")
+
+
+class ProfileStore:
+    """Profiles and their metadata in a local directory, newest `max_profiles` kept"""
+
+    def __init__(self, directory: str = DEFAULT_PROFILE_DIR, max_profiles: int = DEFAULT_MAX_PROFILES):
+        self.directory = directory
+        self.max_profiles = max(1, int(max_profiles))
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, meta: Dict[str, Any], profiler):
+        profile_id = meta['profile_id']
+        meta['file'] = f"{profile_id}.{PROFILE_EXTENSIONS[meta['profiler']]}"
+        profiler.write(os.path.join(self.directory, meta['file']))
+        tmp_path = self._meta_path(profile_id) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path(profile_id))
+        logger.info(f"🔬 Saved {meta['profiler']} profile {profile_id} for {meta.get('method')} {meta.get('route')} "
+                    f"({meta['timings']['total_seconds']:.3f}s)")
+        self.evict()
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        if not profile_id.isalnum():
+            return None
+        try:
+            with open(self._meta_path(profile_id), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def file_path(self, meta: Dict[str, Any]) -> str:
+        return os.path.join(self.directory, meta['file'])
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Metadata of every stored profile, newest first"""
+        profiles = [self.get(name[:-len('.json')]) for name in os.listdir(self.directory) if name.endswith('.json')]
+        return sorted((meta for meta in profiles if meta), key=lambda meta: meta['started_at'], reverse=True)
+
+    def evict(self):
+        with self.lock:
+            for meta in self.list()[self.max_profiles:]:
+                for path in (self._meta_path(meta['profile_id']), self.file_path(meta)):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    def _meta_path(self, profile_id: str) -> str:
+        return os.path.join(self.directory, f'{profile_id}.json')
@@ -0,0 +1,252 @@
+"""
+Multi-model registry with weighted / header routing and shadow scoring.
+
+Only one artifact set (model, scaler, encoder, KG) used to be served. The registry
+file named by MODEL_REGISTRY lists extra bundles, each a directory holding the same
+files as the app root, next to the primary set loaded from the root:
+
+    {
+      "primary": {"name": "cnn-v1", "weight": 90},
+      "models": [
+        {"name": "cnn-v2", "dir": "models/cnn-v2", "weight": 10},
+        {"name": "cnn-v3", "dir": "models/cnn-v3", "weight": 0, "backend": "tflite"}
+      ],
+      "shadow": "cnn-v3"
+    }
+
+Requests go to a model chosen at random in proportion to the weights, unless they
+name one in the routing header. The `shadow` model additionally scores the same
+inputs on a background thread after the response has been produced; `ShadowScorer`
+compares its results with the served ones and keeps disagreement statistics, so a
+retrained CNN can be evaluated on live intake traffic without affecting decisions or
+latency.
+"""
+import json
+import logging
+import queue
+import random
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRIMARY_NAME = 'primary'
+DEFAULT_SHADOW_MAX_PENDING_ROWS = 5000
+DEFAULT_SHADOW_SAMPLE_RATE = 1.0
+SHADOW_LOG_EVERY = 100
+
+
+class UnknownModelError(ValueError):
+    """The routing header names a model that is not loaded"""
+
+
+class ModelSpec:
+    """One bundle from the registry file"""
+
+    def __init__(self, name: str, directory: str, weight: float = 0.0, backend: str = None):
+        self.name = name
+        self.dir = directory
+        self.weight = weight
+        self.backend = backend
+
+    def describe(self) -> Dict[str, Any]:
+        return {'name': self.name, 'dir': self.dir, 'weight': self.weight, 'backend': self.backend}
+
+
+def load_registry_config(path: str) -> Dict[str, Any]:
+    """Read and validate a registry file; raises ValueError on a malformed one"""
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    primary = config.get('primary', {})
+    if not isinstance(primary, dict):
+        raise ValueError('registry: "primary" must be an object')
+    primary_name = primary.get('name', DEFAULT_PRIMARY_NAME)
+    primary_weight = primary.get('weight', 100)
+
+    specs = []
+    names = {primary_name}
+    for i, entry in enumerate(config.get('models', [])):
+        if not isinstance(entry, dict) or not isinstance(entry.get('name'), str) or not isinstance(entry.get('dir'), str):
+            raise ValueError(f'registry: models[{i}] needs a "name" and a "dir"')
+        if entry['name'] in names:
+            raise ValueError(f"registry: duplicate model name {entry['name']!r}")
+        names.add(entry['name'])
+        specs.append(ModelSpec(entry['name'], entry['dir'], entry.get('weight', 0), entry.get('backend')))
+
+    for name, weight in [(primary_name, primary_weight)] + [(s.name, s.weight) for s in specs]:
+        if not isinstance(weight, (int, float)) or weight < 0:
+            raise ValueError(f'registry: weight of {name!r} must be a non-negative number')
+
+    shadow = config.get('shadow')
+    if shadow is not None and shadow not in names:
+        raise ValueError(f'registry: shadow model {shadow!r} is not in the registry')
+    return {'primary_name': primary_name, 'primary_weight': primary_weight, 'models': specs, 'shadow': shadow}
+
+
+class ModelRegistry:
+    """Named artifact sets next to the primary one, and the routing between them.
+
+    The primary set itself stays where the app keeps it (it is hot-reloaded there);
+    the registry only holds the extra bundles and the weights of all of them.
+    """
+
+    def __init__(self, primary_name: str = DEFAULT_PRIMARY_NAME, primary_weight: float = 100,
+                 models: List[ModelSpec] = None, shadow: str = None):
+        self.primary_name = primary_name
+        self.primary_weight = primary_weight
+        self.specs: Dict[str, ModelSpec] = {spec.name: spec for spec in models or []}
+        self.shadow = shadow
+        self.sets: Dict[str, Any] = {}
+        self.errors: Dict[str, str] = {}
+        self.routed: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def install(self, name: str, artifact_set):
+        with self.lock:
+            self.sets[name] = artifact_set
+            self.errors.pop(name, None)
+
+    def mark_failed(self, name: str, error: str):
+        with self.lock:
+            self.errors[name] = error
+
+    def choose(self, requested: Optional[str] = None) -> str:
+        """Name of the model a request goes to: the requested one, or a weighted pick
+        among the primary and the loaded bundles"""
+        if requested:
+            if requested != self.primary_name and requested not in self.sets:
+                raise UnknownModelError(f"Unknown model {requested!r}; available: {', '.join(self.available())}")
+            name = requested
+        else:
+            candidates = [(self.primary_name, self.primary_weight)] + [
+                (n, self.specs[n].weight) for n in self.sets if self.specs[n].weight > 0
+            ]
+            total = sum(weight for _, weight in candidates)
+            name = self.primary_name
+            if total > 0:
+                pick = random.uniform(0, total)
+                for name, weight in candidates:
+                    pick -= weight
+                    if pick <= 0:
+                        break
+        with self.lock:
+            self.routed[name] = self.routed.get(name, 0) + 1
+        return name
+
+    def available(self) -> List[str]:
+        return [self.primary_name] + sorted(self.sets)
+
+    def describe(self) -> Dict[str, Any]:
+        with self.lock:
+            models = [{'name': self.primary_name, 'weight': self.primary_weight, 'primary': True,
+                       'requests': self.routed.get(self.primary_name, 0)}]
+            for name, spec in self.specs.items():
+                current = self.sets.get(name)
+                models.append(dict(
+                    spec.describe(),
+                    loaded=current is not None,
+                    version=current.version if current is not None else None,
+                    error=self.errors.get(name),
+                    requests=self.routed.get(name, 0)
+                ))
+            return {'models': models, 'shadow': self.shadow}
+
+
+class ShadowScorer:
+    """Scores served inputs again with a shadow model, off the request path.
+
+    score_fn: returns a callable `(features, candidate_ids) -> results` bound to the
+              current shadow artifact set, or None while it is not loaded.
+    max_pending_rows: rows waiting to be shadow-scored; beyond it samples are dropped
+                      (and counted) instead of slowing down requests or growing memory.
+    sample_rate: fraction of submitted requests / chunks that is shadow-scored.
+    """
+
+    def __init__(self, name: str, score_fn: Callable[[], Optional[Callable]],
+                 max_pending_rows: int = DEFAULT_SHADOW_MAX_PENDING_ROWS,
+                 sample_rate: float = DEFAULT_SHADOW_SAMPLE_RATE):
+        self.name = name
+        self.score_fn = score_fn
+        self.max_pending_rows = max(1, int(max_pending_rows))
+        self.sample_rate = float(sample_rate)
+        self.queue: queue.Queue = queue.Queue()
+        self.pending_rows = 0
+        self.lock = threading.Lock()
+
+        self.compared = 0
+        self.activity_disagreements = 0
+        self.decision_disagreements = 0
+        self.confidence_diff_total = 0.0
+        self.max_confidence_diff = 0.0
+        self.decision_changes: Dict[str, int] = {}
+        self.dropped = 0
+        self.errors = 0
+
+        self.thread = threading.Thread(target=self._loop, name='shadow-scorer', daemon=True)
+        self.thread.start()
+        logger.info(f"✅ Shadow scoring enabled with model {name}")
+
+    def submit(self, features, results: List[Dict[str, Any]]):
+        """Queue served `results` (and the raw features that produced them) for comparison"""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        with self.lock:
+            if self.pending_rows + len(results) > self.max_pending_rows:
+                self.dropped += len(results)
+                return
+            self.pending_rows += len(results)
+        self.queue.put((features, results))
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'enabled': True,
+                'model': self.name,
+                'compared': self.compared,
+                'activity_agreement': round(1 - self.activity_disagreements / self.compared, 4) if self.compared else None,
+                'decision_agreement': round(1 - self.decision_disagreements / self.compared, 4) if self.compared else None,
+                'mean_abs_confidence_diff': round(self.confidence_diff_total / self.compared, 6) if self.compared else None,
+                'max_abs_confidence_diff': round(self.max_confidence_diff, 6),
+                'decision_changes': dict(sorted(self.decision_changes.items())),
+                'dropped_rows': self.dropped,
+                'errors': self.errors,
+                'pending_rows': self.pending_rows,
+                'sample_rate': self.sample_rate
+            }
+
+    def _loop(self):
+        while True:
+            features, served = self.queue.get()
+            try:
+                score = self.score_fn()
+                if score is not None:
+                    self._compare(served, score(features, [r.get('candidate_id') for r in served]))
+            except Exception as e:
+                logger.warning(f"⚠️ Shadow scoring with {self.name} failed: {e}")
+                with self.lock:
+                    self.errors += 1
+            finally:
+                with self.lock:
+                    self.pending_rows -= len(served)
+
+    def _compare(self, served: List[Dict[str, Any]], shadow: List[Dict[str, Any]]):
+        with self.lock:
+            for primary, candidate in zip(served, shadow):
+                if not (primary.get('success') and candidate.get('success')):
+                    continue
+                self.compared += 1
+                diff = abs(primary['confidence'] - candidate['confidence'])
+                self.confidence_diff_total += diff
+                self.max_confidence_diff = max(self.max_confidence_diff, diff)
+                if primary['activity'] != candidate['activity']:
+                    self.activity_disagreements += 1
+                if primary['decision'] != candidate['decision']:
+                    self.decision_disagreements += 1
+                    change = f"{primary['decision']} -> {candidate['decision']}"
+                    self.decision_changes[change] = self.decision_changes.get(change, 0) + 1
+                if self.compared % SHADOW_LOG_EVERY == 0:
+                    logger.info(
+                        f"🔍 Shadow {self.name}: {self.compared} compared, "
+                        f"{self.activity_disagreements} activity / {self.decision_disagreements} decision disagreements"
+                    )
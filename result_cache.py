@@ -0,0 +1,142 @@
+"""
+Prediction cache keyed by a hash of the raw feature vector.
+
+Screening stations often resubmit the same 561-feature vector (retries, re-reviews,
+the same recruit uploaded again in a later batch), and every resubmission reran the
+scaler and the CNN. `PredictionCache` keeps the CNN's class probabilities for recently
+seen vectors in a bounded LRU with an optional TTL. Keys are a BLAKE2b digest of the
+float64 bytes of the row together with the scoring version (a digest of the model,
+scaler and label encoder), and the whole cache is dropped when that version changes,
+so results from a previous model or scaler are never served after the artifacts are
+reloaded. A new knowledge graph alone keeps the cache.
+
+Only the probabilities are cached: decoding, biomarkers, decisions and knowledge
+graph roles are cheap and are always derived fresh from them.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 3600.0
+
+
+class PredictionCache:
+    """Thread-safe LRU of feature-vector digest -> probability row.
+
+    max_entries: least recently used entries are evicted beyond this size.
+    ttl_seconds: entries older than this are treated as misses; 0 disables the TTL.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.version: Optional[str] = None
+        self.entries: 'OrderedDict[bytes, tuple]' = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def set_version(self, version: str):
+        """Bind the cache to an artifact version, clearing it if the version changed"""
+        with self.lock:
+            if version == self.version:
+                return
+            dropped = len(self.entries)
+            self.entries.clear()
+            self.version = version
+        if dropped:
+            logger.info(f"🔄 Prediction cache invalidated ({dropped} entries) for artifacts {version}")
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def key(self, row: np.ndarray, version: str = None) -> bytes:
+        hasher = hashlib.blake2b(digest_size=16, person=b'predcache')
+        hasher.update(str(version if version is not None else self.version).encode())
+        hasher.update(np.ascontiguousarray(row, dtype=np.float64).tobytes())
+        return hasher.digest()
+
+    def predict(self, features: np.ndarray, predict_fn: Callable[[np.ndarray], np.ndarray],
+                version: str = None) -> np.ndarray:
+        """Return probabilities for every row of `features`, calling `predict_fn` only
+        on the rows that are not cached (each distinct row once).
+
+        `version` is the artifact version the caller scores with; requests still running
+        on the previous artifacts during a reload then never share entries with new ones.
+        """
+        features = np.asarray(features, dtype=np.float64)
+        keys = [self.key(row, version) for row in features]
+        cached = self._get_many(keys)
+
+        missing: Dict[bytes, List[int]] = {}
+        for idx, (key, probs) in enumerate(zip(keys, cached)):
+            if probs is None:
+                missing.setdefault(key, []).append(idx)
+
+        if missing:
+            first_rows = [rows[0] for rows in missing.values()]
+            computed = np.asarray(predict_fn(features[first_rows]))
+            self._put_many(list(missing.keys()), computed)
+            for probs, rows in zip(computed, missing.values()):
+                for idx in rows:
+                    cached[idx] = probs
+
+        return np.stack(cached) if cached else np.empty((0, 0), dtype=np.float32)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': True,
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'artifact_version': self.version
+            }
+
+    def _get_many(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        now = time.monotonic()
+        found = []
+        with self.lock:
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry is not None and self.ttl_seconds and now - entry[0] > self.ttl_seconds:
+                    del self.entries[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    found.append(None)
+                else:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    found.append(entry[1])
+        return found
+
+    def _put_many(self, keys: List[bytes], rows: np.ndarray):
+        now = time.monotonic()
+        with self.lock:
+            for key, probs in zip(keys, rows):
+                # Copy so a cached row does not keep the whole batch output alive
+                self.entries[key] = (now, np.array(probs))
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
@@ -0,0 +1,207 @@
+"""
+Server-side store for /batch-predict results.
+
+The browser used to receive every result of a batch and then POST the whole array
+back to /download-results just to get a CSV, doubling the transfer and parsing a
+large JSON body on the server again. `ResultStore` keeps the results of each batch
+in a local SQLite database under a batch ID while they are scored, and downloads
+stream straight out of it.
+
+    batches  one row per batch: status, model / artifact version, row count, summary
+    results  (batch_id, seq) -> result JSON, clustered by batch so a download is one
+             range scan in input order
+
+The database runs in WAL mode, so several gunicorn workers can share the file and a
+download never blocks a batch that is being written. Batches older than the
+retention period, and the oldest ones beyond `max_batches`, are evicted whenever a
+new batch starts.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = 'results.db'
+DEFAULT_RETENTION_HOURS = 24.0
+DEFAULT_MAX_BATCHES = 100
+FETCH_ROWS = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    batch_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    status TEXT NOT NULL,
+    filename TEXT,
+    model TEXT,
+    artifact_version TEXT,
+    rows INTEGER NOT NULL DEFAULT 0,
+    summary TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS batches_created_at ON batches (created_at);
+CREATE TABLE IF NOT EXISTS results (
+    batch_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (batch_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+class StoredBatch:
+    """Writes the results of one batch as its chunks are scored"""
+
+    def __init__(self, store: 'ResultStore', batch_id: str):
+        self.store = store
+        self.batch_id = batch_id
+        self.rows = 0
+
+    def add(self, results: List[Dict[str, Any]]):
+        self.store._append(self.batch_id, self.rows, results)
+        self.rows += len(results)
+
+    def finish(self, summary: Dict[str, Any] = None, error: str = None):
+        """Mark the batch completed (or failed with `error`); downloads need a completed batch"""
+        self.store._finish(self.batch_id, self.rows, summary, error)
+
+
+class ResultStore:
+    """SQLite-backed batch results with retention and eviction.
+
+    retention_hours: batches older than this are deleted; 0 keeps them until evicted
+                     by `max_batches`.
+    max_batches: at most this many batches are kept, oldest evicted first.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH, retention_hours: float = DEFAULT_RETENTION_HOURS,
+                 max_batches: int = DEFAULT_MAX_BATCHES):
+        self.path = path
+        self.retention_seconds = float(retention_hours) * 3600
+        self.max_batches = max(1, int(max_batches))
+        self.local = threading.local()
+
+        conn = self._connection()
+        # Only takes effect for a new database file; lets eviction give space back
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.executescript(SCHEMA)
+        self.evict()
+
+    # ---------- public API ----------
+
+    def start_batch(self, filename: str = None, model: str = None, artifact_version: str = None) -> StoredBatch:
+        batch_id = uuid.uuid4().hex
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT INTO batches (batch_id, created_at, status, filename, model, artifact_version) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (batch_id, time.time(), 'running', filename, model, artifact_version)
+            )
+        self.evict()
+        return StoredBatch(self, batch_id)
+
+    def get(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            'SELECT batch_id, created_at, finished_at, status, filename, model, artifact_version, rows, summary, error '
+            'FROM batches WHERE batch_id = ?', (batch_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        batch = dict(zip(('batch_id', 'created_at', 'finished_at', 'status', 'filename', 'model',
+                          'artifact_version', 'rows', 'summary', 'error'), row))
+        batch['summary'] = json.loads(batch['summary']) if batch['summary'] else None
+        if self.retention_seconds:
+            batch['expires_at'] = batch['created_at'] + self.retention_seconds
+        return batch
+
+    def iter_results(self, batch_id: str) -> Iterator[Dict[str, Any]]:
+        """Yield the stored result dicts of a batch in input order, `FETCH_ROWS` at a time"""
+        # Own connection: the generator may outlive the request thread's other queries
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            cursor = conn.execute('SELECT result FROM results WHERE batch_id = ? ORDER BY seq', (batch_id,))
+            while True:
+                rows = cursor.fetchmany(FETCH_ROWS)
+                if not rows:
+                    break
+                for (result,) in rows:
+                    yield json.loads(result)
+        finally:
+            conn.close()
+
+    def evict(self) -> int:
+        """Delete expired batches and the oldest finished ones beyond `max_batches`.
+
+        Batches that are still being written are only removed once they have outlived
+        the retention period; a writer that is still going after that stops storing
+        rows (see `_append`).
+        """
+        conn = self._connection()
+        expired = []
+        if self.retention_seconds:
+            expired = [row[0] for row in conn.execute(
+                'SELECT batch_id FROM batches WHERE created_at < ?', (time.time() - self.retention_seconds,)
+            )]
+        expired += [row[0] for row in conn.execute(
+            "SELECT batch_id FROM batches WHERE status != 'running' ORDER BY created_at DESC LIMIT -1 OFFSET ?",
+            (self.max_batches,)
+        ) if row[0] not in expired]
+        if not expired:
+            return 0
+
+        with conn:
+            for batch_id in expired:
+                conn.execute('DELETE FROM results WHERE batch_id = ?', (batch_id,))
+                conn.execute('DELETE FROM batches WHERE batch_id = ?', (batch_id,))
+        conn.execute('PRAGMA incremental_vacuum')
+        logger.info(f"🧹 Evicted {len(expired)} stored batch(es)")
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        batches, rows = self._connection().execute('SELECT COUNT(*), COALESCE(SUM(rows), 0) FROM batches').fetchone()
+        return {
+            'enabled': True,
+            'path': self.path,
+            'batches': batches,
+            'rows': rows,
+            'size_bytes': sum(os.path.getsize(p) for p in (self.path, self.path + '-wal') if os.path.exists(p)),
+            'retention_hours': self.retention_seconds / 3600,
+            'max_batches': self.max_batches
+        }
+
+    # ---------- internals ----------
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread, reopened after a fork (preloaded gunicorn master)"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    def _append(self, batch_id: str, start: int, results: List[Dict[str, Any]]):
+        with self._connection() as conn:
+            # Rows of a batch that has been evicted meanwhile are dropped, never orphaned
+            conn.executemany(
+                'INSERT INTO results (batch_id, seq, result) '
+                'SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM batches WHERE batch_id = ?)',
+                ((batch_id, start + i, json.dumps(result, separators=(',', ':')), batch_id)
+                 for i, result in enumerate(results))
+            )
+            conn.execute('UPDATE batches SET rows = ? WHERE batch_id = ?', (start + len(results), batch_id))
+
+    def _finish(self, batch_id: str, rows: int, summary: Optional[Dict[str, Any]], error: Optional[str]):
+        with self._connection() as conn:
+            conn.execute(
+                'UPDATE batches SET status = ?, finished_at = ?, rows = ?, summary = ?, error = ? WHERE batch_id = ?',
+                ('failed' if error else 'completed', time.time(), rows,
+                 json.dumps(summary) if summary is not None else None, error, batch_id)
+            )
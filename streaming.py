@@ -0,0 +1,144 @@
+"""
+Chunked ingestion and streaming output helpers for large batch uploads.
+
+`pd.read_csv` on a whole upload keeps the full 561-wide frame in memory while every
+candidate is scored. The helpers here read the upload in fixed-size row chunks so
+only one chunk of raw features is alive at a time, and keep the batch summary as
+running counters instead of recomputing it from the full results list.
+
+For the streaming response, scored chunks are emitted as newline-delimited JSON:
+one `{"type": "result", "result": {...}}` line per candidate, then a final
+`{"type": "summary", ...}` line (or `{"type": "error", ...}` if scoring aborts).
+"""
+import itertools
+import json
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from inference import FEATURE_COUNT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_ROWS = 1000
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+class BatchValidationError(ValueError):
+    """Raised when an uploaded batch does not have the expected structure"""
+
+
+def split_columns(columns: List[str]) -> Tuple[Any, List[str]]:
+    """Return `(id_col, feature_cols)` for a batch frame's columns"""
+    if len(columns) < FEATURE_COUNT:
+        raise BatchValidationError(
+            f'CSV must have at least {FEATURE_COUNT} feature columns. Found: {len(columns)}'
+        )
+    if 'candidate_id' in columns or 'id' in columns:
+        id_col = 'candidate_id' if 'candidate_id' in columns else 'id'
+        return id_col, [col for col in columns if col != id_col][:FEATURE_COUNT]
+    return None, list(columns[:FEATURE_COUNT])
+
+
+def iter_frame_chunks(frames: Iterator[pd.DataFrame]) -> Iterator[Tuple[List[Any], pd.DataFrame]]:
+    """Yield `(candidate_ids, feature_frame)` for every frame of an upload.
+
+    The id / feature column split is worked out from the first frame and reused
+    for the rest; generated ids keep counting across chunk boundaries.
+    """
+    id_col = feature_cols = None
+    offset = 0
+    for chunk in frames:
+        if feature_cols is None:
+            id_col, feature_cols = split_columns(list(chunk.columns))
+        if id_col is not None:
+            candidate_ids = chunk[id_col].tolist()
+        else:
+            candidate_ids = [f"Candidate_{offset + i + 1:03d}" for i in range(len(chunk))]
+        offset += len(chunk)
+        yield candidate_ids, chunk[feature_cols]
+
+
+def iter_csv_chunks(file, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[Tuple[List[Any], pd.DataFrame]]:
+    """Read a CSV upload `chunk_rows` rows at a time"""
+    with pd.read_csv(file, chunksize=chunk_rows) as reader:
+        yield from iter_frame_chunks(reader)
+
+
+class BatchSummary:
+    """Running pass / fail counters for a batch of screening results"""
+
+    def __init__(self):
+        self.total = 0
+        self.successful = 0
+        self.pass_count = 0
+
+    def add(self, results: List[Dict[str, Any]]):
+        self.total += len(results)
+        for result in results:
+            if result.get('success', False):
+                self.successful += 1
+                if 'PASS' in result.get('decision', ''):
+                    self.pass_count += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'total_candidates': self.total,
+            'successful_screenings': self.successful,
+            'failed_screenings': self.total - self.successful,
+            'pass_count': self.pass_count,
+            'fail_count': self.successful - self.pass_count,
+            'pass_rate': round((self.pass_count / self.successful * 100), 1) if self.successful else 0
+        }
+
+
+def prefetch_first(iterator: Iterator) -> Iterator:
+    """Pull the first item now so validation errors surface before a response starts"""
+    iterator = iter(iterator)
+    try:
+        first = next(iterator)
+    except StopIteration:
+        return iter(())
+    return itertools.chain([first], iterator)
+
+
+def ndjson_line(obj: Dict[str, Any]) -> str:
+    return json.dumps(obj, separators=(',', ':')) + '\n'
+
+
+def iter_ndjson_results(chunks: Iterator[Tuple[List[Any], pd.DataFrame]],
+                        score_chunk: Callable[[List[Any], pd.DataFrame], List[Dict[str, Any]]],
+                        on_finish: Optional[Callable[..., None]] = None,
+                        summary_extra: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """Score chunks lazily and yield NDJSON text, one block of lines per chunk.
+
+    `on_finish(summary=..., error=...)` is called once the batch completes or aborts;
+    `summary_extra` is merged into the final summary line.
+    """
+    summary = BatchSummary()
+    finished = False
+    try:
+        for candidate_ids, features in chunks:
+            results = score_chunk(candidate_ids, features)
+            summary.add(results)
+            yield ''.join(ndjson_line({'type': 'result', 'result': result}) for result in results)
+        finished = True
+    except Exception as e:
+        logger.error(f"❌ Streaming batch aborted after {summary.total} candidates: {e}")
+        finished = True
+        if on_finish is not None:
+            on_finish(error=str(e))
+        yield ndjson_line({'type': 'error', 'success': False, 'error': str(e)})
+        return
+    finally:
+        # A client that disconnects closes the generator at a yield (GeneratorExit)
+        if not finished:
+            logger.warning(f"⚠️ Client disconnected after {summary.total} streamed candidates")
+            if on_finish is not None:
+                on_finish(error='client disconnected')
+
+    logger.info(f"✅ Streamed batch complete: {summary.total} candidates")
+    if on_finish is not None:
+        on_finish(summary=summary.as_dict())
+    yield ndjson_line(dict({'type': 'summary', 'success': True, 'summary': summary.as_dict()}, **(summary_extra or {})))
@@ -0,0 +1,50 @@
+"""NDJSON streaming of /batch-predict results into the result store."""
+import pandas as pd
+
+import result_store
+import streaming
+
+
+def score_chunk(candidate_ids, features):
+    return [{'candidate_id': candidate_id, 'screening_result': 'ok'} for candidate_id in candidate_ids]
+
+
+def make_chunks(n_chunks):
+    for i in range(n_chunks):
+        yield [f'C{i}'], pd.DataFrame([[0.0]])
+
+
+def stream_into(store, n_chunks):
+    stored_batch = store.start_batch(filename='candidates.csv')
+
+    def on_finish(summary=None, error=None):
+        stored_batch.finish(summary=summary, error=error)
+
+    def store_chunk(candidate_ids, features):
+        results = score_chunk(candidate_ids, features)
+        stored_batch.add(results)
+        return results
+
+    lines = streaming.iter_ndjson_results(make_chunks(n_chunks), store_chunk, on_finish=on_finish)
+    return stored_batch, lines
+
+
+def test_completed_stream_marks_batch_completed(tmp_path):
+    store = result_store.ResultStore(str(tmp_path / 'results.db'))
+    stored_batch, lines = stream_into(store, 3)
+
+    assert len(list(lines)) == 4
+    assert store.get(stored_batch.batch_id)['status'] == 'completed'
+
+
+def test_client_disconnect_marks_batch_failed(tmp_path):
+    store = result_store.ResultStore(str(tmp_path / 'results.db'))
+    stored_batch, lines = stream_into(store, 3)
+
+    next(lines)
+    # What the WSGI server does when the client goes away mid-response
+    lines.close()
+
+    batch = store.get(stored_batch.batch_id)
+    assert batch['status'] == 'failed'
+    assert batch['error'] == 'client disconnected'